@@ -1,13 +1,368 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+import os
+from types import SimpleNamespace
+
+@dataclass(frozen=True)
+class EvaluationContext:
+    """
+    The time an analytics run is evaluated at, with the period numbers derived from it.
+
+    Captured once per run, so all metrics of a run see the same "now" and the
+    clock and calendar are not consulted again for every habit.
+    """
+    now: datetime
+    today: date
+    week: int
+    month: int
+
+    @classmethod
+    def capture(cls, now=None):
+        """
+        Capture the evaluation context of an analytics run.
+
+        :param now: Date and time to evaluate at, defaults to now.
+        :return: EvaluationContext.
+        """
+        now = now or datetime.now()
+        today = now.date()
+        return cls(now, today, today.isocalendar()[1], today.year * 12 + today.month)
+
+    @classmethod
+    def of(cls, context):
+        """
+        Return the given context, or capture a new one if there is none.
+
+        :param context: EvaluationContext or None.
+        :return: EvaluationContext.
+        """
+        return context if context is not None else cls.capture()
+
+def success_rate(habit, context):
+    """
+    Return the success rate of a habit, as used by highest_success_rate.
+
+    :param habit: Habit object.
+    :param context: EvaluationContext the rate is evaluated in.
+    :return: Number of progress entries per period since the habit's creation.
+    """
+    start = habit.start_date
+    periods = (context.today - start).days + 1
+    if habit.frequency == "weekly":
+        periods = context.week - start.isocalendar()[1] + 1
+    elif habit.frequency == "monthly":
+        periods = (context.month - (start.year * 12 + start.month) - 1 - len(habit.progress_entries)) + 1
+    return len(habit.progress_entries) / periods if periods else 0
+
+def record_success_rate(record, context=None):
+    """
+    Return the success rate of a stored habit record, as used by highest_success_rate.
+
+    Only the number of progress entries is needed, so lazily loaded
+    progress entries are not read.
+
+    :param record: Habit record.
+    :param context: EvaluationContext the rate is evaluated in, defaults to now.
+    :return: Number of progress entries per period since the habit's creation.
+    """
+    habit = SimpleNamespace(start_date=date.fromisoformat(str(record["start_date"])),
+                            frequency=record["frequency"],
+                            progress_entries=record["progress_entries"])
+    return success_rate(habit, EvaluationContext.of(context))
+
+def failure_rate(habit, context):
+    """
+    Return the failure rate of a habit, as used by highest_failure_rate.
+
+    :param habit: Habit object.
+    :param context: EvaluationContext the rate is evaluated in.
+    :return: Share of periods since the habit's creation without a progress entry.
+    """
+    start = habit.start_date
+    periods = (context.today - start).days + 1
+    if habit.frequency == "weekly":
+        periods = context.week - start.isocalendar()[1] + 1
+    elif habit.frequency == "monthly":
+        periods = (context.month - (start.year * 12 + start.month) - len(habit.progress_entries)) + 1
+    return (periods - len(habit.progress_entries)) / periods if periods else 0
+
+def missed_periods(habit, context):
+    """
+    Return the number of periods a habit was not completed in, as used by overall_failures.
+
+    :param habit: Habit object.
+    :param context: EvaluationContext the count is evaluated in.
+    :return: Number of missed periods (may be negative).
+    """
+    start = habit.start_date
+    if habit.frequency == "daily":
+        return (context.today - start).days - len(habit.progress_entries)
+    elif habit.frequency == "weekly":
+        return context.week - start.isocalendar()[1] - len(habit.progress_entries)
+    return context.month - (start.year * 12 + start.month) - 1 - len(habit.progress_entries)
+
+def remaining_days(habit, context):
+    """
+    Return the whole days left until the next deadline of a habit.
+
+    :param habit: Habit object with a next deadline.
+    :param context: EvaluationContext the time is evaluated in.
+    :return: Number of days, as (deadline - now).days.
+    """
+    deadline = habit.next_deadline
+    if isinstance(deadline, str):
+        deadline = datetime.strptime(deadline, "%Y-%m-%d %H:%M:%S")
+    return (deadline - context.now).days
+
+def completion_ratio(habit):
+    """
+    Return the successes of a habit per progress entry, as used by the group performances.
+
+    :param habit: Habit object.
+    :return: Ratio of successes to progress entries, or 0 without entries.
+    """
+    return habit.successes / len(habit.progress_entries) if habit.progress_entries else 0
+
+
+@dataclass
+class AnalyticsSummary:
+    """
+    All dashboard metrics of a set of habits, as computed by Analytics.summarize.
+    """
+    habit_count: int = 0
+    active_habits: list = field(default_factory=list)
+    top_streak_habit: object = None
+    top_streak: int = 0
+    highest_success_rate_habit: object = None
+    highest_success_rate: float = 0
+    highest_failure_rate_habit: object = None
+    highest_failure_rate: float = 0
+    overall_successes: int = 0
+    overall_failures: int = 0
+    top_category_performance: str | None = None
+    top_frequency_performance: str | None = None
+    average_streak_length: float = 0
+    average_streak_break: float = 0
+    average_remaining_time: float = 0
+
+
+class AnalyticsAccumulator:
+    """
+    Computes all dashboard metrics in a single traversal of the habits.
+
+    Accumulators built over consecutive parts of a habit list can be merged
+    in order, giving the same result as one accumulator over the whole list.
+    """
+    def __init__(self, context=None):
+        """
+        Initialize an empty accumulator.
+
+        :param context: EvaluationContext the metrics are evaluated in, defaults to now.
+        """
+        self.context = EvaluationContext.of(context)
+        self.count = 0
+        self.active_habits = []
+        self.top_streak = None
+        self.best_success = None
+        self.worst_failure = None
+        self.successes = 0
+        self.missed = 0
+        self.streak_sum = 0
+        self.category_rates = {}
+        self.frequency_rates = {}
+        self.remaining_sum = 0
+        self.remaining_count = 0
+
+    @staticmethod
+    def _better(current, candidate):
+        return candidate if current is None or candidate[1] > current[1] else current
+
+    @staticmethod
+    def _add_rate(groups, key, rate):
+        total = groups.setdefault(key, [0, 0])
+        total[0] += rate
+        total[1] += 1
+
+    def add(self, habit):
+        """
+        Add a habit to the aggregate.
+
+        :param habit: Habit object.
+        """
+        self.count += 1
+        if habit.active:
+            self.active_habits.append(habit)
+        self.top_streak = self._better(self.top_streak, (habit, habit.longest_streak))
+        self.best_success = self._better(self.best_success, (habit, success_rate(habit, self.context)))
+        self.worst_failure = self._better(self.worst_failure, (habit, failure_rate(habit, self.context)))
+        self.successes += habit.successes
+        self.missed += missed_periods(habit, self.context)
+        self.streak_sum += habit.longest_streak
+        ratio = completion_ratio(habit)
+        self._add_rate(self.category_rates, habit.category, ratio)
+        self._add_rate(self.frequency_rates, habit.frequency, ratio)
+        if habit.next_deadline:
+            self.remaining_sum += remaining_days(habit, self.context)
+            self.remaining_count += 1
+        return self
+
+    def extend(self, habits):
+        """
+        Add several habits to the aggregate.
+
+        :param habits: Iterable of Habit objects.
+        :return: The accumulator itself.
+        """
+        for habit in habits:
+            self.add(habit)
+        return self
+
+    def merge(self, other):
+        """
+        Merge the aggregate of the habits following this accumulator's habits.
+
+        :param other: AnalyticsAccumulator over the next part of the habit list.
+        :return: The accumulator itself.
+        """
+        self.count += other.count
+        self.active_habits.extend(other.active_habits)
+        for name in ("top_streak", "best_success", "worst_failure"):
+            if getattr(other, name) is not None:
+                setattr(self, name, self._better(getattr(self, name), getattr(other, name)))
+        self.successes += other.successes
+        self.missed += other.missed
+        self.streak_sum += other.streak_sum
+        for groups, other_groups in ((self.category_rates, other.category_rates),
+                                     (self.frequency_rates, other.frequency_rates)):
+            for key, (rate_sum, rate_count) in other_groups.items():
+                total = groups.setdefault(key, [0, 0])
+                total[0] += rate_sum
+                total[1] += rate_count
+        self.remaining_sum += other.remaining_sum
+        self.remaining_count += other.remaining_count
+        return self
+
+    def replace_habits(self, replace):
+        """
+        Replace the habits the accumulator refers to, e.g. by their positions.
+
+        Used to send an accumulator between processes without sending the
+        habits back along with it.
+
+        :param replace: Callable mapping a habit reference to its replacement.
+        :return: The accumulator itself.
+        """
+        self.active_habits = [replace(habit) for habit in self.active_habits]
+        for name in ("top_streak", "best_success", "worst_failure"):
+            if getattr(self, name) is not None:
+                habit, value = getattr(self, name)
+                setattr(self, name, (replace(habit), value))
+        return self
+
+    @staticmethod
+    def _top_group(groups):
+        if not groups:
+            return None
+        return max(groups, key=lambda key: groups[key][0] / groups[key][1])
+
+    def result(self):
+        """
+        Return the metrics of all habits added so far.
+
+        :return: AnalyticsSummary.
+        """
+        summary = AnalyticsSummary(habit_count=self.count, active_habits=self.active_habits,
+                                   overall_successes=self.successes,
+                                   overall_failures=max(self.missed, 0))
+        if self.count:
+            summary.top_streak_habit, summary.top_streak = self.top_streak
+            summary.highest_success_rate_habit, summary.highest_success_rate = self.best_success
+            summary.highest_failure_rate_habit, summary.highest_failure_rate = self.worst_failure
+            summary.average_streak_length = self.streak_sum / self.count
+            summary.average_streak_break = self.missed / self.count
+        summary.top_category_performance = self._top_group(self.category_rates)
+        summary.top_frequency_performance = self._top_group(self.frequency_rates)
+        if self.remaining_count:
+            summary.average_remaining_time = self.remaining_sum / self.remaining_count
+        return summary
+
+
+def accumulated_fields(habit):
+    """
+    Return the fields of a habit read by AnalyticsAccumulator, for sending it to a worker process.
+
+    The progress entries are replaced by a range of the same length, so
+    neither the history nor the way it is loaded has to be pickled.
+
+    :param habit: Habit object.
+    :return: SimpleNamespace standing in for the habit.
+    """
+    return SimpleNamespace(active=habit.active, longest_streak=habit.longest_streak,
+                           start_date=habit.start_date, frequency=habit.frequency,
+                           successes=habit.successes, category=habit.category,
+                           next_deadline=habit.next_deadline,
+                           progress_entries=range(len(habit.progress_entries)))
+
+def summarize_partition(habits, offset, context):
+    """
+    Aggregate one partition of a habit list, as run in a worker process.
+
+    :param habits: The habits of the partition.
+    :param offset: Position of the partition's first habit in the whole list.
+    :param context: EvaluationContext shared by all partitions.
+    :return: AnalyticsAccumulator referring to habits by their position in the whole list.
+    """
+    positions = {id(habit): offset + index for index, habit in enumerate(habits)}
+    accumulator = AnalyticsAccumulator(context).extend(habits)
+    return accumulator.replace_habits(lambda habit: positions[id(habit)])
+
 
 class Analytics:
     """
     Provides various analytical methods for analyzing habits.
     """
-    
+
+    def summarize(self, habits, context=None):
+        """
+        Compute all dashboard metrics in a single pass over the habits.
+
+        :param habits: List of Habit objects.
+        :param context: EvaluationContext the metrics are evaluated in, defaults to now.
+        :return: AnalyticsSummary with the same values as the individual methods.
+        """
+        return AnalyticsAccumulator(context).extend(habits).result()
+
+    def summarize_parallel(self, habits, workers=None, context=None):
+        """
+        Compute all dashboard metrics with the habits partitioned across worker processes.
+
+        Each process aggregates one contiguous partition, receiving only the
+        fields the aggregate reads, and the partial aggregates are merged in order, so the results equal those of
+        summarize (group averages up to floating point rounding).
+
+        :param habits: List of Habit objects.
+        :param workers: Number of worker processes, defaults to the number of CPUs.
+        :param context: EvaluationContext the metrics are evaluated in, defaults to now.
+        :return: AnalyticsSummary referring to the given Habit objects.
+        """
+        context = EvaluationContext.of(context)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(habits)))
+        size = -(-len(habits) // workers) if habits else 1
+        offsets = range(0, len(habits), size)
+        fields = [accumulated_fields(habit) for habit in habits]
+        accumulator = AnalyticsAccumulator(context)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = executor.map(summarize_partition,
+                                    [fields[offset:offset + size] for offset in offsets],
+                                    offsets, [context] * len(offsets))
+            for partial in partials:
+                accumulator.merge(partial)
+        return accumulator.replace_habits(habits.__getitem__).result()
+
     def active_habits(self, habits):
         """
         Return a list of active habits from the provided list.
@@ -58,44 +413,28 @@ class Analytics:
         return [habit for habit in habits if from_date <= habit.start_date
                 and habit.start_date <= to_date]
 
-    def highest_success_rate(self, habits):
+    def highest_success_rate(self, habits, context=None):
         """
         Return the habit_id of the habit with the highest success rate.
 
         :param habits: List of Habit objects.
+        :param context: EvaluationContext the rates are evaluated in, defaults to now.
         :return: Habit ID with the highest success rate, or None if no habit exists.
         """
-        def success_rate(habit):
-            days_since_creation = (datetime.now().date() - habit.start_date).days + 1
-            if habit.frequency == "weekly":
-                days_since_creation = datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] + 1
-            elif habit.frequency == "monthly":
-                days_since_creation = ((datetime.now().date().year - habit.start_date.year) * 12 
-                                        + (datetime.now().date().month - habit.start_date.month) - 1 - len(habit.progress_entries)) + 1
-            days_with_progress = len(habit.progress_entries)
-            return days_with_progress / days_since_creation if days_since_creation else 0
-
-        success_rate_habit = max(habits, key=success_rate)
+        context = EvaluationContext.of(context)
+        success_rate_habit = max(habits, key=lambda habit: success_rate(habit, context))
         return success_rate_habit.habit_id if success_rate_habit else None
 
-    def highest_failure_rate(self, habits):
+    def highest_failure_rate(self, habits, context=None):
         """
         Return the habit_id of the habit with the highest failure rate.
 
         :param habits: List of Habit objects.
+        :param context: EvaluationContext the rates are evaluated in, defaults to now.
         :return: Habit ID with the highest failure rate, or None if no habit exists.
         """
-        def failure_rate(habit):
-            days_since_creation = (datetime.now().date() - habit.start_date).days + 1
-            if habit.frequency == "weekly":
-                days_since_creation = datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] + 1
-            elif habit.frequency == "monthly":
-                days_since_creation = ((datetime.now().date().year - habit.start_date.year) * 12 
-                                        + (datetime.now().date().month - habit.start_date.month) - len(habit.progress_entries)) + 1
-            days_with_progress = len(habit.progress_entries)
-            return (days_since_creation - days_with_progress) / days_since_creation if days_since_creation else 0
-        
-        failure_rate_habit = max(habits, key=failure_rate)
+        context = EvaluationContext.of(context)
+        failure_rate_habit = max(habits, key=lambda habit: failure_rate(habit, context))
         return failure_rate_habit.habit_id
 
     def overall_successes(self, habits):
@@ -107,22 +446,16 @@ class Analytics:
         """
         return sum(habit.successes for habit in habits)
 
-    def overall_failures(self, habits):
+    def overall_failures(self, habits, context=None):
         """
         Return the total number of failures across all habits.
 
         :param habits: List of Habit objects.
+        :param context: EvaluationContext the failures are counted in, defaults to now.
         :return: Total number of failures.
         """
-        total_failures = 0
-        for habit in habits:
-            if habit.frequency == "daily":
-                total_failures += (datetime.now().date() - habit.start_date).days - len(habit.progress_entries)
-            elif habit.frequency == "weekly":
-                total_failures += datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] - len(habit.progress_entries)
-            else:
-                total_failures += ((datetime.now().date().year - habit.start_date.year) * 12 
-                                     + (datetime.now().date().month - habit.start_date.month) - 1 - len(habit.progress_entries))
+        context = EvaluationContext.of(context)
+        total_failures = sum(missed_periods(habit, context) for habit in habits)
         return total_failures if total_failures >= 0 else 0
 
     def top_category_performance(self, habits):
@@ -166,36 +499,90 @@ class Analytics:
         """
         return sum(habit.longest_streak for habit in habits) / len(habits)
 
-    def average_streak_break(self, habits):
+    def average_streak_break(self, habits, context=None):
         """
         Calculate the average number of days between habit creation and the first progress entry.
 
         :param habits: List of Habit objects.
+        :param context: EvaluationContext the breaks are counted in, defaults to now.
         :return: Average number of days between creation and first progress entry.
         """
-        streak_breaks = []
-        for habit in habits:
-            if habit.frequency == "daily":
-                streak_breaks.append((datetime.now().date() - habit.start_date).days - len(habit.progress_entries))
-            elif habit.frequency == "weekly":
-                streak_breaks.append(datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] - len(habit.progress_entries))
-            else:
-                streak_breaks.append((datetime.now().date().year - habit.start_date.year) * 12 
-                                     + (datetime.now().date().month - habit.start_date.month) - 1 - len(habit.progress_entries))
+        context = EvaluationContext.of(context)
+        streak_breaks = [missed_periods(habit, context) for habit in habits]
         total_breaks = sum(streak_breaks)
         return total_breaks / len(streak_breaks) if streak_breaks else 0
 
-    def average_remaining_time(self, habits):
+    def average_remaining_time(self, habits, context=None):
         """
         Calculate the average remaining time until the next deadline for active habits.
 
         :param habits: List of Habit objects.
+        :param context: EvaluationContext the remaining time is measured in, defaults to now.
         :return: Average remaining time in days.
         """
-        remaining_times = []
-        for habit in habits:
-            if habit.next_deadline:
-                habit.next_deadline = datetime.strptime(habit.next_deadline, 
-                                                        "%Y-%m-%d %H:%M:%S")
-                remaining_times.append((habit.next_deadline - datetime.now()).days)
-        return sum(remaining_times) / len(remaining_times) if remaining_times else 0
\ No newline at end of file
+        context = EvaluationContext.of(context)
+        remaining_times = [remaining_days(habit, context) for habit in habits if habit.next_deadline]
+        return sum(remaining_times) / len(remaining_times) if remaining_times else 0
+
+
+class AnalyticsCache:
+    """
+    Computes analytics on first request and memoizes them until the data changes.
+
+    Results are kept against the data version (and the current day, since the
+    rates depend on it); once either changes, everything is computed again.
+    """
+    def __init__(self, load_habits, version, analytics=None):
+        """
+        Initialize an AnalyticsCache.
+
+        :param load_habits: Callable returning the list of Habit objects to analyze.
+        :param version: Callable returning the current data version.
+        :param analytics: Analytics object computing the metrics, defaults to a new one.
+        """
+        self.load_habits = load_habits
+        self.version = version
+        self.analytics = analytics or Analytics()
+        self._key = None
+        self._habits = None
+        self._results = {}
+
+    def _validate(self):
+        key = (self.version(), date.today())
+        if key != self._key:
+            self._key = key
+            self._habits = None
+            self._results = {}
+
+    def habits(self):
+        """
+        Return the Habit objects of the current data version.
+
+        :return: List of Habit objects.
+        """
+        self._validate()
+        if self._habits is None:
+            self._habits = self.load_habits()
+        return self._habits
+
+    def summary(self):
+        """
+        Return the dashboard metrics of the current data version.
+
+        :return: AnalyticsSummary.
+        """
+        return self.get("summarize")
+
+    def get(self, name, *args):
+        """
+        Return the result of an Analytics method over the current habits.
+
+        :param name: Name of the Analytics method, e.g. "overall_successes".
+        :param args: Further (hashable) arguments of the method.
+        :return: The method's result, computed at most once per data version.
+        """
+        self._validate()
+        key = (name,) + args
+        if key not in self._results:
+            self._results[key] = getattr(self.analytics, name)(self.habits(), *args)
+        return self._results[key]
@@ -1,6 +1,6 @@
 from datetime import datetime
 from functools import partial
-import json
+from operator import itemgetter
 
 import customtkinter
 from tkcalendar import DateEntry
@@ -8,8 +8,11 @@ import tkinter
 from tkinter import ttk
 from tkinter.messagebox import showinfo
 
-from analytics import Analytics
-from habit import Habit
+from analytics import AnalyticsCache, EvaluationContext, record_success_rate
+from habit import Habit, StreakCounter, parse_timestamp
+from storage import HABITS_FILE, HabitStore, open_storage
+from tasks import TaskRunner
+from widgets import PanelPool, TablePanel, VirtualTreeview
 
 customtkinter.set_appearance_mode("dark")
 customtkinter.set_default_color_theme("dark-blue")
@@ -29,14 +32,24 @@ class App(customtkinter.CTk):
         self.style.configure("Treeview", background="#242424", 
                 fieldbackground="#242424", foreground="white")
         
+        self.store = HabitStore(open_storage(HABITS_FILE), write_delay=0.5,
+                                on_write_error=self.report_write_error)
+        self.analytics = AnalyticsCache(self.load_habits, lambda: self.store.version)
+        self.tasks = TaskRunner(self, on_busy=self.show_busy, on_error=self.show_error,
+                                idle_interval=500)
+        self.store.add_leaderboard("longest_streak", itemgetter("longest_streak"))
+        self.store.add_leaderboard("success_rate", record_success_rate,
+                                   epoch=lambda: datetime.now().date(),
+                                   context=EvaluationContext.capture)
         self.dialog_habbit_number = ""
-        self.lists = list() 
+        self.dashboard = None
         self.id = 0
         self.selected_value = []
         self.datas = []
         self.infos = []
         self.title("Habit Tracker App")
         self.geometry("1000x600")
+        self.protocol("WM_DELETE_WINDOW", self.close_window)
 
         # Main container
         self.main_container = customtkinter.CTkFrame(self, corner_radius=10)
@@ -118,94 +131,65 @@ class App(customtkinter.CTk):
         Initialize and display the dashboard view.
 
         Sets up the dashboard UI with a Treeview widget to display habit information.
-        Populates the Treeview with data from the 'habits.json' file.
+        Only the rows in view are fetched from the habit store and formatted,
+        as the user scrolls. The dashboard is built once and kept while other
+        views are shown; showing it again only updates the rows that changed.
         Binds functions to Treeview events for handling user interactions.
         """
         self.bt_mark_done.configure(state="disabled")
         self.bt_add_habit.configure(state="disabled")
         self.bt_metrics.configure(state="disabled")
-        global lists
         self.clear_frame()
         self.title("Dashboard - Habit tracking app")
-        
-        cols = [
-            "Habit", 
-            "Description",
-            "Category",
-            "Frequency", 
-            "Last Done", 
-            "Current Streak", 
-            "Progress"
-        ]
-        treescroll = ttk.Scrollbar(self.right_dashboard,)
-        treescroll.pack(side="right", fill="y")
-        treeview = ttk.Treeview(self.right_dashboard,show="headings", 
-                                yscrollcommand=treescroll.set, 
-                                columns=cols, 
-                                height=13)
-        treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-        treescroll.config(command=treeview.yview)
-         
-        treeview.column("Habit", width=100)
-        treeview.column("Description", width=180)
-        treeview.column("Category", width=100)
-        treeview.column("Frequency", width=80)
-        treeview.column("Last Done", width=100)
-        treeview.column("Current Streak", width=100)
-        treeview.column("Progress", width=80)
-        
-        treeview.heading("Habit", text="Habit")
-        treeview.heading("Description", text="Description")
-        treeview.heading("Category", text="Category")
-        treeview.heading("Frequency", text="Frequency")
-        treeview.heading("Last Done", text="Last Done")
-        treeview.heading("Current Streak", text="Current Streak")
-        treeview.heading("Progress", text="Progress")
-        self.loaded_data = self.load_data("habits.json")
-        self.lists += self.loaded_data
-        count = 1
-        for record in self.loaded_data:
-            if datetime.now() > datetime.fromisoformat(record["next_deadline"]):
-                record["current_streak"] = 0
-            lists = [
-                record["title"], 
-                record["description"],
-                record["category"],
-                record["frequency"], 
-                datetime.fromisoformat(record["progress_entries"][-1]["timestamp"]).date() if record["progress_entries"] else "-", 
-                record["current_streak"], 
-                "{}/{}".format(record["successes"],record["goal"])
-            ]
-            treeview.insert(parent="", index=tkinter.END, iid=count, text="", values=lists)
-            count += 1
+
+        if self.dashboard is not None:
+            self.dashboard_frame.pack(fill=tkinter.BOTH, expand=True)
+            self.dashboard.treeview.selection_remove(self.dashboard.treeview.selection())
+            self.dashboard.set_row_count(len(self.load_data()))
+            return
+
+        def fetch_rows(start, stop):
+            now = datetime.now()
+            return [(record["habit_id"], self.dashboard_row(record, now)) 
+                    for record in self.load_data()[start:stop]]
+
+        self.dashboard_frame = customtkinter.CTkFrame(self.right_dashboard, fg_color="transparent")
+        self.dashboard_frame.pack(fill=tkinter.BOTH, expand=True)
+        self.dashboard = VirtualTreeview(self.dashboard_frame, 
+                                         [("Habit", 100), 
+                                          ("Description", 180), 
+                                          ("Category", 100), 
+                                          ("Frequency", 80), 
+                                          ("Last Done", 100), 
+                                          ("Current Streak", 100), 
+                                          ("Progress", 80)], 
+                                         fetch_rows, 
+                                         len(self.load_data()))
+        treeview = self.dashboard.treeview
 
         def item_selected(_):
             for selected_item in treeview.selection():
                 self.dialog_habbit_number = selected_item
                 item = treeview.item(selected_item)
                 self.datas = item['values']
-                for i in self.loaded_data:
-                    if i["title"] == self.datas[0]:
-                        pass
-                    else: 
-                        continue
 
         def on_tree_click(event):
             item_id = treeview.identify_row(event.y)
             button_id = treeview.identify_column(event.x)
             try:
-                selected_val = self.loaded_data[int(item_id)-1]
+                selected_val = self.store.get(item_id)
                 if selected_val["progress_entries"]:
                     last_done = datetime.fromisoformat(selected_val["progress_entries"][-1]["timestamp"]).date()
-                    if last_done == datetime.now().date():
+                    now = datetime.now()
+                    if last_done == now.date():
                         self.bt_mark_done.configure(state="disabled")
                     elif (selected_val["frequency"] == "weekly" 
-                        and last_done.isocalendar()[1] == datetime.now().isocalendar()[1] 
-                        and last_done.year == datetime.now().year):
+                        and last_done.isocalendar()[1] == now.isocalendar()[1] 
+                        and last_done.year == now.year):
                         self.bt_mark_done.configure(state="disabled")
                     elif (selected_val["frequency"] == "monthly" 
-                        and last_done.month == datetime.now().month
-                        and last_done.year == datetime.now().year):
+                        and last_done.month == now.month
+                        and last_done.year == now.year):
                         self.bt_mark_done.configure(state="disabled")
                     else:
                         self.bt_mark_done.configure(state="normal")
@@ -219,77 +203,90 @@ class App(customtkinter.CTk):
         treeview.bind("<Button-1>", on_tree_click)
         treeview.bind('<<TreeviewSelect>>', item_selected)
 
-    def save_data(self,data, filename):
+    def current_streak(self, record, now):
         """
-        Save data to a JSON file.
+        Return the current streak of a habit record at the given time.
 
         Args:
-            data (dict): Data to be saved.
-            filename (str): Name of the JSON file to save the data to.
+            record (dict): Habit record.
+            now (datetime.datetime): Time the current streak is evaluated at.
+
+        Returns:
+            int: Current streak, 0 if the habit's deadline has passed.
         """
-        with open(filename, 'w') as file:
-            json.dump(data, file, default=str)
+        if record.get("streak_checkpoint"):
+            return StreakCounter.from_state(record["streak_checkpoint"]).current_streak(now)
+        if now > datetime.fromisoformat(record["next_deadline"]):
+            return 0
+        return record["current_streak"]
 
-    def load_data(self,filename):
+    def dashboard_row(self, record, now):
         """
-        Load data from a JSON file.
+        Format a habit record as a dashboard row.
 
         Args:
-            filename (str): Name of the JSON file to load data from.
+            record (dict): Habit record.
+            now (datetime.datetime): Time the current streak is evaluated at.
+
+        Returns:
+            list: Values of the dashboard columns.
+        """
+        return [
+            record["title"], 
+            record["description"],
+            record["category"],
+            record["frequency"], 
+            datetime.fromisoformat(record["progress_entries"][-1]["timestamp"]).date() if record["progress_entries"] else "-", 
+            self.current_streak(record, now),
+            "{}/{}".format(record["successes"],record["goal"])
+        ]
+
+    def save_data(self, data):
+        """
+        Save data to the habit storage.
+
+        Args:
+            data (list): Habit records to be saved.
+        """
+        self.store.save(data)
+
+    def load_data(self):
+        """
+        Load data from the habit storage.
 
         Returns:
             list: Loaded data as a list.
         """
-        try:
-            with open(filename, 'r') as file:
-                data = json.loads(file.read())
-                return data
-        except Exception as e:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write("[\n]")
-                return []
+        return self.store.load()
+
+    def load_habits(self):
+        """
+        Load the habit data as Habit objects.
+
+        Returns:
+            list: Habit objects of the stored habit records.
+        """
+        with self.store.lock:
+            records = list(self.load_data())
+        return [Habit.from_record(record) for record in records]
     
     def adding_func(self):
         """
         Add a new habit and update the data.
         This function creates a new Habit instance and updates the data accordingly.
         """
-        data = json.loads(open("./habits.json", "r").read())
-        category = self.category_entry.get()
         significance = self.goal_entry.get()
-        habit_id = self.id + 1
-        self.id = habit_id    
-        frequency = self.combobox.get()
-        title = self.habit_name_entry.get()
-        description = self.habit_description_entry.get()
-        progress_entries = []
         last_done = ["Have not been marked down"]
         
-        habits = Habit(title, description, frequency, category, 
-                             significance, progress_entries, last_done, "add")
+        habits = Habit(self.habit_name_entry.get(), self.habit_description_entry.get(), 
+                       self.combobox.get(), self.category_entry.get(), 
+                       significance, [], last_done, "add")
         habits.update_next_deadline()
         habits.goal = int(significance)
-        data.append({
-            "habit_id": habit_id, 
-            "title": habits.title,
-            "description": habits.description,
-            "active": habits.active,
-            "start_date": habits.start_date,
-            "last_done": habits.last_done,
-            "frequency": habits.frequency,
-            "successes": habits.successes,
-            "current_streak": habits.current_streak,
-            "longest_streak": habits.longest_streak,
-            "category": habits.category,
-            "significance": habits.significance,
-            "next_deadline": habits.next_deadline,
-            "progress_entries": habits.progress_entries,
-            "goal": habits.goal
-        })
-        self.save_data(data, "habits.json")
+        self.store.add(habits.to_record())
         self.dash_func()
     
-    def adding_func_edit(self, mode, id, progess_entries):
+    def adding_func_edit(self, mode, id):
         """
         Edit an existing habit and update the data.
 
@@ -298,34 +295,23 @@ class App(customtkinter.CTk):
         Args:
             mode (str): The edit mode ("edit").
             id (str): The habit ID.
-            progress_entries (list): The progress entries for the habit.
         """
-        category = self.category_entry.get()
-        significance = self.goal_entry.get()
-        habit_id = id
-        self.id = habit_id    
+        self.id = id
         self.dialog_habbit_number = ""
-        frequency = self.combobox.get()
-        title = self.habit_name_entry.get()
-        description = self.habit_description_entry.get()
-        progress_entries = progess_entries
-        last_done = ["Have not been marked down"]
+        record = self.store.get(self.id)
 
-        habits = Habit(title, description, frequency, category,
-                       significance, progress_entries, last_done, mode, id)
-        habits.update_next_deadline()
-        habits.goal = int(significance)
-
-        self.selected_value_list[int(self.id)-1]["habit_id"] = habit_id
-        self.selected_value_list[int(self.id)-1]["title"] = title
-        self.selected_value_list[int(self.id)-1]["description"] = description
-        self.selected_value_list[int(self.id)-1]["frequency"] = frequency
-        self.selected_value_list[int(self.id)-1]["category"] = category
-        self.selected_value_list[int(self.id)-1]["significance"] = significance
-        self.selected_value_list[int(self.id)-1]["progress_entries"] = progress_entries
-        self.selected_value_list[int(self.id)-1]["last_done"] = last_done
-                           
-        self.save_data(self.selected_value_list, "habits.json")
+        significance = self.goal_entry.get()
+        fields = {"habit_id": record["habit_id"],
+                  "title": self.habit_name_entry.get(),
+                  "description": self.habit_description_entry.get(),
+                  "frequency": self.combobox.get(),
+                  "category": self.category_entry.get(),
+                  "significance": significance,
+                  "goal": int(significance)}
+        if fields["frequency"] != record["frequency"]:
+            fields["streak_checkpoint"] = None
+
+        self.store.update(fields)
         self.dash_func()
 
     def delete_func(self, item_id):
@@ -338,15 +324,10 @@ class App(customtkinter.CTk):
             itemId (str): The ID of the habit to be deleted.
         """
         self.dialog_habbit_number = ""
-        data = self.load_data("./habits.json")
-        for index, item in enumerate(data):
-             if int(item["habit_id"]) > int(item_id)-1:
-                 data[index]["habit_id"] = str(int(data[index]["habit_id"]) - 1)   
-        del data[int(item_id) - 1]
-        self.save_data(data, "./habits.json")
+        self.store.delete(item_id)
         self.dash_func()
            
-    def save_changes(self, mode, id="", progess_entries=[]):
+    def save_changes(self, mode, id=""):
         """
         Save changes made to a habit.
 
@@ -355,9 +336,8 @@ class App(customtkinter.CTk):
         Args:
             mode (str): The edit mode ("edit").
             id (str): The habit ID.
-            progress_entries (list): The progress entries for the habit.
         """
-        self.adding_func_edit(mode, id, progess_entries)
+        self.adding_func_edit(mode, id)
 
     def add_habit_func(self):
         """
@@ -447,63 +427,120 @@ class App(customtkinter.CTk):
         """
         Mark a habit as done for the current date.
 
-        This function updates the progress and streak information for a habit when it is marked as done for the current date.
+        The habit is completed and saved on the worker thread, and the
+        dashboard is updated once that is done.
         """
-        loaded_data = self.load_data("./habits.json")
-
         if self.dialog_habbit_number == "":
             showinfo("Error", "Choose a habit fom dashboard")
             return
 
-        item_id = self.dialog_habbit_number
-        item_id = int(item_id) - 1
-
-        selected_habit = Habit(
-            loaded_data[item_id]["title"],
-            loaded_data[item_id]["description"],
-            loaded_data[item_id]["frequency"],
-            loaded_data[item_id]["category"],
-            loaded_data[item_id]["significance"],
-            loaded_data[item_id]["progress_entries"],
-            loaded_data[item_id]["last_done"],
-            "edit",
-            loaded_data[item_id]["habit_id"]
-        )
-        selected_habit.successes = loaded_data[item_id]["successes"]
-        selected_habit.current_streak = loaded_data[item_id]["current_streak"]
-        selected_habit.longest_streak = loaded_data[item_id]["longest_streak"]
-        selected_habit.next_deadline = loaded_data[item_id]["next_deadline"]
-
-        last_done = (datetime.fromisoformat(selected_habit.progress_entries[-1]["timestamp"])
-                     if selected_habit.progress_entries and "timestamp" in selected_habit.progress_entries[-1]
-                     else datetime(1969, 7, 20)) 
-        if selected_habit.is_completed_today():
-            showinfo("The habit is done", "The habit has been already done today!")
-        elif (selected_habit.frequency == "weekly" 
-              and last_done.isocalendar()[1] == datetime.now().isocalendar()[1] 
-              and last_done.year == datetime.now().year):
-            showinfo("The habit is done", "The habit has been already done this week!")
-        elif (selected_habit.frequency == "monthly" 
-              and last_done.month == datetime.now().month
-              and last_done.year == datetime.now().year):
-            showinfo("The habit is done", "The habit has been already done this month!")
-        else:
+        self.tasks.submit(self.complete_habit, self.dialog_habbit_number, datetime.now(), 
+                          on_done=self.show_completion)
+        self.dialog_habbit_number = ""
+
+    def complete_habit(self, habit_id, now):
+        """
+        Update the progress and streak information of a habit marked as done.
+
+        Runs on the worker thread, so it must not use any widgets. The streaks
+        are computed from a snapshot of the habit without holding the store's
+        lock, which is only taken to read the snapshot and to commit the
+        result. If the habits changed in between, the completion is computed
+        again.
+
+        Args:
+            habit_id (str): ID of the habit.
+            now (datetime.datetime): Time the habit was marked as done.
+
+        Returns:
+            str: Message why the habit was not completed, or None if it was.
+        """
+        while True:
+            with self.store.lock:
+                record = self.store.get(habit_id)
+                if record is None:
+                    return "The habit does not exist any more!"
+                snapshot = dict(record)
+                version = self.store.version
+
+            selected_habit = Habit.from_record(snapshot)
+            last_done = (parse_timestamp(selected_habit.progress_entries[-1]["timestamp"])
+                         if selected_habit.progress_entries and "timestamp" in selected_habit.progress_entries[-1]
+                         else datetime(1969, 7, 20)) 
+            if selected_habit.is_completed_today():
+                return "The habit has been already done today!"
+            if (selected_habit.frequency == "weekly" 
+                and last_done.isocalendar()[1] == now.isocalendar()[1] 
+                and last_done.year == now.year):
+                return "The habit has been already done this week!"
+            if (selected_habit.frequency == "monthly" 
+                and last_done.month == now.month
+                and last_done.year == now.year):
+                return "The habit has been already done this month!"
+
             selected_habit.complete_habit()
-            selected_habit.update_success_status()
-            selected_habit.update_longest_streak()
+            counter = selected_habit.update_streaks(StreakCounter.from_state(snapshot.get("streak_checkpoint")))
             selected_habit.update_next_deadline()
 
-            loaded_data[item_id]["last_done"] = selected_habit.last_done
-            loaded_data[item_id]["successes"] = selected_habit.successes
-            loaded_data[item_id]["current_streak"] = selected_habit.current_streak
-            loaded_data[item_id]["longest_streak"] = selected_habit.longest_streak
-            loaded_data[item_id]["next_deadline"] = selected_habit.next_deadline
-            loaded_data[item_id]["progress_entries"] = selected_habit.progress_entries
+            fields = {"last_done": selected_habit.end_date,
+                      "successes": selected_habit.successes,
+                      "current_streak": selected_habit.current_streak,
+                      "longest_streak": selected_habit.longest_streak,
+                      "next_deadline": selected_habit.next_deadline,
+                      "streak_checkpoint": counter.to_state()}
+            entry = selected_habit.progress_entries[-1]
+
+            with self.store.lock:
+                if self.store.version != version:
+                    continue
+                record.update(fields)
+                record["progress_entries"].append(entry)
+                self.store.record_progress(self.load_data(), record["habit_id"], entry, fields)
+            return None
+
+    def show_completion(self, message):
+        """
+        Show the outcome of marking a habit as done.
 
-            self.save_data(loaded_data, "habits.json")
-            self.dialog_habbit_number = ""
+        Args:
+            message (str): Message why the habit was not completed, or None if it was.
+        """
+        if message is not None:
+            showinfo("The habit is done", message)
+        elif self.dashboard is not None and self.dashboard_frame.winfo_manager():
             self.dash_func()
-              
+
+    def show_busy(self, busy):
+        """
+        Show whether work is running on the worker thread.
+
+        Args:
+            busy (bool): True while tasks are pending.
+        """
+        self.configure(cursor="watch" if busy else "")
+
+    def show_error(self, error):
+        """
+        Report an error raised on the worker thread.
+
+        Args:
+            error (Exception): The raised exception.
+        """
+        showinfo("Error", str(error))
+
+    def report_write_error(self, error):
+        """
+        Report a failed background write, once per series of failed attempts.
+
+        Called on the writer thread, which retries the write later.
+
+        Args:
+            error (Exception): The raised exception.
+        """
+        if self.store.writer is not None and self.store.writer.failures == 1:
+            self.tasks.post(self.show_error, "Changes could not be saved and will be "
+                                             f"retried: {error}")
+
     def parse_date_time(self, date):
         """
         Parse a date string into a datetime object.
@@ -538,33 +575,40 @@ class App(customtkinter.CTk):
         """
         Display metrics information for a selected habit.
 
-        This method displays metrics information about the selected habit, 
-        including its name, creation date, last done date, streaks, progress, and more.
+        This method loads the selected habit on the worker thread and then
+        displays metrics information about it, including its name, 
+        creation date, last done date, streaks, progress, and more.
         """
-        self.clear_frame()
-        self.right_left_side_panel = customtkinter.CTkFrame(self.right_dashboard, 
-                                                            width=100, 
-                                                            corner_radius=10)
-        self.right_left_side_panel.pack(side=tkinter.LEFT, fill=tkinter.Y, 
-                                        expand=False, padx=5, pady=5)
-        self.selected_value_list = self.load_data("./habits.json")
-
-        if len(self.selected_value_list) == 0:
-            showinfo("No Habits In Your Database", 
-                     "Enter a valid habit no or choose it from dashboard")
-            self.dash_func()
-            self.dialog_habbit_number = ""
-        else: pass
-        
         if self.dialog_habbit_number == "":
             showinfo("Enter a valid habit no", 
                      "Enter a valid habit no or choose it from dashboard")
             self.dash_func()
-            self.dialog_habbit_number = ""
             return
 
-        self.selected_value = self.selected_value_list[int(self.dialog_habbit_number)-1]
+        self.clear_frame()
+        self.tasks.submit(self.store.get, self.dialog_habbit_number, 
+                          key="view", on_done=self.show_metrics)
         self.dialog_habbit_number = ""
+
+    def show_metrics(self, record):
+        """
+        Display the metrics of a habit loaded by metrics_func.
+
+        Args:
+            record (dict): The habit's record, or None if there is no such habit.
+        """
+        if record is None:
+            showinfo("No Habits In Your Database", 
+                     "Enter a valid habit no or choose it from dashboard")
+            self.dash_func()
+            return
+
+        self.selected_value = record
+        self.right_left_side_panel = customtkinter.CTkFrame(self.right_dashboard, 
+                                                            width=100, 
+                                                            corner_radius=10)
+        self.right_left_side_panel.pack(side=tkinter.LEFT, fill=tkinter.Y, 
+                                        expand=False, padx=5, pady=5)
         
         self.logo_label_metric = customtkinter.CTkLabel(self.right_left_side_panel, 
                                                         text="Metrics  \n", 
@@ -590,7 +634,7 @@ class App(customtkinter.CTk):
         habit_texts = ["Habit name: {}".format(self.selected_value["title"]), 
                        "Created on: {}".format(self.selected_value["start_date"]), 
                        "Last done on: {}".format(self.selected_value["last_done"]), 
-                       "Current streak: {}".format(self.selected_value["current_streak"]), 
+                       "Current streak: {}".format(self.current_streak(self.selected_value, datetime.now())),
                        "Goal progress: {}/{}".format(self.selected_value["successes"], self.selected_value["goal"]), 
                        "Longest streak: {}".format(self.selected_value["longest_streak"])]
         for text_ in habit_texts:
@@ -615,248 +659,177 @@ class App(customtkinter.CTk):
         habits within a certain period, top streaks, 
         highest success and failure rates, overall success and failure rates,
         top interval and category performance, and average streak breaks.
+        The habits are loaded and the analytics computed on the worker thread.
         """
         self.clear_frame()
-        data = self.load_data("./habits.json")
+        self.tasks.submit(self.load_data, key="view", on_done=self.show_analytics)
+
+    def show_analytics(self, data):
+        """
+        Display the analytics options once the habits were loaded by analytics_func.
+
+        Every kind of result is shown in a panel that is built on first use
+        and reused afterwards, with only its content swapped in place.
+
+        Args:
+            data (list): Habit records.
+        """
         if data == []:
             showinfo("Error", "No habits availbale to show analytics.First add Habits")
             return
         
-        def clear_frame():
-            try:
-                for wid in self.right_side_dash.winfo_children:
-                    wid.destroy()
-            except Exception as e:
-                pass
-
-        def make_table(format, data, result):
-            clear_frame()
-            try:
-               self.right_side_dash.pack_forget()
-            except Exception as e:
-                pass
-
-            if format == "remainingTime":
-                self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-                self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                          expand=True, pady=5 ,padx=(0, 5))
-                cols = ["Habit", "Remaining Time"]
-                treescroll = ttk.Scrollbar(self.right_side_dash,)
-                treescroll.pack(side = "right", fill = "y")
-                treeview = ttk.Treeview(self.right_side_dash, 
-                                        show="headings", 
-                                        yscrollcommand=treescroll.set, 
-                                        columns=cols, height=13)
-                treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-                treescroll.config(command=treeview.yview)
-
-                treeview.column("Habit", width=100)
-                treeview.column("Remaining Time", width=200)
-
-                treeview.heading("Habit", text="Habit")
-                treeview.heading("Remaining Time", text="Remaining Time")
-
-                count = 1
-                for record in data:
-                    remaining_time = (record["next_deadline"] - datetime.now()).days
-                    lists = [record["title"], remaining_time]
-                    treeview.insert(parent="", index=tkinter.END, iid=count, text="", values=lists)
-                    count+=1
-
-                lists = ["average", result]
-                treeview.insert(parent="", index=tkinter.END, iid=count, text="", values=lists)
-
+        panels = PanelPool(lambda: customtkinter.CTkFrame(self.right_dashboard), 
+                           side=tkinter.LEFT, fill=tkinter.BOTH, 
+                           expand=True, pady=5, padx=(0, 5))
+
+        table_columns = {
+            "activeHabits": [("Habit", 140), ("Last done", 125), 
+                             ("Current streak", 125), ("Progress", 125)],
+            "topStreak": [("Habit", 100), ("Longest streak", 200)],
+            "leaderboard": [("Rank", 60), ("Habit", 140), ("Value", 140)],
+            "completions": [("Period", 140), ("Completions", 140)]
+        }
+
+        def table_rows(format, data, result):
             if format == "activeHabits":
-                self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-                self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                          expand=True, pady=5 ,padx=(0, 5))
-                cols = [
-                    "Habit", 
-                    "Last done", 
-                    "Current streak", 
-                    "Progress", 
-                    "Done"
-                ]
-                treescroll = ttk.Scrollbar(self.right_side_dash,)
-                treescroll.pack(side = "right", fill = "y")
-                treeview = ttk.Treeview(self.right_side_dash,show="headings",
-                                        yscrollcommand=treescroll.set, columns=cols, height=13)
-                treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-                treescroll.config(command=treeview.yview)
-                
-                treeview.column("Habit", width=140)
-                treeview.column("Last done", width=125)
-                treeview.column("Current streak", width=125)
-                treeview.column("Progress", width=125)
-                
-                treeview.heading("Habit", text="Habit")
-                treeview.heading("Last done", text="Last done")
-                treeview.heading("Current streak", text="Current streak")
-                treeview.heading("Progress", text="Progress")
-
-                count = 1
-                for record in data:
-                    lists = [
-                        record["title"],  
-                        datetime.fromisoformat(record["progress_entries"][-1]["timestamp"]).date() if record["progress_entries"] else "-", 
-                        record["current_streak"], 
-                        "{}/{}".format(record["successes"], record["goal"])
-                    ]
-                    treeview.insert(parent="", index=tkinter.END, 
-                                    iid=count, text="", values=lists)
-                    count += 1
-
-            if format == "streaklength": 
-                self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-                self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                          expand=True, pady=5, padx=(0, 5))
-                cols = ["Habit", "Streak Length"]
-                treescroll = ttk.Scrollbar(self.right_side_dash,)
-                treescroll.pack(side = "right", fill = "y")
-                treeview = ttk.Treeview(self.right_side_dash, show="headings", 
-                                        yscrollcommand=treescroll.set, columns=cols, height=13)
-                treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-                treescroll.config(command=treeview.yview)
-
-                treeview.column("Habit", width=100)
-                treeview.column("Streak Length", width=200)
-
-                treeview.heading("Habit", text="Habit")
-                treeview.heading("Streak Length", text="Streak Length")
-
-                count = 1
-                for record in data:
-                    lists = [record["title"], record["longest_streak"]]
-                    treeview.insert(parent="", index=tkinter.END, iid=count, 
-                                    text="", values=lists)
-                    count += 1
-
-                lists = ["average", result]
-                treeview.insert(parent="", index=tkinter.END, 
-                                iid=count, text="", values=lists)
-
+                now = datetime.now()
+                return [[record["title"],  
+                         parse_timestamp(record["progress_entries"][-1]["timestamp"]).date() if record["progress_entries"] else "-", 
+                         self.current_streak(record, now),
+                         "{}/{}".format(record["successes"], record["goal"])] 
+                        for record in data]
             if format == "topStreak":
-                self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-                self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                          expand=True, pady=5, padx=(0, 5))
-                cols = ["Habit", "Longest streak"]
-                treescroll = ttk.Scrollbar(self.right_side_dash)
-                treescroll.pack(side="right", fill="y")
-                treeview = ttk.Treeview(self.right_side_dash, 
-                                        show="headings", 
-                                        yscrollcommand=treescroll.set, 
-                                        columns=cols, 
-                                        height=13)
-                treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-                treescroll.config(command=treeview.yview)
-
-                treeview.column("Habit", width=100)
-                treeview.column("Longest streak", width=200)
-
-                treeview.heading("Habit", text="Habit")
-                treeview.heading("Longest streak", text="Longest streak")
-
-                count = 1
-                for record, streak in zip(data, result):
-                    lists = [record["title"], streak]
-                    treeview.insert(parent="", index=tkinter.END, iid=count, 
-                                    text="", values=lists)
-                    count += 1
+                return [[record["title"], streak] for record, streak in zip(data, result)]
+            if format == "leaderboard":
+                rows = []
+                for title, ranked, value_format in data:
+                    rows.append(["", title, ""])
+                    for rank, (record, value) in enumerate(ranked, 1):
+                        rows.append([rank, record["title"], value_format.format(value)])
+                return rows
+            if format == "completions":
+                rows = [[bucket, completions] for bucket, completions in data.items()]
+                return rows + [["total", result]]
 
-        def make_habits_with_frequency_table():
-            def submit():
-                habits_with_frequency = analytics_methods.habits_with_frequency(habits, frequency.get())
-                make_table("activeHabits", 
-                           [habit.__dict__  for habit in habits_with_frequency], 
-                           habits_with_frequency)
+        def make_table(format, data, result):
+            table = panels.show(format, partial(TablePanel, columns=table_columns[format]))
+            table.set_rows(table_rows(format, data, result))
 
-            clear_frame()
-            try:
-               self.right_side_dash.pack_forget()
-            except Exception as e:
-                pass
+        def build_completions_form(frame):
+            def submit():
+                self.tasks.submit(self.store.completions, period.get(), key="view", 
+                                  on_done=lambda completions: make_table("completions", completions, 
+                                                                         sum(completions.values())))
 
-            self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-            self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                      expand=True, pady=5, padx=(0, 5))
+            text_label = customtkinter.CTkLabel(frame, 
+                                                text="Count completions per", 
+                                                font=customtkinter.CTkFont(size=20))
+            text_label.pack(pady=(25, 5))
+            period = customtkinter.CTkOptionMenu(master=frame,
+                                                 values=["daily", "weekly", "monthly"],
+                                                 command=lambda choice: choice)
+            period.set("monthly")
+            period.pack(pady=5)
+            get_completions_btn = customtkinter.CTkButton(frame, 
+                                                          text="Show completions", 
+                                                          command=submit)
+            get_completions_btn.pack(pady=10)
+
+        def make_completions_table():
+            panels.show("completionsForm", build_completions_form)
+
+        def build_frequency_form(frame):
+            def submit():
+                self.tasks.submit(self.store.habits_with_frequency, frequency.get(), key="view", 
+                                  on_done=lambda habits: make_table("activeHabits", habits, habits))
 
-            text_label = customtkinter.CTkLabel(self.right_side_dash, 
+            text_label = customtkinter.CTkLabel(frame, 
                                                 text="Choose frequency to display", 
                                                 font=customtkinter.CTkFont(size=20))
             text_label.pack(pady=(25, 5))
-            frequency = customtkinter.CTkOptionMenu(master=self.right_side_dash,
+            frequency = customtkinter.CTkOptionMenu(master=frame,
                                                     values=["daily", "weekly", "monthly"],
                                                     command=lambda choice: choice)
             frequency.set("daily")
             frequency.pack(pady=5)
-            get_date_btn = customtkinter.CTkButton(self.right_side_dash, 
+            get_date_btn = customtkinter.CTkButton(frame, 
                                                     text="Show habits", 
                                                     command=submit)
             get_date_btn.pack(pady=10)
 
-        def make_habits_in_period_table(mode, text=""):
+        def make_habits_with_frequency_table():
+            panels.show("frequencyForm", build_frequency_form)
+
+        def build_text(frame):
+            text_label = customtkinter.CTkLabel(frame, 
+                                               text="", 
+                                               font=customtkinter.CTkFont(size=20))
+            text_label.pack(pady=100)
+            return text_label
+
+        def build_period_form(frame):
             def get_date_and_submit():
                 st = start_date.get_date()
                 et = end_date.get_date()
 
-                habits_in_period = analytics_methods.habits_in_period(data, st, et)
-                make_table("activeHabits", [d.__dict__  for d in habits_in_period], 
-                           habits_in_period)
-
-            clear_frame()
-            try:
-               self.right_side_dash.pack_forget()
-            except Exception as e:
-                pass
-
-            self.right_side_dash = customtkinter.CTkFrame(self.right_dashboard)
-            self.right_side_dash.pack(side=tkinter.LEFT, fill=tkinter.BOTH, 
-                                      expand=True, pady=5, padx=(0, 5))
+                self.tasks.submit(self.store.habits_in_period, st, et, key="view", 
+                                  on_done=lambda habits: make_table("activeHabits", habits, habits))
+
+            text_label = customtkinter.CTkLabel(frame, 
+                                               text="Enter Start Date", 
+                                               font=customtkinter.CTkFont(size=20))
+            text_label.pack(pady=5)
+            start_date = DateEntry(frame, background="#242424")
+            start_date.pack(pady=10)
+            text_label = customtkinter.CTkLabel(frame, 
+                                               text="Enter End Date", 
+                                               font=customtkinter.CTkFont(size=20))
+            text_label.pack(pady=5)
+            end_date = DateEntry(frame, background="#242424")
+            end_date.pack(pady=10)
+            get_date_btn = customtkinter.CTkButton(frame, 
+                                                 text="Get Active Habits", 
+                                                 command=get_date_and_submit)
+            get_date_btn.pack(pady=10)
 
+        def make_habits_in_period_table(mode, text=""):
             if mode == "single":
-                text_label = customtkinter.CTkLabel(self.right_side_dash, 
-                                                   text=text, 
-                                                   font=customtkinter.CTkFont(size=20))
-                text_label.pack(pady=100)
+                panels.show("single", build_text).configure(text=text)
             elif mode == "table":
-                text_label = customtkinter.CTkLabel(self.right_side_dash, 
-                                                   text="Enter Start Date", 
-                                                   font=customtkinter.CTkFont(size=20))
-                text_label.pack(pady=5)
-                start_date = DateEntry(self.right_side_dash, background="#242424")
-                start_date.pack(pady=10)
-                text_label = customtkinter.CTkLabel(self.right_side_dash, 
-                                                   text="Enter End Date", 
-                                                   font=customtkinter.CTkFont(size=20))
-                text_label.pack(pady=5)
-                end_date = DateEntry(self.right_side_dash, background="#242424")
-                end_date.pack(pady=10)
-                get_date_btn = customtkinter.CTkButton(self.right_side_dash, 
-                                                     text="Get Active Habits", 
-                                                     command=get_date_and_submit)
-                get_date_btn.pack(pady=10)
-
-        habits = []
-        for datum in data:
-            current = Habit(
-                        datum["title"], 
-                        datum["description"], 
-                        datum["frequency"], 
-                        datum["category"], 
-                        datum["significance"], 
-                        datum["progress_entries"], 
-                        datum["last_done"], 
-                        "edit",
-                        datum["habit_id"]
-            )
-            current.start_date = datetime.fromisoformat(datum["start_date"]).date()
-            current.successes = datum["successes"]
-            current.current_streak = datum["current_streak"]
-            current.longest_streak = datum["longest_streak"]
-            current.next_deadline = datum["next_deadline"]
-            current.goal = datum["goal"]
-            habits.append(current)
-        analytics_methods = Analytics()
+                panels.show("periodForm", build_period_form)
+
+        def show_text(compute):
+            self.tasks.submit(compute, key="view", 
+                              on_done=lambda text: make_habits_in_period_table("single", text))
+
+        def show_metric(format_text):
+            show_text(lambda: format_text(self.analytics.summary()))
+
+        def show_active_habits():
+            def compute():
+                with self.store.lock:
+                    return [dict(record) for record in self.load_data() if record["active"]], None
+
+            self.tasks.submit(compute, key="view", 
+                              on_done=lambda result: make_table("activeHabits", *result))
+
+        def show_leaderboards(count=10):
+            def compute():
+                return [
+                    ("Longest streaks", self.store.leaderboard("longest_streak", count), "{}"),
+                    ("Best success rates", self.store.leaderboard("success_rate", count), "{:.2f}"),
+                    ("Worst success rates", self.store.leaderboard("success_rate", count, worst=True), "{:.2f}")
+                ]
+
+            self.tasks.submit(compute, key="view", 
+                              on_done=lambda leaderboards: make_table("leaderboard", leaderboards, None))
+
+        def show_longest_streaks():
+            def compute():
+                return self.load_data(), [habit.longest_streak for habit in self.analytics.habits()]
+
+            self.tasks.submit(compute, key="view", 
+                              on_done=lambda result: make_table("topStreak", *result))
 
         self.right_left_side_panel = customtkinter.CTkFrame(self.right_dashboard, 
                                                             width=100, 
@@ -866,7 +839,7 @@ class App(customtkinter.CTk):
     
         self.right_left_side_panel.grid_columnconfigure(0, weight=1)
         self.right_left_side_panel.grid_rowconfigure((0, 1, 2, 3, 4, 5, 6, 7, 8,
-                                                      9, 10, 11, 12, 13, 14, 15), 
+                                                      9, 10, 11, 12, 13, 14, 15, 16, 17), 
                                                       weight=0)
         
         self.goal_label = customtkinter.CTkLabel(self.right_left_side_panel, 
@@ -875,19 +848,10 @@ class App(customtkinter.CTk):
         self.goal_label.grid(row=1, column=0, padx=10, pady=(10, 5))
         
         analytics_button_width = 200
-        def get_habit_and_value(habits, habit_id, prompt):
-            for habit in habits:
-                if habit.habit_id == habit_id:
-                    return habit, prompt(habit)
-
-        active_habits = analytics_methods.active_habits(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Active habits", 
                                                width=analytics_button_width, 
-                                               command=partial(make_table, 
-                                                               "activeHabits", 
-                                                               [habit.__dict__  for habit in active_habits], 
-                                                               active_habits))
+                                               command=show_active_habits)
         self.bt_save.grid(row=2, column=0, padx=20, pady=(25, 0))
 
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
@@ -896,26 +860,17 @@ class App(customtkinter.CTk):
                                                command=make_habits_with_frequency_table)
         self.bt_save.grid(row=3, column=0, padx=20, pady=(5, 0))
 
-        top_streak_habit_id = analytics_methods.top_streak_habit(habits)
-        top_streak_habit, top_streak = get_habit_and_value(habits, 
-                                                           top_streak_habit_id, 
-                                                           lambda habit: habit.longest_streak)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Top streak habit", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"The habit with best streak is {top_streak_habit.title}\n with a streak of {top_streak}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"The habit with best streak is {summary.top_streak_habit.title}\n with a streak of {summary.top_streak}"))
         self.bt_save.grid(row=4, column=0, padx=20, pady=(5, 0))
 
-        longest_streaks = [analytics_methods.get_longest_streak(habit) for habit in habits]
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Longest streaks", 
                                                width=analytics_button_width, 
-                                               command=partial(make_table, 
-                                                               "topStreak", 
-                                                               [habit.__dict__ for habit in habits], 
-                                                               longest_streaks))
+                                               command=show_longest_streaks)
         self.bt_save.grid(row=5, column=0, padx=20, pady=(5, 0))
 
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
@@ -924,111 +879,81 @@ class App(customtkinter.CTk):
                                                command=partial(make_habits_in_period_table, "table"))
         self.bt_save.grid(row=6, column=0, padx=20, pady=(5, 0))
 
-        def success_rate(habit):
-            days_since_creation = (datetime.now().date() - habit.start_date).days + 1
-            if habit.frequency == "weekly":
-                days_since_creation = datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] + 1
-            elif habit.frequency == "monthly":
-                days_since_creation = ((datetime.now().date().year - habit.start_date.year) * 12 
-                                        + (datetime.now().date().month - habit.start_date.month) - 1 - len(habit.progress_entries)) + 1
-            days_with_progress = len(habit.progress_entries)
-            return days_with_progress / days_since_creation if days_since_creation else 0
-        highest_success_rate_id = analytics_methods.highest_success_rate(habits)
-        highest_success_rate_habit, highest_success_rate = get_habit_and_value(habits, 
-                                                                               highest_success_rate_id, 
-                                                                               success_rate)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Highest success rate", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"The habit with highest success rate is {highest_success_rate_habit.title}\n with a success rate of {highest_success_rate:.2f}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"The habit with highest success rate is {summary.highest_success_rate_habit.title}\n with a success rate of {summary.highest_success_rate:.2f}"))
         self.bt_save.grid(row=7, column=0, padx=20, pady=(5, 0))
 
-        def failure_rate(habit):
-            days_since_creation = (datetime.now().date() - habit.start_date).days + 1
-            if habit.frequency == "weekly":
-                days_since_creation = datetime.now().date().isocalendar()[1] - habit.start_date.isocalendar()[1] + 1
-            elif habit.frequency == "monthly":
-                days_since_creation = ((datetime.now().date().year - habit.start_date.year) * 12 
-                                        + (datetime.now().date().month - habit.start_date.month) - len(habit.progress_entries)) + 1
-            days_with_progress = len(habit.progress_entries)
-            return (days_since_creation - days_with_progress) / days_since_creation if days_since_creation else 0
-        highest_failure_rate_id = analytics_methods.highest_failure_rate(habits)
-        highest_failure_rate_habit, highest_failure_rate = get_habit_and_value(habits,
-                                                                               highest_failure_rate_id,
-                                                                               failure_rate)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Highest failure rate", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"The habit with highest failure rate is {highest_failure_rate_habit.title}\n with a failure rate of {highest_failure_rate:.2f}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"The habit with highest failure rate is {summary.highest_failure_rate_habit.title}\n with a failure rate of {summary.highest_failure_rate:.2f}"))
         self.bt_save.grid(row=8, column=0, padx=20, pady=(5, 0))
 
-        overall_success = analytics_methods.overall_successes(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Total successes", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"Your total number of successes is {overall_success}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"Your total number of successes is {summary.overall_successes}"))
         self.bt_save.grid(row=9, column=0, padx=20, pady=(5, 0))
 
-        overall_failure = analytics_methods.overall_failures(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Total failures", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"Your total number of failures is {overall_failure}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"Your total number of failures is {summary.overall_failures}"))
         self.bt_save.grid(row=10, column=0, padx=20, pady=(5, 0))
 
-        top_category_performance = analytics_methods.top_category_performance(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Top category performance", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"The category with best perfomance is {top_category_performance}"))
+                                               command=partial(show_text, 
+                                                               lambda: f"The category with best perfomance is {self.store.top_category_performance()}"))
         self.bt_save.grid(row=11, column=0, padx=20, pady=(5, 0))
 
-        top_frequency_performance = analytics_methods.top_frequency_performance(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Top frequency performance",
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"The frequency with best perfomance is {top_frequency_performance}"))
+                                               command=partial(show_text, 
+                                                               lambda: f"The frequency with best perfomance is {self.store.top_frequency_performance()}"))
         self.bt_save.grid(row=12, column=0, padx=20, pady=(5, 0))
 
-        average_streak_length = analytics_methods.average_streak_length(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Average streak length", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single",
-                                                               f"Your average streak length is {average_streak_length:.1f}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"Your average streak length is {summary.average_streak_length:.1f}"))
         self.bt_save.grid(row=13, column=0, padx=20, pady=(5, 0))
 
-        average_streak_break = analytics_methods.average_streak_break(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Average streak break", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single", 
-                                                               f"Your average streak break is {average_streak_break:.1f}"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"Your average streak break is {summary.average_streak_break:.1f}"))
         self.bt_save.grid(row=14, column=0, padx=20, pady=(5, 0))
 
-        average_remaining_time = analytics_methods.average_remaining_time(habits)
         self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
                                                text="Average remaining time", 
                                                width=analytics_button_width, 
-                                               command=partial(make_habits_in_period_table, 
-                                                               "single",
-                                                               f"Your average remaining time is {average_remaining_time:.1f} day(s)"))
+                                               command=partial(show_metric, 
+                                                               lambda summary: f"Your average remaining time is {summary.average_remaining_time:.1f} day(s)"))
         self.bt_save.grid(row=15, column=0, padx=20, pady=(5, 0))
 
+        self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
+                                               text="Leaderboards", 
+                                               width=analytics_button_width, 
+                                               command=show_leaderboards)
+        self.bt_save.grid(row=16, column=0, padx=20, pady=(5, 0))
+
+        self.bt_save = customtkinter.CTkButton(master=self.right_left_side_panel, 
+                                               text="Completions per period", 
+                                               width=analytics_button_width, 
+                                               command=make_completions_table)
+        self.bt_save.grid(row=17, column=0, padx=20, pady=(5, 0))
+
     def edit_func(self):
         """
         Display an edit page for a selected habit.
@@ -1036,7 +961,7 @@ class App(customtkinter.CTk):
         This method loads a list of habits, lets the user select a habit to edit,
         and then displays an edit page where the user can modify habit information.
         """
-        self.selected_value_list = self.load_data("./habits.json")
+        self.selected_value_list = self.load_data()
 
         if len(self.selected_value_list) == 0:
             showinfo("No Habits In Your Database", 
@@ -1052,7 +977,7 @@ class App(customtkinter.CTk):
             self.dialog_habbit_number = ""
             return
 
-        self.selected_value = self.selected_value_list[int(self.dialog_habbit_number) - 1]
+        self.selected_value = self.store.get(self.dialog_habbit_number)
         self.clear_frame()
 
         self.right_left_side_panel = customtkinter.CTkFrame(self.right_dashboard, 
@@ -1077,8 +1002,7 @@ class App(customtkinter.CTk):
                                                text="Save changes", 
                                                command=partial(self.save_changes, 
                                                                "edit", 
-                                                               self.dialog_habbit_number, 
-                                                               self.selected_value["progress_entries"]))
+                                                               self.dialog_habbit_number))
         self.bt_save.grid(row=2, column=0, padx=20, pady=(100, 0))
         
         def optionmenu_callback(choice):
@@ -1171,49 +1095,43 @@ class App(customtkinter.CTk):
         Open a history window to display when the habit was marked.
 
         This method creates a new top-level window to show the history of when
-        the habit was marked as completed. The history is displayed in a treeview.
+        the habit was marked as completed, newest first. Only the rows in view 
+        are read from the habit store, page by page as the user scrolls, and 
+        the view can jump to the last time the habit was marked on or before 
+        a chosen date.
 
         Args:
         selected (dict): The selected habit's data.
         """
+        habit_id = selected["habit_id"]
         top_level = customtkinter.CTkToplevel(self)
         top_level.geometry("600x400")
         top_level.resizable(False, False)
         top_level.title("Last times when you mark the habits")
-        progress_list = selected["progress_entries"]
         top_level.wm_attributes('-topmost', 1)
 
-        cols = ["Date", "Time"]
-        treescroll = ttk.Scrollbar(top_level,)
-        treescroll.pack(side="right", fill="y")
-        treeview = ttk.Treeview(top_level, 
-                                show="headings", 
-                                yscrollcommand=treescroll.set, 
-                                columns=cols, 
-                                height=13)
-        treeview.pack(side="top",
-                      fill="both", 
-                      expand=True, 
-                      padx=5, 
-                      pady=5)
-        treescroll.config(command=treeview.yview)
-        
-        treeview.column("Date", width=200)
-        treeview.column("Time", width=200)
-        
-        treeview.heading("Date", text="Date")
-        treeview.heading("Time", text="Time")
-
-        count = 1
-        for record in progress_list:
-            timestamp = datetime.fromisoformat(record["timestamp"])
-            lists = [timestamp.date(), timestamp.time()]
-            treeview.insert(parent="", 
-                            index=tkinter.END, 
-                            iid=count, 
-                            text="", 
-                            values=lists)
-            count += 1
+        def fetch_rows(start, stop):
+            rows = []
+            for position, record in enumerate(self.store.history_page(habit_id, start, stop), start):
+                timestamp = parse_timestamp(record["timestamp"])
+                rows.append((position, [timestamp.date(), timestamp.time()]))
+            return rows
+
+        def jump_to_date():
+            history.scroll_to(self.store.history_position(habit_id, jump_date.get_date()))
+
+        controls = customtkinter.CTkFrame(top_level, fg_color="transparent")
+        controls.pack(side="bottom", fill="x", padx=5, pady=5)
+        jump_date = DateEntry(controls, background="#242424")
+        jump_date.pack(side="left", padx=5)
+        jump_button = customtkinter.CTkButton(controls, 
+                                              text="Go to date", 
+                                              command=jump_to_date)
+        jump_button.pack(side="left", padx=5)
+        history = VirtualTreeview(top_level, 
+                                  [("Date", 200), ("Time", 200)], 
+                                  fetch_rows, 
+                                  len(selected["progress_entries"]))
     
     def change_scaling_event(self, new_scaling: str):
         """
@@ -1232,18 +1150,30 @@ class App(customtkinter.CTk):
         """
         Close the application window.
 
-        This method closes the application window.
+        This method waits for running work, writes any pending changes and 
+        closes the application window.
         """ 
+        self.tasks.close()
+        try:
+            self.store.close()
+        except Exception as error:
+            self.show_error(f"Changes could not be saved: {error}")
         App.destroy(self)
           
     def clear_frame(self):
         """
         Clear the contents of the right dashboard frame.
 
-        This method removes all widgets from the right dashboard frame.
+        This method removes all widgets from the right dashboard frame,
+        except for the dashboard itself, which is only hidden, and cancels
+        the work still pending for the view that is left.
         """
+        self.tasks.cancel("view")
         for widget in self.right_dashboard.winfo_children():
-            widget.destroy()
+            if self.dashboard is not None and widget is self.dashboard_frame:
+                widget.pack_forget()
+            else:
+                widget.destroy()
 
 a = App()
 a.mainloop()
\ No newline at end of file
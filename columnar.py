@@ -0,0 +1,326 @@
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+
+import numpy as np
+
+from analytics import AnalyticsSummary, EvaluationContext
+
+KINDS = {"daily": 0, "weekly": 1, "monthly": 2}
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+def factorize(values):
+    """
+    Encode values as integer codes in order of their first occurrence.
+
+    :param values: Iterable of hashable values.
+    :return: Tuple of the code array and the list of distinct values.
+    """
+    values = list(values)
+    distinct = list(dict.fromkeys(values))
+    codes = {value: code for code, value in enumerate(distinct)}
+    return np.fromiter(map(codes.__getitem__, values), np.int64, len(values)), distinct
+
+def iso_weeks(ordinals):
+    """
+    Return the ISO week numbers of proleptic Gregorian ordinals.
+
+    :param ordinals: Array of date ordinals, as returned by date.toordinal.
+    :return: Array of ISO week numbers (1 to 53).
+    """
+    thursdays = ordinals - (ordinals - 1) % 7 + 3
+    years = (thursdays - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[Y]")
+    new_years = years.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    return (thursdays - new_years) // 7 + 1
+
+def month_numbers(ordinals):
+    """
+    Return year * 12 + month - 1 of proleptic Gregorian ordinals.
+
+    :param ordinals: Array of date ordinals, as returned by date.toordinal.
+    :return: Array of month numbers, consecutive across years.
+    """
+    return (ordinals - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+
+def to_microseconds(value):
+    """
+    Convert a deadline to microseconds since the epoch.
+
+    :param value: Datetime or "%Y-%m-%d %H:%M:%S" formatted string.
+    :return: Microseconds since 1970-01-01 00:00:00 (naive, local time).
+    """
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def to_microsecond_array(values):
+    """
+    Convert deadlines to microseconds since the epoch in one NumPy conversion.
+
+    :param values: Sequence of datetimes or "%Y-%m-%d %H:%M:%S" formatted strings.
+    :return: Array of microseconds since 1970-01-01 00:00:00, undefined where a value is missing.
+    """
+    return np.array([value or "NaT" for value in values], "datetime64[us]").astype(np.int64)
+
+
+class HabitColumns:
+    """
+    Habit values laid out as columnar NumPy arrays, one element per habit.
+
+    Frequencies and categories are encoded as integer codes in the order they
+    first occur, so grouped results break ties the same way as Analytics.
+    Every column is read with a C-level map over the habits, without a Python
+    frame per habit, and the deadlines are parsed by NumPy.
+    """
+    def __init__(self, habits):
+        """
+        Load the habits into columns.
+
+        :param habits: List of Habit objects.
+        """
+        self.habits = habits
+        count = len(habits)
+        def column(name):
+            return map(attrgetter(name), habits)
+        self.habit_ids = list(column("habit_id"))
+        self.active = np.fromiter(map(bool, column("active")), bool, count)
+        self.start = np.fromiter(map(date.toordinal, column("start_date")), np.int64, count)
+        self.start_week = iso_weeks(self.start)
+        self.start_month = month_numbers(self.start)
+        self.frequency, self.frequencies = factorize(column("frequency"))
+        self.kind = np.array([KINDS.get(frequency, -1) for frequency in self.frequencies],
+                             np.int64)[self.frequency]
+        self.category, self.categories = factorize(column("category"))
+        self.successes = np.fromiter(column("successes"), np.int64, count)
+        self.current_streak = np.fromiter(column("current_streak"), np.int64, count)
+        self.longest_streak = np.fromiter(column("longest_streak"), np.int64, count)
+        self.entries = np.fromiter(map(len, column("progress_entries")), np.int64, count)
+        deadlines = list(column("next_deadline"))
+        self.has_deadline = np.fromiter(map(bool, deadlines), bool, count)
+        self.deadline = np.where(self.has_deadline, to_microsecond_array(deadlines), 0)
+
+    @classmethod
+    def of(cls, habits):
+        """
+        Return the columns of the habits, loading them unless they already are.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: HabitColumns.
+        """
+        return habits if isinstance(habits, cls) else cls(habits)
+
+    def __len__(self):
+        return len(self.habits)
+
+
+class ColumnarAnalytics:
+    """
+    Vectorized implementation of the Analytics methods for large habit collections.
+
+    Every method accepts a list of Habit objects or, to skip loading them
+    again, the HabitColumns of a list, and returns the same result as the
+    corresponding Analytics method.
+    """
+    def __init__(self, context=None):
+        """
+        Initialize the engine.
+
+        :param context: EvaluationContext the metrics are evaluated in, defaults to the time of each call.
+        """
+        self.context = context
+
+    def _today(self):
+        context = EvaluationContext.of(self.context)
+        return context.today.toordinal(), context.week, context.month - 1
+
+    def _periods(self, columns, monthly_offset):
+        today, week, month = self._today()
+        periods = today - columns.start + 1
+        periods = np.where(columns.kind == KINDS["weekly"], week - columns.start_week + 1, periods)
+        return np.where(columns.kind == KINDS["monthly"],
+                        month - columns.start_month + monthly_offset - columns.entries, periods)
+
+    def _missed(self, columns):
+        today, week, month = self._today()
+        missed = np.where(columns.kind == KINDS["weekly"], week - columns.start_week,
+                          month - columns.start_month - 1)
+        missed = np.where(columns.kind == KINDS["daily"], today - columns.start, missed)
+        return missed - columns.entries
+
+    def success_rates(self, habits):
+        """
+        Return the success rate of every habit, as used by highest_success_rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Array of success rates.
+        """
+        columns = HabitColumns.of(habits)
+        periods = self._periods(columns, 0)
+        return np.divide(columns.entries, periods, out=np.zeros(len(columns)), where=periods != 0)
+
+    def failure_rates(self, habits):
+        """
+        Return the failure rate of every habit, as used by highest_failure_rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Array of failure rates.
+        """
+        columns = HabitColumns.of(habits)
+        periods = self._periods(columns, 1)
+        return np.divide(periods - columns.entries, periods, out=np.zeros(len(columns)),
+                         where=periods != 0)
+
+    def active_habits(self, habits):
+        """
+        Return a list of active habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: List of active Habit objects.
+        """
+        columns = HabitColumns.of(habits)
+        return [columns.habits[index] for index in np.flatnonzero(columns.active)]
+
+    def top_streak_habit(self, habits):
+        """
+        Return the habit_id of the habit with the highest streak.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Habit ID with the highest streak.
+        """
+        columns = HabitColumns.of(habits)
+        return columns.habit_ids[int(np.argmax(columns.longest_streak))]
+
+    def highest_success_rate(self, habits):
+        """
+        Return the habit_id of the habit with the highest success rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Habit ID with the highest success rate.
+        """
+        columns = HabitColumns.of(habits)
+        return columns.habit_ids[int(np.argmax(self.success_rates(columns)))]
+
+    def highest_failure_rate(self, habits):
+        """
+        Return the habit_id of the habit with the highest failure rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Habit ID with the highest failure rate.
+        """
+        columns = HabitColumns.of(habits)
+        return columns.habit_ids[int(np.argmax(self.failure_rates(columns)))]
+
+    def overall_successes(self, habits):
+        """
+        Return the total number of successes across all habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Total number of successes.
+        """
+        return int(HabitColumns.of(habits).successes.sum())
+
+    def overall_failures(self, habits):
+        """
+        Return the total number of failures across all habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Total number of failures.
+        """
+        return max(int(self._missed(HabitColumns.of(habits)).sum()), 0)
+
+    def _top_group(self, codes, names, columns):
+        ratios = np.divide(columns.successes, columns.entries, out=np.zeros(len(columns)),
+                           where=columns.entries != 0)
+        sums = np.bincount(codes, weights=ratios, minlength=len(names))
+        counts = np.bincount(codes, minlength=len(names))
+        return names[int(np.argmax(sums / counts))]
+
+    def top_category_performance(self, habits):
+        """
+        Return the category with the highest average success rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Category with the highest average success rate.
+        """
+        columns = HabitColumns.of(habits)
+        return self._top_group(columns.category, columns.categories, columns)
+
+    def top_frequency_performance(self, habits):
+        """
+        Return the interval with the highest average success rate.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Interval with the highest average success rate.
+        """
+        columns = HabitColumns.of(habits)
+        return self._top_group(columns.frequency, columns.frequencies, columns)
+
+    def average_streak_length(self, habits):
+        """
+        Calculate the average length of the longest streak across all habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Average length of the longest streak.
+        """
+        columns = HabitColumns.of(habits)
+        return int(columns.longest_streak.sum()) / len(columns)
+
+    def average_streak_break(self, habits):
+        """
+        Calculate the average number of missed periods across all habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Average number of missed periods.
+        """
+        columns = HabitColumns.of(habits)
+        return int(self._missed(columns).sum()) / len(columns) if len(columns) else 0
+
+    def average_remaining_time(self, habits):
+        """
+        Calculate the average remaining time until the next deadline.
+
+        Unlike Analytics.average_remaining_time, the habits are not modified.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :return: Average remaining time in days.
+        """
+        columns = HabitColumns.of(habits)
+        deadlines = columns.deadline[columns.has_deadline]
+        if not len(deadlines):
+            return 0
+        now = to_microseconds(EvaluationContext.of(self.context).now)
+        return int(((deadlines - now) // MICROSECONDS_PER_DAY).sum()) / len(deadlines)
+
+    def summarize(self, habits, context=None):
+        """
+        Compute all dashboard metrics of the habits.
+
+        :param habits: HabitColumns or list of Habit objects.
+        :param context: EvaluationContext the metrics are evaluated in, defaults to the engine's.
+        :return: AnalyticsSummary with the same values as Analytics.summarize.
+        """
+        columns = HabitColumns.of(habits)
+        engine = ColumnarAnalytics(EvaluationContext.of(context or self.context))
+        summary = AnalyticsSummary(habit_count=len(columns),
+                                   active_habits=engine.active_habits(columns))
+        if not len(columns):
+            return summary
+        successes = engine.success_rates(columns)
+        failures = engine.failure_rates(columns)
+        top_streak = int(np.argmax(columns.longest_streak))
+        best, worst = int(np.argmax(successes)), int(np.argmax(failures))
+        summary.top_streak_habit = columns.habits[top_streak]
+        summary.top_streak = columns.habits[top_streak].longest_streak
+        summary.highest_success_rate_habit = columns.habits[best]
+        summary.highest_success_rate = float(successes[best])
+        summary.highest_failure_rate_habit = columns.habits[worst]
+        summary.highest_failure_rate = float(failures[worst])
+        summary.overall_successes = engine.overall_successes(columns)
+        summary.overall_failures = engine.overall_failures(columns)
+        summary.top_category_performance = engine.top_category_performance(columns)
+        summary.top_frequency_performance = engine.top_frequency_performance(columns)
+        summary.average_streak_length = engine.average_streak_length(columns)
+        summary.average_streak_break = engine.average_streak_break(columns)
+        summary.average_remaining_time = engine.average_remaining_time(columns)
+        return summary
@@ -1,5 +1,12 @@
-from datetime import datetime, timedelta
-import json
+from array import array
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+from functools import partial
+from operator import attrgetter, itemgetter
+
+from storage import HABITS_FILE, IdSequence, last_habit_id
+
+habit_ids = IdSequence(HABITS_FILE + ".seq", seed=partial(last_habit_id, HABITS_FILE))
 
 def generateHabitId(mode, id):
     """
@@ -10,23 +17,297 @@ def generateHabitId(mode, id):
     :return: Generated habit ID as a string.
     """
     if mode == "add":
-        file = open("./habits.json", "r")
-        data = json.loads(file.read())
-        if data == []:
-            habit_id = 1
-        else:
-            habit_id = int(data[-1]["habit_id"]) + 1
-        file.close()
-        return habit_id
+        return habit_ids.next_id()
     elif mode == "edit":
         habit_id = id
         return habit_id
 
 
+EPOCH = datetime(1970, 1, 1)
+
+def parse_timestamp(value):
+    """
+    Convert a stored progress timestamp to a datetime.
+
+    :param value: Timestamp as a datetime or an ISO formatted string.
+    :return: The timestamp as a datetime.
+    """
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def to_epoch(entry):
+    """
+    Convert a progress entry to whole seconds since the epoch.
+
+    :param entry: Progress entry dict, datetime or ISO formatted string.
+    :return: Seconds since 1970-01-01 00:00:00 (naive, local time).
+    """
+    if isinstance(entry, dict):
+        entry = entry["timestamp"]
+    return (parse_timestamp(entry) - EPOCH) // timedelta(seconds=1)
+
+def from_epoch(seconds):
+    """
+    Convert seconds since the epoch back to a datetime.
+
+    :param seconds: Seconds since 1970-01-01 00:00:00.
+    :return: The corresponding naive datetime.
+    """
+    return EPOCH + timedelta(seconds=seconds)
+
+
+class ProgressLog(Sequence):
+    """
+    Compact list of progress entries, stored as seconds since the epoch.
+
+    Entries are kept in a contiguous array('q') buffer instead of one dict and
+    one timestamp object per completion. Indexing and iteration still yield
+    {"timestamp": datetime} entries. A log created from entries that are read
+    on demand (e.g. a LazyProgress) converts them only once they are needed;
+    its length, latest entry and the entries appended to it are available
+    without reading them.
+    """
+    __slots__ = ("_epochs", "_source", "_tail")
+
+    def __init__(self, entries=()):
+        """
+        Initialize a ProgressLog from progress entries.
+
+        :param entries: Progress entry dicts, datetimes or ISO formatted strings.
+        """
+        self._tail = array("q")
+        if getattr(entries, "loaded", True):
+            self._epochs = array("q", (to_epoch(entry) for entry in entries))
+            self._source = None
+        else:
+            self._epochs = None
+            self._source = entries
+
+    @property
+    def loaded(self):
+        """
+        Whether the entries the log was created from have been converted.
+        """
+        return self._epochs is not None
+
+    @property
+    def epochs(self):
+        """
+        The array of all entries as seconds since the epoch.
+        """
+        if self._epochs is None:
+            self._epochs = array("q", (to_epoch(entry) for entry in self._source)) + self._tail
+            self._source = None
+            self._tail = array("q")
+        return self._epochs
+
+    @epochs.setter
+    def epochs(self, epochs):
+        self._epochs, self._source, self._tail = epochs, None, array("q")
+
+    def __len__(self):
+        if self._epochs is None:
+            return len(self._source) + len(self._tail)
+        return len(self._epochs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            log = ProgressLog()
+            count = len(self)
+            start, stop, step = index.indices(count)
+            if self._epochs is None and step == 1 and start >= count - len(self._tail):
+                offset = count - len(self._tail)
+                log.epochs = self._tail[start - offset:stop - offset]
+            else:
+                log.epochs = self.epochs[index]
+            return log
+        if self._epochs is None and index == -1 and len(self):
+            return {"timestamp": from_epoch(self._tail[-1] if self._tail else to_epoch(self._source[-1]))}
+        return {"timestamp": from_epoch(self.epochs[index])}
+
+    def __iter__(self):
+        return ({"timestamp": timestamp} for timestamp in self.timestamps())
+
+    def __eq__(self, other):
+        if isinstance(other, ProgressLog):
+            return self.epochs == other.epochs
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ProgressLog({len(self)} entries)"
+
+    def timestamps(self):
+        """
+        Yield the timestamps of the progress entries.
+
+        :return: Generator of datetimes.
+        """
+        return (from_epoch(seconds) for seconds in self.epochs)
+
+    def append(self, entry):
+        """
+        Append a progress entry.
+
+        :param entry: Progress entry dict, datetime or ISO formatted string.
+        """
+        if self._epochs is None:
+            self._tail.append(to_epoch(entry))
+        else:
+            self._epochs.append(to_epoch(entry))
+
+    def to_entries(self):
+        """
+        Return the progress entries in their stored form.
+
+        :return: List of {"timestamp": "YYYY-MM-DD HH:MM:SS"} dicts.
+        """
+        return [{"timestamp": str(timestamp)} for timestamp in self.timestamps()]
+
+
+def period_key(timestamp, frequency):
+    """
+    Return the number of the period a timestamp falls into.
+
+    Consecutive days, ISO weeks or months have consecutive numbers.
+
+    :param timestamp: Datetime or date.
+    :param frequency: Frequency of the habit (daily, weekly, monthly).
+    :return: Period number.
+    """
+    if frequency == "daily":
+        return timestamp.toordinal()
+    elif frequency == "weekly":
+        return (timestamp.toordinal() - 1) // 7
+    elif frequency == "monthly":
+        return timestamp.year * 12 + timestamp.month - 1
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+
+class StreakCounter:
+    """
+    Derives the successes and streaks of a habit from its progress entries.
+
+    Completions are bucketed into days, ISO weeks or months according to the
+    habit's frequency; a streak is a run of consecutive periods with at least
+    one completion. The counter is a checkpoint of the entries processed so
+    far, so updating it after new completions were appended only processes
+    the new entries. The checkpoint is stored with the habit record (see
+    to_state), so this also holds across sessions.
+    """
+    __slots__ = ("frequency", "processed", "last_period", "run", "longest", "successes")
+
+    def __init__(self, frequency=None):
+        """
+        Initialize an empty StreakCounter.
+
+        :param frequency: Frequency of the habit, or None to take it from the first update.
+        """
+        self.reset(frequency)
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restore a counter from the checkpoint stored with a habit record.
+
+        :param state: List as returned by to_state, or None for a new counter.
+        :return: StreakCounter.
+        """
+        counter = cls()
+        if state:
+            (counter.frequency, counter.processed, counter.last_period,
+             counter.run, counter.longest, counter.successes) = state
+        return counter
+
+    def to_state(self):
+        """
+        Return the checkpoint to be stored with the habit record.
+
+        :return: List of plain values, as accepted by from_state.
+        """
+        return [self.frequency, self.processed, self.last_period,
+                self.run, self.longest, self.successes]
+
+    def reset(self, frequency):
+        """
+        Forget all processed entries.
+
+        :param frequency: Frequency of the habit.
+        """
+        self.frequency = frequency
+        self.processed = 0
+        self.last_period = None
+        self.run = 0
+        self.longest = 0
+        self.successes = 0
+
+    def _add(self, period):
+        if self.last_period is not None and period <= self.last_period:
+            return
+        if self.last_period is not None and period == self.last_period + 1:
+            self.run += 1
+        else:
+            self.run = 1
+        self.last_period = period
+        self.successes += 1
+        self.longest = max(self.longest, self.run)
+
+    def update(self, habit):
+        """
+        Process the progress entries added to the habit since the last update.
+
+        The counter starts over if the habit's frequency changed, entries were
+        removed or a new entry is older than the ones processed before.
+
+        :param habit: Habit object.
+        :return: The counter itself.
+        """
+        progress = habit.progress_entries
+        if habit.frequency != self.frequency or len(progress) < self.processed:
+            self.reset(habit.frequency)
+        periods = [period_key(timestamp, self.frequency)
+                   for timestamp in progress[self.processed:].timestamps()]
+        if periods and self.last_period is not None and min(periods) < self.last_period:
+            self.reset(habit.frequency)
+            periods = [period_key(timestamp, self.frequency) for timestamp in progress.timestamps()]
+        for period in sorted(periods):
+            self._add(period)
+        self.processed = len(progress)
+        return self
+
+    def current_streak(self, now=None):
+        """
+        Return the streak that is still running at the given time.
+
+        :param now: Date or datetime to evaluate the streak at, defaults to now.
+        :return: Length of the streak, or 0 if the previous period was missed as well.
+        """
+        if self.last_period is None:
+            return 0
+        if self.last_period < period_key(now or datetime.now(), self.frequency) - 1:
+            return 0
+        return self.run
+
+
 class Habit:
     """
     Represents a habit with its details and progress.
     """
+    RECORD_FIELDS = (("habit_id", "habit_id"), ("title", "title"),
+                     ("description", "description"), ("active", "active"),
+                     ("start_date", "start_date"), ("last_done", "end_date"),
+                     ("frequency", "frequency"), ("successes", "successes"),
+                     ("current_streak", "current_streak"),
+                     ("longest_streak", "longest_streak"), ("category", "category"),
+                     ("significance", "significance"), ("next_deadline", "next_deadline"),
+                     ("progress_entries", "progress_entries"), ("goal", "goal"))
+    RECORD_KEYS = tuple(key for key, _ in RECORD_FIELDS)
+
+    __slots__ = tuple(attribute for _, attribute in RECORD_FIELDS)
+
+    _get_record_values = itemgetter(*RECORD_KEYS)
+    _get_attribute_values = attrgetter(*__slots__)
+
     def __init__(self, title, description, 
                  frequency, category, significance, 
                  progress_entries, last_done, mode, id="",  
@@ -40,7 +321,7 @@ class Habit:
         :param frequency: Frequency of the habit (daily, weekly, monthly).
         :param category: Category of the habit.
         :param significance: Significance level of the habit.
-        :param progress_entries: List of progress entries for the habit.
+        :param progress_entries: List of progress entries for the habit, kept as a ProgressLog.
         :param end_date: End date of the habit.
         :param mode: Mode indicating whether the habit is being added or edited.
         :param id: ID of the habit.
@@ -59,8 +340,40 @@ class Habit:
         self.category = category
         self.significance = significance
         self.next_deadline = next_deadline
+        if not isinstance(progress_entries, ProgressLog):
+            progress_entries = ProgressLog(progress_entries)
         self.progress_entries = progress_entries
         self.goal = 0
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Create a Habit from a stored habit record.
+
+        :param record: Habit record as stored in the habit data file.
+        :return: Habit object holding the record's values.
+        """
+        habit = cls.__new__(cls)
+        for attribute, value in zip(cls.__slots__, cls._get_record_values(record)):
+            setattr(habit, attribute, value)
+        if isinstance(habit.start_date, str):
+            habit.start_date = date.fromisoformat(habit.start_date)
+        if not isinstance(habit.progress_entries, ProgressLog):
+            habit.progress_entries = ProgressLog(habit.progress_entries)
+        return habit
+
+    def to_record(self):
+        """
+        Convert the habit to its stored record form.
+
+        :return: Habit record with dates and timestamps as strings.
+        """
+        record = dict(zip(self.RECORD_KEYS, self._get_attribute_values(self)))
+        for key in ("start_date", "last_done"):
+            if isinstance(record[key], date):
+                record[key] = str(record[key])
+        record["progress_entries"] = self.progress_entries.to_entries()
+        return record
     
     def complete_habit(self):
         """
@@ -91,7 +404,7 @@ class Habit:
         if not self.progress_entries:
             return False
         latest_entry = self.progress_entries[-1]
-        return datetime.now().date() == latest_entry["timestamp"].date()
+        return datetime.now().date() == parse_timestamp(latest_entry["timestamp"]).date()
 
     def days_remaining(self):
         """
@@ -125,4 +438,18 @@ class Habit:
             self.current_streak += 1
         else:
             self.reset_current_streak()
-        self.update_longest_streak()
\ No newline at end of file
+        self.update_longest_streak()
+
+    def update_streaks(self, counter=None, now=None):
+        """
+        Derive successes, current and longest streak from the progress entries.
+
+        :param counter: StreakCounter checkpoint of an earlier update of this habit, if any.
+        :param now: Date or datetime the current streak is evaluated at, defaults to now.
+        :return: The updated StreakCounter, to be passed to the next update.
+        """
+        counter = (counter or StreakCounter()).update(self)
+        self.successes = counter.successes
+        self.current_streak = counter.current_streak(now)
+        self.longest_streak = counter.longest
+        return counter
\ No newline at end of file
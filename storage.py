@@ -0,0 +1,2236 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Sequence
+from datetime import date, datetime
+from fractions import Fraction
+from functools import partial, wraps
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+HABITS_FILE = os.environ.get("HABITS_FILE", "./habits.json")
+
+
+class LazyProgress(Sequence):
+    """
+    Progress entries of a habit that are only read from storage when needed.
+
+    The number of entries and the latest entry are known up front, so len()
+    and [-1] are answered without reading the history. Entries appended before
+    the history is read are kept aside and added to it once it is loaded.
+    """
+    def __init__(self, count, last, loader):
+        """
+        Initialize a LazyProgress from a habit's progress summary.
+
+        :param count: Number of stored progress entries.
+        :param last: The latest stored progress entry, or None if there is none.
+        :param loader: Callable returning the stored progress entries.
+        """
+        self._count = count
+        self._last = last
+        self._loader = loader
+        self._entries = None
+        self._tail = []
+
+    @property
+    def loaded(self):
+        """
+        Whether the stored history has been read.
+        """
+        return self._entries is not None
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._loader() + self._tail
+            self._tail = []
+        return self._entries
+
+    def pending(self):
+        """
+        Return the entries held in memory without reading the stored history.
+
+        :return: All entries if the history is loaded, the appended ones otherwise.
+        """
+        return self._entries if self._entries is not None else self._tail
+
+    def __len__(self):
+        if self._entries is not None:
+            return len(self._entries)
+        return self._count + len(self._tail)
+
+    def __getitem__(self, index):
+        if self._entries is None and index == -1 and len(self):
+            return self._tail[-1] if self._tail else self._last
+        return self._load()[index]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"LazyProgress({len(self)} entries)"
+
+    def append(self, entry):
+        """
+        Append a progress entry without reading the stored history.
+
+        :param entry: The new progress entry.
+        """
+        self.pending().append(entry)
+
+
+def encode_value(value):
+    """
+    Convert a value the json module cannot serialize on its own.
+
+    :param value: Value to be converted.
+    :return: List of entries for lazily loaded progress, the string form otherwise.
+    """
+    if isinstance(value, LazyProgress):
+        return list(value)
+    return str(value)
+
+
+def atomic_write(filename, content):
+    """
+    Write a file so that readers see either its old or its new content.
+
+    The content is written to a temporary file next to the target, flushed to
+    disk and then moved over the target with os.replace.
+
+    :param filename: Path of the file to be written.
+    :param content: Text or bytes to be written.
+    """
+    temp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(temp_filename, mode) as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+
+
+class ProgressJournal:
+    """
+    Append-only log of habit completions kept next to the habit data file.
+
+    Every completion is written as a single JSON line, so marking a habit done
+    costs one small append instead of rewriting the whole data file. Edits of
+    a habit's fields are journaled the same way, without an entry. A torn
+    last line is terminated before the next append, so it stays the only
+    line that is skipped.
+
+    Every record carries the journal generation it was written in. Saving the
+    data file bumps the generation stored in it, so records left behind by a
+    crash between writing the data file and clearing the journal are skipped
+    instead of being applied twice.
+    """
+    def __init__(self, filename):
+        """
+        Initialize a ProgressJournal backed by the given file.
+
+        :param filename: Path of the journal file.
+        """
+        self.filename = filename
+        self.generation = 0
+
+    def append(self, habit_id, entry, fields):
+        """
+        Append a completion record to the journal.
+
+        :param habit_id: ID of the completed habit.
+        :param entry: Progress entry to add to the habit's progress_entries, or
+                      None if only fields changed.
+        :param fields: Habit fields updated by the completion (streaks, deadline, ...).
+        """
+        line = json.dumps({"habit_id": habit_id, "entry": entry, "fields": fields,
+                           "generation": self.generation},
+                          default=encode_value)
+        with open(self.filename, "ab") as file:
+            if file.tell() and not self._ends_with_newline():
+                line = "\n" + line
+            file.write((line + "\n").encode("utf-8"))
+
+    def _ends_with_newline(self):
+        with open(self.filename, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def records(self):
+        """
+        Read the records stored in the journal.
+
+        A torn last line (e.g. after a crash mid-append) is skipped, as are
+        records of an older generation that are already part of the data file.
+
+        :return: List of journal records in the order they were appended.
+        """
+        try:
+            with open(self.filename, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("generation", self.generation) >= self.generation:
+                records.append(record)
+        return records
+
+    def replay(self, data, records=None):
+        """
+        Fold the journaled completions into the loaded habit records.
+
+        :param data: List of habit records loaded from the data file.
+        :param records: Journal records to apply, read from the journal if omitted.
+        :return: The same list with the journaled completions applied.
+        """
+        if records is None:
+            records = self.records()
+        if not records:
+            return data
+        by_id = {str(record["habit_id"]): record for record in data}
+        for journaled in records:
+            record = by_id.get(str(journaled["habit_id"]))
+            if record is None:
+                continue
+            if journaled["entry"] is not None:
+                record["progress_entries"].append(journaled["entry"])
+            record.update(journaled["fields"])
+        return data
+
+    def clear(self):
+        """
+        Remove all records from the journal.
+        """
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+
+def split_generation(document):
+    """
+    Split a stored habit document into its journal generation and records.
+
+    Data files written before journal generations were introduced hold a bare
+    list of records and count as generation 0.
+
+    :param document: Parsed data file content or header.
+    :return: Tuple of (journal generation, list of habit records).
+    """
+    if isinstance(document, dict):
+        return document["journal"], document["habits"]
+    return 0, document
+
+
+class JsonStorage:
+    """
+    Stores habit records as a JSON array, with completions optionally journaled.
+
+    In journal mode the array is wrapped as {"journal": generation, "habits": [...]}.
+    """
+    def __init__(self, filename, journal=True, compact_after=500):
+        """
+        Initialize a JsonStorage for the given data file.
+
+        :param filename: Path of the JSON data file.
+        :param journal: Whether completions are appended to a journal instead of
+                        rewriting the data file.
+        :param compact_after: Number of journaled completions after which the
+                              journal is folded back into the data file.
+        """
+        self.filename = filename
+        self.journal = ProgressJournal(filename + ".journal") if journal else None
+        self.compact_after = compact_after
+        self._pending = 0
+
+    def load(self):
+        """
+        Load the habit records, including completions still in the journal.
+
+        A missing data file is created empty. An unreadable one is moved aside
+        to <filename>.corrupt instead of being overwritten.
+
+        :return: List of habit records.
+        """
+        try:
+            with open(self.filename, "r") as file:
+                generation, data = split_generation(json.loads(file.read()))
+        except FileNotFoundError:
+            generation = 0
+            atomic_write(self.filename, "[\n]")
+            data = []
+        except ValueError:
+            os.replace(self.filename, self.filename + ".corrupt")
+            generation = 0
+            atomic_write(self.filename, "[\n]")
+            data = []
+        if self.journal is not None:
+            self.journal.generation = generation
+            records = self.journal.records()
+            data = self.journal.replay(data, records)
+            self._pending = len(records)
+        return data
+
+    def save(self, data):
+        """
+        Write all habit records to the data file and empty the journal.
+
+        :param data: List of habit records to be saved.
+        """
+        if self.journal is None:
+            atomic_write(self.filename, json.dumps(list(data), default=encode_value))
+            return
+        generation = self.journal.generation + 1
+        atomic_write(self.filename, json.dumps({"journal": generation, "habits": list(data)},
+                                               default=encode_value))
+        self.journal.generation = generation
+        self.journal.clear()
+        self._pending = 0
+
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Persist a single completion of a habit.
+
+        In journal mode only the completion is appended to the journal; the
+        full data file is rewritten once the journal grows past compact_after.
+
+        :param data: List of habit records with the completion already applied.
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry, or None if only fields changed.
+        :param fields: Habit fields updated by the completion.
+        """
+        if self.journal is None or self._pending >= self.compact_after:
+            self.save(data)
+            return
+        self.journal.append(habit_id, entry, fields)
+        self._pending += 1
+
+    def stamp(self):
+        """
+        Return a cheap fingerprint of the files backing the storage.
+
+        :return: Tuple of (mtime, size) pairs for the data file and the journal.
+        """
+        filenames = [self.filename]
+        if self.journal is not None:
+            filenames.append(self.journal.filename)
+        return tuple(file_stamp(filename) for filename in filenames)
+
+    def last_id(self):
+        """
+        Return the highest habit ID in the data file.
+
+        :return: Highest habit ID, or 0 if the file is missing or holds no habits.
+        """
+        try:
+            with open(self.filename, "r") as file:
+                _, data = split_generation(json.loads(file.read()))
+        except (OSError, ValueError):
+            return 0
+        return max((int(record["habit_id"]) for record in data), default=0)
+
+
+def file_stamp(filename):
+    """
+    Return the modification time and size of a file.
+
+    :param filename: Path of the file.
+    :return: Tuple of (mtime in nanoseconds, size), or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SQLiteStorage:
+    """
+    Stores habit records in an SQLite database.
+
+    Habits and their progress entries live in separate, indexed tables, so a
+    completion is a single-row insert and the filter queries are answered
+    with index range scans instead of scanning every record. The connection
+    may be shared with the background writer thread.
+    """
+    HABIT_COLUMNS = ("habit_id", "title", "description", "active", "start_date",
+                     "last_done", "frequency", "successes", "current_streak",
+                     "longest_streak", "category", "significance", "next_deadline",
+                     "goal", "streak_checkpoint")
+    JSON_COLUMNS = ("last_done", "streak_checkpoint")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            habit_id INTEGER NOT NULL UNIQUE,
+            title TEXT,
+            description TEXT,
+            active INTEGER,
+            start_date TEXT,
+            last_done TEXT,
+            frequency TEXT,
+            successes INTEGER,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            category TEXT,
+            significance TEXT,
+            next_deadline TEXT,
+            goal INTEGER,
+            streak_checkpoint TEXT
+        );
+        CREATE TABLE IF NOT EXISTS progress (
+            habit_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS habits_category ON habits (category);
+        CREATE INDEX IF NOT EXISTS habits_frequency ON habits (frequency);
+        CREATE INDEX IF NOT EXISTS habits_start_date ON habits (start_date);
+        CREATE INDEX IF NOT EXISTS progress_habit ON progress (habit_id, timestamp);
+        CREATE INDEX IF NOT EXISTS progress_timestamp ON progress (timestamp);
+    """
+
+    def __init__(self, filename):
+        """
+        Initialize an SQLiteStorage for the given database file.
+
+        :param filename: Path of the SQLite database file.
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self.connection.executescript(self.SCHEMA)
+        columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(habits)")]
+        if "streak_checkpoint" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE habits ADD COLUMN streak_checkpoint TEXT")
+
+    def _to_row(self, record):
+        row = [record.get(column) for column in self.HABIT_COLUMNS]
+        row[0] = int(row[0])
+        for column in self.JSON_COLUMNS:
+            index = self.HABIT_COLUMNS.index(column)
+            if row[index] is not None:
+                row[index] = json.dumps(row[index], default=str)
+        return [str(value) if isinstance(value, date) else value for value in row]
+
+    def _select(self, where="", parameters=(), order="rowid"):
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(self.HABIT_COLUMNS)} FROM habits {where} ORDER BY {order}",
+                parameters).fetchall()
+            entries = self.connection.execute(
+                "SELECT progress.habit_id, progress.timestamp FROM progress "
+                f"JOIN habits ON habits.habit_id = progress.habit_id {where} "
+                "ORDER BY progress.rowid", parameters).fetchall() if rows else []
+        records = []
+        by_id = {}
+        for row in rows:
+            record = dict(row)
+            record["active"] = bool(record["active"])
+            if record["last_done"] is not None:
+                record["last_done"] = json.loads(record["last_done"])
+            checkpoint = record.pop("streak_checkpoint")
+            if checkpoint is not None:
+                record["streak_checkpoint"] = json.loads(checkpoint)
+            record["progress_entries"] = []
+            records.append(record)
+            by_id[record["habit_id"]] = record
+        for habit_id, timestamp in entries:
+            by_id[habit_id]["progress_entries"].append({"timestamp": timestamp})
+        return records
+
+    def load(self):
+        """
+        Load all habit records with their progress entries.
+
+        :return: List of habit records.
+        """
+        return self._select()
+
+    def save(self, data):
+        """
+        Replace the stored habit records with the given ones.
+
+        :param data: List of habit records to be saved.
+        """
+        marks = ", ".join("?" * len(self.HABIT_COLUMNS))
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM habits")
+            self.connection.execute("DELETE FROM progress")
+            self.connection.executemany(f"INSERT INTO habits VALUES ({marks})",
+                                        (self._to_row(record) for record in data))
+            self.connection.executemany(
+                "INSERT INTO progress VALUES (?, ?)",
+                ((int(record["habit_id"]), str(entry["timestamp"]))
+                 for record in data for entry in record["progress_entries"]))
+
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Persist a single completion of a habit.
+
+        :param data: List of habit records with the completion already applied (unused).
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry, or None if only fields changed.
+        :param fields: Habit fields updated by the completion.
+        """
+        fields = {key: value for key, value in fields.items() if key in self.HABIT_COLUMNS}
+        for column in self.JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column], default=str)
+        fields = {key: str(value) if isinstance(value, date) else value
+                  for key, value in fields.items()}
+        with self._lock, self.connection:
+            if entry is not None:
+                self.connection.execute("INSERT INTO progress VALUES (?, ?)",
+                                        (int(habit_id), str(entry["timestamp"])))
+            if fields:
+                assignments = ", ".join(f"{key} = ?" for key in fields)
+                self.connection.execute(f"UPDATE habits SET {assignments} WHERE habit_id = ?",
+                                        [*fields.values(), int(habit_id)])
+
+    def stamp(self):
+        """
+        Return a cheap fingerprint of the database file.
+
+        :return: Tuple with the (mtime, size) pair of the database file.
+        """
+        return (file_stamp(self.filename),)
+
+    def last_id(self):
+        """
+        Return the highest stored habit ID.
+
+        :return: Highest habit ID, or 0 if no habits are stored.
+        """
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COALESCE(MAX(habit_id), 0) FROM habits").fetchone()[0]
+
+    def habits_with_frequency(self, frequency):
+        """
+        Return the habit records with the given frequency.
+
+        :param frequency: Frequency of the habits to be returned.
+        :return: List of habit records.
+        """
+        return self._select("WHERE habits.frequency = ?", (frequency,))
+
+    def habits_in_category(self, category):
+        """
+        Return the habit records of the given category.
+
+        :param category: Category of the habits to be returned.
+        :return: List of habit records.
+        """
+        return self._select("WHERE habits.category = ?", (category,))
+
+    def habits_in_period(self, from_date, to_date):
+        """
+        Return the habit records that started within the specified period.
+
+        :param from_date: Start date of the period.
+        :param to_date: End date of the period.
+        :return: List of habit records, ordered by start date.
+        """
+        return self._select("WHERE habits.start_date BETWEEN ? AND ?",
+                            (str(from_date), str(to_date)), "start_date, habit_id")
+
+    def progress_between(self, habit_id, start, end):
+        """
+        Return the progress entries of a habit recorded within the specified period.
+
+        :param habit_id: ID of the habit.
+        :param start: Earliest timestamp (inclusive), as datetime or string.
+        :param end: Latest timestamp (inclusive), as datetime or string.
+        :return: List of progress entries.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT timestamp FROM progress WHERE habit_id = ? AND timestamp BETWEEN ? AND ? "
+                "ORDER BY timestamp", (int(habit_id), str(start), str(end))).fetchall()
+        return [{"timestamp": timestamp} for timestamp, in rows]
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.connection.close()
+
+
+class IndexedStorage:
+    """
+    Stores habit summaries in a header line, followed by one line of progress entries per habit.
+
+    The header holds the journal generation and every habit record without its
+    progress entries, plus the offset and length of the habit's progress line,
+    the number of entries and the latest entry. Loading the summaries reads the header only; the
+    progress lines are read on demand through LazyProgress. Completions are
+    journaled like in JsonStorage.
+    """
+    def __init__(self, filename, compact_after=500):
+        """
+        Initialize an IndexedStorage for the given data file.
+
+        :param filename: Path of the data file.
+        :param compact_after: Number of journaled completions after which the
+                              journal is folded back into the data file.
+        """
+        self.filename = filename
+        self.journal = ProgressJournal(filename + ".journal")
+        self.compact_after = compact_after
+        self._pending = 0
+
+    def _read_header(self):
+        try:
+            with open(self.filename, "rb") as file:
+                line = file.readline()
+                body_start = file.tell()
+        except FileNotFoundError:
+            return 0, [], 0
+        if not line.strip():
+            return 0, [], body_start
+        generation, records = split_generation(json.loads(line))
+        return generation, records, body_start
+
+    def _read_block(self, offset, length):
+        with open(self.filename, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.read(length))
+
+    def _attach_progress(self, records, body_start):
+        for record in records:
+            offset, length, count, last = record.pop("progress")
+            record["progress_entries"] = LazyProgress(
+                count, last, partial(self._read_block, body_start + offset, length))
+        return records
+
+    def load_summaries(self):
+        """
+        Load the habit records without reading their progress entries.
+
+        :return: List of habit records whose progress entries are LazyProgress objects.
+        """
+        generation, records, body_start = self._read_header()
+        self._attach_progress(records, body_start)
+        self.journal.generation = generation
+        journaled = self.journal.records()
+        self._pending = len(journaled)
+        return self.journal.replay(records, journaled)
+
+    def load(self):
+        """
+        Load the habit records including all their progress entries.
+
+        :return: List of habit records.
+        """
+        records = self.load_summaries()
+        for record in records:
+            record["progress_entries"] = list(record["progress_entries"])
+        return records
+
+    def save(self, data):
+        """
+        Write all habit records to the data file and empty the journal.
+
+        The progress entries of the given records are replaced by LazyProgress
+        objects pointing into the new file.
+
+        :param data: List of habit records to be saved.
+        """
+        header = []
+        blocks = []
+        offset = 0
+        for record in data:
+            entries = list(record["progress_entries"])
+            block = (json.dumps(entries, default=str) + "\n").encode("utf-8")
+            summary = {key: value for key, value in record.items() if key != "progress_entries"}
+            summary["progress"] = [offset, len(block), len(entries),
+                                   entries[-1] if entries else None]
+            header.append(summary)
+            blocks.append(block)
+            offset += len(block)
+        generation = self.journal.generation + 1
+        head = (json.dumps({"journal": generation, "habits": header}, default=str)
+                + "\n").encode("utf-8")
+        atomic_write(self.filename, head + b"".join(blocks))
+        for record, summary in zip(data, header):
+            offset, length, count, last = summary["progress"]
+            record["progress_entries"] = LazyProgress(
+                count, json.loads(json.dumps(last, default=str)),
+                partial(self._read_block, len(head) + offset, length))
+        self.journal.generation = generation
+        self.journal.clear()
+        self._pending = 0
+
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Persist a single completion of a habit.
+
+        :param data: List of habit records with the completion already applied.
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry, or None if only fields changed.
+        :param fields: Habit fields updated by the completion.
+        """
+        if self._pending >= self.compact_after:
+            self.save(data)
+            return
+        self.journal.append(habit_id, entry, fields)
+        self._pending += 1
+
+    def stamp(self):
+        """
+        Return a cheap fingerprint of the files backing the storage.
+
+        :return: Tuple of (mtime, size) pairs for the data file and the journal.
+        """
+        return file_stamp(self.filename), file_stamp(self.journal.filename)
+
+    def last_id(self):
+        """
+        Return the highest habit ID in the data file.
+
+        :return: Highest habit ID, or 0 if the file holds no habits.
+        """
+        _, records, _ = self._read_header()
+        return max((int(record["habit_id"]) for record in records), default=0)
+
+
+class ShardedStorage:
+    """
+    Stores every habit in its own directory, split into metadata and monthly progress segments.
+
+    Each habit directory holds a small habit.json with the habit's fields,
+    entry count, latest entry and entry count per month, plus one
+    progress-YYYY-MM.jsonl segment per month with completions. The monthly
+    counts let history pages skip straight to the segments they cover. A completion appends one line to the current
+    segment of one habit and rewrites that habit's metadata file; a full save
+    only rewrites the files whose content changed.
+    """
+    SEGMENT_PREFIX = "progress-"
+    SEGMENT_SUFFIX = ".jsonl"
+
+    def __init__(self, directory):
+        """
+        Initialize a ShardedStorage in the given directory.
+
+        :param directory: Path of the directory holding one subdirectory per habit.
+        """
+        self.directory = directory
+        self.version_filename = os.path.join(directory, "VERSION")
+        self._written = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _habit_directory(self, habit_id):
+        return os.path.join(self.directory, str(int(habit_id)))
+
+    def _metadata_filename(self, habit_id):
+        return os.path.join(self._habit_directory(habit_id), "habit.json")
+
+    def _segment_filename(self, habit_id, month):
+        return os.path.join(self._habit_directory(habit_id),
+                            f"{self.SEGMENT_PREFIX}{month}{self.SEGMENT_SUFFIX}")
+
+    def _habit_ids(self):
+        return sorted(int(name) for name in os.listdir(self.directory) if name.isdigit())
+
+    def _metadata(self, record, count, last, months):
+        summary = {key: value for key, value in record.items() if key != "progress_entries"}
+        summary["progress"] = [count, last, months]
+        return json.dumps(summary, default=str)
+
+    def _read_metadata(self, habit_id):
+        with open(self._metadata_filename(habit_id), "r") as file:
+            text = file.read()
+        summary = json.loads(text)
+        self._written[habit_id] = (text, summary["progress"][0], self._months(summary))
+        return summary
+
+    @staticmethod
+    def _months(summary):
+        progress = summary["progress"]
+        return progress[2] if len(progress) > 2 else None
+
+    def _segment_counts(self, habit_id, summary=None):
+        if summary is None:
+            try:
+                with open(self._metadata_filename(habit_id), "r") as file:
+                    summary = json.loads(file.read())
+            except FileNotFoundError:
+                return {}
+        months = self._months(summary)
+        if months is None:
+            months = {month: len(self.read_segment(habit_id, month))
+                      for month in self.segments(habit_id)}
+        return months
+
+    def _bump_version(self):
+        atomic_write(self.version_filename, str(time.time_ns()))
+
+    def segments(self, habit_id):
+        """
+        Return the months for which a habit has a progress segment.
+
+        :param habit_id: ID of the habit.
+        :return: Sorted list of "YYYY-MM" strings.
+        """
+        try:
+            names = os.listdir(self._habit_directory(habit_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)] for name in names
+                      if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX))
+
+    def read_segment(self, habit_id, month):
+        """
+        Read the progress entries a habit recorded in one month.
+
+        A torn last line (e.g. after a crash mid-append) is skipped.
+
+        :param habit_id: ID of the habit.
+        :param month: Month of the segment as "YYYY-MM".
+        :return: List of progress entries.
+        """
+        entries = []
+        with open(self._segment_filename(habit_id, month), "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def history(self, habit_id, newest_first=False):
+        """
+        Stream the progress entries of a habit segment by segment.
+
+        :param habit_id: ID of the habit.
+        :param newest_first: Whether to yield the latest entries first.
+        :return: Generator of progress entries.
+        """
+        months = self.segments(habit_id)
+        for month in reversed(months) if newest_first else months:
+            entries = self.read_segment(habit_id, month)
+            yield from reversed(entries) if newest_first else entries
+
+    def read_history(self, habit_id):
+        """
+        Read all progress entries of a habit, oldest first.
+
+        :param habit_id: ID of the habit.
+        :return: List of progress entries.
+        """
+        return list(self.history(habit_id))
+
+    def history_page(self, habit_id, start, stop):
+        """
+        Return a page of the progress entries of a habit, newest first.
+
+        Only the segments overlapping the page are read; the others are
+        skipped using the monthly counts in the metadata.
+
+        :param habit_id: ID of the habit.
+        :param start: Position of the first entry, 0 being the latest one.
+        :param stop: Position after the last entry.
+        :return: List of progress entries.
+        """
+        months = self._segment_counts(habit_id)
+        page = []
+        position = 0
+        for month in sorted(months, reverse=True):
+            if position >= stop:
+                break
+            if position + months[month] <= start:
+                position += months[month]
+                continue
+            entries = self.read_segment(habit_id, month)[::-1]
+            page.extend(entries[max(start - position, 0):stop - position])
+            position += len(entries)
+        return page
+
+    def history_position(self, habit_id, day):
+        """
+        Return the newest first position of the latest entry recorded on or before a day.
+
+        Only the segment of the day's month is read; later months are counted
+        from the metadata.
+
+        :param habit_id: ID of the habit.
+        :param day: Date or "YYYY-MM-DD" string.
+        :return: Number of entries recorded after the day.
+        """
+        day = str(day)
+        months = self._segment_counts(habit_id)
+        position = sum(count for month, count in months.items() if month > day[:7])
+        if day[:7] in months:
+            position += sum(1 for entry in self.read_segment(habit_id, day[:7])
+                            if entry_day(entry) > day)
+        return position
+
+    def load_summaries(self):
+        """
+        Load the habit records without reading their progress segments.
+
+        :return: List of habit records whose progress entries are LazyProgress objects.
+        """
+        records = []
+        for habit_id in self._habit_ids():
+            record = self._read_metadata(habit_id)
+            count, last = record.pop("progress")[:2]
+            record["progress_entries"] = LazyProgress(
+                count, last, partial(self.read_history, habit_id))
+            records.append(record)
+        return records
+
+    def load(self):
+        """
+        Load the habit records including all their progress entries.
+
+        :return: List of habit records.
+        """
+        records = self.load_summaries()
+        for record in records:
+            record["progress_entries"] = list(record["progress_entries"])
+        return records
+
+    def _write_segments(self, habit_id, entries):
+        by_month = {}
+        for entry in entries:
+            by_month.setdefault(str(entry["timestamp"])[:7], []).append(entry)
+        for month in self.segments(habit_id):
+            if month not in by_month:
+                os.remove(self._segment_filename(habit_id, month))
+        for month, month_entries in by_month.items():
+            atomic_write(self._segment_filename(habit_id, month),
+                         "".join(json.dumps(entry, default=str) + "\n"
+                                 for entry in month_entries))
+        return {month: len(month_entries) for month, month_entries in sorted(by_month.items())}
+
+    def save(self, data):
+        """
+        Write the habit records, rewriting only the files that changed.
+
+        Progress segments are rewritten only for habits whose number of
+        entries differs from what is stored; habits missing from data are removed.
+
+        :param data: List of habit records to be saved.
+        """
+        removed = set(self._habit_ids())
+        for record in data:
+            habit_id = int(record["habit_id"])
+            removed.discard(habit_id)
+            entries = record["progress_entries"]
+            count = len(entries)
+            previous = self._written.get(habit_id)
+            if previous is None or previous[1] != count or previous[2] is None:
+                os.makedirs(self._habit_directory(habit_id), exist_ok=True)
+                months = self._write_segments(habit_id, list(entries))
+            else:
+                months = previous[2]
+            text = self._metadata(record, count, entries[-1] if count else None, months)
+            if previous is None or previous[0] != text:
+                atomic_write(self._metadata_filename(habit_id), text)
+            self._written[habit_id] = (text, count, months)
+        for habit_id in removed:
+            shutil.rmtree(self._habit_directory(habit_id))
+            self._written.pop(habit_id, None)
+        self._bump_version()
+
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Persist a single completion of a habit.
+
+        Appends the entry to the habit's segment for the entry's month and
+        rewrites the habit's metadata file.
+
+        :param data: List of habit records with the completion already applied (unused).
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry, or None if only fields changed.
+        :param fields: Habit fields updated by the completion.
+        """
+        habit_id = int(habit_id)
+        summary = self._read_metadata(habit_id)
+        months = self._segment_counts(habit_id, summary)
+        summary.update(fields)
+        count, last = summary.pop("progress")[:2]
+        if entry is not None:
+            month = str(entry["timestamp"])[:7]
+            line = json.dumps(entry, default=str)
+            with open(self._segment_filename(habit_id, month), "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+            count, last = count + 1, json.loads(line)
+            months = dict(sorted({**months, month: months.get(month, 0) + 1}.items()))
+        text = self._metadata(summary, count, last, months)
+        atomic_write(self._metadata_filename(habit_id), text)
+        self._written[habit_id] = (text, count, months)
+        self._bump_version()
+
+    def stamp(self):
+        """
+        Return a cheap fingerprint of the storage.
+
+        :return: Tuple with the (mtime, size) pair of the version file, which
+                 is rewritten on every write.
+        """
+        return (file_stamp(self.version_filename),)
+
+    def last_id(self):
+        """
+        Return the highest stored habit ID.
+
+        :return: Highest habit ID, or 0 if no habits are stored.
+        """
+        return max(self._habit_ids(), default=0)
+
+
+def open_storage(filename):
+    """
+    Open the storage backend matching the extension of the given file.
+
+    :param filename: Path of the data file; .db, .sqlite and .sqlite3 files use
+                     SQLite, .jsonl files use the indexed layout and directories
+                     (or paths ending with a separator) use the sharded layout.
+    :return: Storage backend for the file.
+    """
+    if os.path.isdir(filename) or filename.endswith(os.sep):
+        return ShardedStorage(filename)
+    extension = os.path.splitext(filename)[1]
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteStorage(filename)
+    if extension == ".jsonl":
+        return IndexedStorage(filename)
+    return JsonStorage(filename)
+
+
+def normalize_record(record):
+    """
+    Replace date and datetime values of a habit record by their stored string form.
+
+    The record is changed in place, so that cached records look exactly like
+    records freshly parsed from the data file.
+
+    :param record: Habit record to normalize.
+    :return: The normalized record.
+    """
+    for key, value in record.items():
+        if isinstance(value, date):
+            record[key] = str(value)
+    entries = record.get("progress_entries", ())
+    if isinstance(entries, LazyProgress):
+        entries = entries.pending()
+    for entry in entries:
+        for key, value in entry.items():
+            if isinstance(value, date):
+                entry[key] = str(value)
+    return record
+
+
+def last_habit_id(filename):
+    """
+    Return the highest habit ID stored in a data file.
+
+    :param filename: Path of the data file.
+    :return: Highest habit ID, or 0 if the file is missing or holds no habits.
+    """
+    if not os.path.exists(filename):
+        return 0
+    return open_storage(filename).last_id()
+
+
+class IdSequence:
+    """
+    Persistent, monotonic allocator of habit IDs.
+
+    Only the last allocated ID is kept on disk, so allocating IDs only reads
+    the habit data once per instance, through seed: the sequence continues
+    after the higher of the stored and the seeded ID, so a sequence file that
+    is stale or belongs to other data never hands out a used ID. IDs are
+    handed out from an in-memory block of block_size IDs that is reserved on
+    disk in a single write.
+    """
+    def __init__(self, filename, seed=None, block_size=1):
+        """
+        Initialize an IdSequence backed by the given file.
+
+        :param filename: Path of the file holding the last allocated ID.
+        :param seed: Callable returning the last ID used by the habit data.
+        :param block_size: Number of IDs reserved on disk at once.
+        """
+        self.filename = filename
+        self.seed = seed
+        self.block_size = block_size
+        self._next = 0
+        self._limit = 0
+        self._seeded = seed is None
+
+    def _read_last(self):
+        try:
+            with open(self.filename, "r") as file:
+                last = int(file.read())
+        except (FileNotFoundError, ValueError):
+            last = 0
+        if not self._seeded:
+            last = max(last, self.seed())
+            self._seeded = True
+        return last
+
+    def _write_last(self, last):
+        atomic_write(self.filename, str(last))
+
+    def reserve(self, count=1):
+        """
+        Allocate a block of consecutive IDs.
+
+        :param count: Number of IDs to allocate.
+        :return: Range of the allocated IDs.
+        """
+        if self._next + count > self._limit:
+            self._next = self._read_last() + 1
+            self._limit = self._next + max(count, self.block_size)
+            self._write_last(self._limit - 1)
+        ids = range(self._next, self._next + count)
+        self._next += count
+        return ids
+
+    def next_id(self):
+        """
+        Allocate a single ID.
+
+        :return: The allocated ID.
+        """
+        return self.reserve(1)[0]
+
+
+class LazySnapshot(Sequence):
+    """
+    Shallow copies of habit records that are only taken when first read.
+
+    A journaled completion never reads the records, so it does not pay for
+    copying all of them; a full save or compaction takes the copies under
+    the lock shared with the records' owner.
+    """
+    def __init__(self, data, lock):
+        """
+        Initialize a LazySnapshot of the given records.
+
+        :param data: List of habit records to be copied.
+        :param lock: Lock held by the owner of the records while changing them.
+        """
+        self._data = data
+        self._lock = lock
+        self._records = None
+
+    @property
+    def taken(self):
+        """
+        Whether the records have been copied.
+        """
+        return self._records is not None
+
+    @property
+    def records(self):
+        """
+        The copied records, taken on first access.
+        """
+        if self._records is None:
+            with self._lock:
+                self._records = [dict(record) for record in self._data]
+        return self._records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class DeferredWriter:
+    """
+    Performs storage writes on a background thread, coalescing bursts of changes.
+
+    A write happens once no new change was scheduled for delay seconds. A
+    pending full save supersedes earlier pending writes, so N rapid changes
+    cost a single write. The storage is handed a LazySnapshot of the records,
+    so they are only copied if it reads them, under the lock shared with the
+    records' owner; progress entries the storage swapped in (e.g.
+    IndexedStorage's LazyProgress) are adopted under that lock too, unless
+    the habit was completed in the meantime. A failed
+    write is kept, reported to on_error and retried with a growing delay.
+    """
+    def __init__(self, storage, delay=0.5, on_write=None, on_error=None, lock=None,
+                 max_retry_delay=60):
+        """
+        Initialize a DeferredWriter and start its thread.
+
+        :param storage: Storage backend receiving the writes.
+        :param delay: Seconds to wait for further changes before writing.
+        :param on_write: Callable invoked after every completed write.
+        :param on_error: Callable invoked with the exception of every failed write,
+                         on the writer thread.
+        :param lock: Lock held by the owner of the records while changing them.
+        :param max_retry_delay: Maximum number of seconds between two attempts
+                                of a failing write.
+        """
+        self.storage = storage
+        self.delay = delay
+        self.on_write = on_write
+        self.on_error = on_error
+        self.lock = lock if lock is not None else threading.RLock()
+        self.max_retry_delay = max_retry_delay
+        self.error = None
+        self.failures = 0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._save = None
+        self._progress = []
+        self._due = None
+        self._writing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="habit-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        """
+        Whether changes are waiting to be written or being written.
+        """
+        with self._condition:
+            return self._writing or self._save is not None or bool(self._progress)
+
+    def save(self, data):
+        """
+        Schedule a full save of the habit records.
+
+        :param data: List of habit records to be saved.
+        """
+        with self._condition:
+            self._save = data
+            self._progress = []
+            self._schedule()
+
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Schedule a single completion of a habit to be persisted.
+
+        :param data: List of habit records with the completion already applied.
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry, or None if only fields changed.
+        :param fields: Habit fields updated by the completion.
+        """
+        with self._condition:
+            if self._save is not None:
+                self._save = data
+            else:
+                self._progress.append((data, habit_id, entry, fields))
+            self._schedule()
+
+    def _schedule(self):
+        self._due = time.monotonic() + self.delay
+        self._condition.notify()
+
+    def _retry_delay(self):
+        return min(max(self.delay, 0.1) * 2 ** (self.failures - 1), self.max_retry_delay)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._due is None or time.monotonic() < self._due):
+                    self._condition.wait(None if self._due is None else self._due - time.monotonic())
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as error:
+                with self._condition:
+                    if self._due is None:
+                        self._due = time.monotonic() + self._retry_delay()
+                if self.on_error is not None:
+                    self.on_error(error)
+
+    def _write(self, method, data, *args):
+        snapshot = LazySnapshot(data, self.lock)
+        method(snapshot, *args)
+        if not snapshot.taken:
+            return
+        with self.lock:
+            for record, written in zip(data, snapshot.records):
+                entries = written.get("progress_entries")
+                if (entries is not record.get("progress_entries")
+                        and len(entries) == len(record["progress_entries"])):
+                    record["progress_entries"] = entries
+
+    def flush(self):
+        """
+        Write all pending changes now, in the calling thread.
+        """
+        with self._write_lock:
+            with self._condition:
+                save, progress = self._save, self._progress
+                self._save, self._progress, self._due = None, [], None
+                self._writing = True
+            try:
+                if save is not None:
+                    self._write(self.storage.save, save)
+                for data, *args in progress:
+                    self._write(self.storage.record_progress, data, *args)
+                if self.on_write is not None:
+                    self.on_write()
+            except Exception as error:
+                with self._condition:
+                    if self._save is None:
+                        if save is not None:
+                            self._save = save
+                        else:
+                            self._progress = progress + self._progress
+                self.error = error
+                self.failures += 1
+                raise
+            finally:
+                with self._condition:
+                    self._writing = False
+            self.error = None
+            self.failures = 0
+
+    def close(self):
+        """
+        Stop the writer thread and write all pending changes.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+
+class StartDateIndex:
+    """
+    Habit IDs sorted by the start date of their habits.
+
+    Period, "started before" and "started after" queries are answered by
+    bisection instead of comparing the start date of every habit.
+    """
+    def __init__(self, records=()):
+        """
+        Initialize a StartDateIndex.
+
+        :param records: Habit records to be indexed.
+        """
+        self._keys = sorted(self._key(record) for record in records)
+
+    @staticmethod
+    def _key(record):
+        return str(record["start_date"]), int(record["habit_id"])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, record):
+        """
+        Add a habit record to the index.
+
+        :param record: Habit record.
+        """
+        insort(self._keys, self._key(record))
+
+    def remove(self, record):
+        """
+        Remove a habit record from the index.
+
+        :param record: Habit record as it was added.
+        """
+        key = self._key(record)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def _ids(self, start, stop):
+        return [habit_id for _, habit_id in self._keys[start:stop]]
+
+    def between(self, from_date, to_date):
+        """
+        Return the IDs of the habits that started within the specified period.
+
+        :param from_date: Start date of the period (inclusive).
+        :param to_date: End date of the period (inclusive).
+        :return: List of habit IDs, ordered by start date.
+        """
+        return self._ids(bisect_left(self._keys, (str(from_date),)),
+                         bisect_right(self._keys, (str(to_date), float("inf"))))
+
+    def before(self, day):
+        """
+        Return the IDs of the habits that started before the given date.
+
+        :param day: Date (exclusive).
+        :return: List of habit IDs, ordered by start date.
+        """
+        return self._ids(0, bisect_left(self._keys, (str(day),)))
+
+    def after(self, day):
+        """
+        Return the IDs of the habits that started after the given date.
+
+        :param day: Date (exclusive).
+        :return: List of habit IDs, ordered by start date.
+        """
+        return self._ids(bisect_right(self._keys, (str(day), float("inf"))), None)
+
+
+class GroupIndex:
+    """
+    Inverted index from a habit field (e.g. category) to the IDs of the habits
+    having each value, with a running completion ratio total per group.
+
+    The completion ratio of a habit is its successes per progress entry, the
+    measure used for the category and frequency performance analytics. The
+    totals are kept as exact fractions of the ratios, so they never drift as
+    ratios are added and taken out again. Every habit keeps the position it
+    was added at, also when it moves to another group, and groups are ordered
+    by their first habit, so ties break as in Analytics over the habit list.
+    """
+    def __init__(self, field, records=()):
+        """
+        Initialize a GroupIndex.
+
+        :param field: Name of the record field to group by.
+        :param records: Habit records to be indexed, in the order of the habit list.
+        """
+        self.field = field
+        self._groups = {}
+        self._totals = {}
+        self._positions = {}
+        self._keys = {}
+        self._habit_positions = {}
+        self._next_position = 0
+        for record in records:
+            self.add(record)
+
+    @staticmethod
+    def ratio(record):
+        """
+        Return the completion ratio of a habit record.
+
+        :param record: Habit record.
+        :return: Successes per progress entry, or 0 without entries.
+        """
+        entries = len(record["progress_entries"])
+        return record["successes"] / entries if entries else 0
+
+    def _insert(self, habit_id, key, ratio, position):
+        self._keys[habit_id] = key
+        self._groups.setdefault(key, {})[habit_id] = ratio
+        self._totals[key] = self._totals.get(key, 0) + ratio
+        insort(self._positions.setdefault(key, []), position)
+
+    def _discard(self, habit_id):
+        key = self._keys.pop(habit_id)
+        group = self._groups[key]
+        self._totals[key] -= group.pop(habit_id)
+        positions = self._positions[key]
+        del positions[bisect_left(positions, self._habit_positions[habit_id])]
+        if not group:
+            del self._groups[key], self._totals[key], self._positions[key]
+
+    def add(self, record):
+        """
+        Add a habit record to its group, after all habits added so far.
+
+        :param record: Habit record.
+        """
+        habit_id = int(record["habit_id"])
+        self._habit_positions[habit_id] = self._next_position
+        self._next_position += 1
+        self._insert(habit_id, record[self.field], Fraction(self.ratio(record)),
+                     self._habit_positions[habit_id])
+
+    def remove(self, habit_id):
+        """
+        Remove a habit from its group.
+
+        :param habit_id: ID of the habit, as int or string.
+        """
+        habit_id = int(habit_id)
+        if habit_id not in self._keys:
+            return
+        self._discard(habit_id)
+        del self._habit_positions[habit_id]
+
+    def update(self, record):
+        """
+        Re-index a habit record whose fields changed, keeping its position.
+
+        :param record: Habit record.
+        """
+        habit_id, key = int(record["habit_id"]), record[self.field]
+        if habit_id not in self._keys:
+            self.add(record)
+            return
+        ratio = Fraction(self.ratio(record))
+        if self._keys[habit_id] == key:
+            group = self._groups[key]
+            self._totals[key] += ratio - group[habit_id]
+            group[habit_id] = ratio
+            return
+        self._discard(habit_id)
+        self._insert(habit_id, key, ratio, self._habit_positions[habit_id])
+
+    def ids(self, key):
+        """
+        Return the IDs of the habits in a group.
+
+        :param key: Value of the grouped field.
+        :return: List of habit IDs, in the order of the habit list.
+        """
+        return sorted(self._groups.get(key, ()), key=self._habit_positions.__getitem__)
+
+    def _ordered_keys(self):
+        return sorted(self._groups, key=lambda key: self._positions[key][0])
+
+    def averages(self):
+        """
+        Return the average completion ratio of every group.
+
+        :return: Dict of group value to average ratio, ordered by the groups' first habits.
+        """
+        return {key: float(self._totals[key] / len(self._groups[key]))
+                for key in self._ordered_keys()}
+
+    def top(self):
+        """
+        Return the group with the highest average completion ratio.
+
+        :return: Value of the grouped field, or None if there are no habits.
+        """
+        return max(self._ordered_keys(), key=lambda key: self._totals[key] / len(self._groups[key]),
+                   default=None)
+
+
+class Leaderboard:
+    """
+    Habit IDs ranked by a score computed from their records.
+
+    The ranking is a sorted list that is updated per habit, so the best and
+    worst N habits are read off its ends without sorting all habits again.
+    Scores that depend on something other than the record (e.g. today's
+    date) name it with an epoch callable; the ranking is rebuilt whenever
+    the epoch changes. Scores taking a context (e.g. an EvaluationContext)
+    get one captured per rebuild, shared by every score call until the next.
+    """
+    def __init__(self, score, epoch=None, context=None):
+        """
+        Initialize an empty Leaderboard.
+
+        :param score: Callable computing the score of a habit record.
+        :param epoch: Callable returning the value the scores depend on, if any.
+        :param context: Callable capturing the context passed to score as its
+                        second argument, if any.
+        """
+        self.score = score
+        self.epoch = epoch
+        self.context = context
+        self._captured = None
+        self._built_for = None
+        self._ranking = []
+        self._scores = {}
+
+    def stale(self):
+        """
+        Return whether the scores were computed for a different epoch.
+
+        :return: True if the leaderboard needs to be rebuilt.
+        """
+        return self.epoch is not None and self.epoch() != self._built_for
+
+    def rebuild(self, records):
+        """
+        Rank the habit records from scratch.
+
+        :param records: Habit records.
+        """
+        self._built_for = self.epoch() if self.epoch is not None else None
+        self._captured = self.context() if self.context is not None else None
+        self._scores = {int(record["habit_id"]): self._score(record) for record in records}
+        self._ranking = sorted((-score, habit_id) for habit_id, score in self._scores.items())
+
+    def _score(self, record):
+        if self.context is None:
+            return self.score(record)
+        if self._captured is None:
+            self._captured = self.context()
+        return self.score(record, self._captured)
+
+    def remove(self, habit_id):
+        """
+        Remove a habit from the ranking.
+
+        :param habit_id: ID of the habit, as int or string.
+        """
+        score = self._scores.pop(int(habit_id), None)
+        if score is None:
+            return
+        position = bisect_left(self._ranking, (-score, int(habit_id)))
+        del self._ranking[position]
+
+    def update(self, record):
+        """
+        Rank a new or changed habit record.
+
+        :param record: Habit record.
+        """
+        self.remove(record["habit_id"])
+        score = self._score(record)
+        self._scores[int(record["habit_id"])] = score
+        insort(self._ranking, (-score, int(record["habit_id"])))
+
+    def best(self, count):
+        """
+        Return the habits with the highest scores.
+
+        :param count: Maximum number of habits.
+        :return: List of (habit ID, score) pairs, best first.
+        """
+        return [(habit_id, -score) for score, habit_id in self._ranking[:count]]
+
+    def worst(self, count):
+        """
+        Return the habits with the lowest scores.
+
+        :param count: Maximum number of habits.
+        :return: List of (habit ID, score) pairs, worst first.
+        """
+        ranking = self._ranking[-count:] if count else []
+        return [(habit_id, -score) for score, habit_id in reversed(ranking)]
+
+
+def period_bucket(timestamp, period):
+    """
+    Return the bucket a completion timestamp is counted in.
+
+    :param timestamp: Datetime or ISO formatted string.
+    :param period: "daily", "weekly" or "monthly".
+    :return: "YYYY-MM-DD", ISO week "YYYY-Www" or "YYYY-MM".
+    """
+    if not isinstance(timestamp, datetime):
+        timestamp = datetime.fromisoformat(str(timestamp))
+    if period == "daily":
+        return timestamp.date().isoformat()
+    elif period == "weekly":
+        year, week, _ = timestamp.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    elif period == "monthly":
+        return f"{timestamp.year:04d}-{timestamp.month:02d}"
+    raise ValueError(f"Unknown period: {period}")
+
+
+class CompletionRollup:
+    """
+    Completion counts per day, ISO week and month, overall and per category.
+
+    The counters are built once from the progress entries of all habits and
+    then kept up to date completion by completion.
+    """
+    PERIODS = ("daily", "weekly", "monthly")
+
+    def __init__(self, records=()):
+        """
+        Initialize a CompletionRollup.
+
+        :param records: Habit records whose completions are counted.
+        """
+        self.overall = {period: Counter() for period in self.PERIODS}
+        self.categories = {}
+        for record in records:
+            self.add_record(record)
+
+    def add(self, category, timestamp, count=1):
+        """
+        Count a completion (or, with a negative count, uncount it).
+
+        :param category: Category of the completed habit.
+        :param timestamp: Timestamp of the completion.
+        :param count: Number of completions to add.
+        """
+        by_category = self.categories.setdefault(
+            category, {period: Counter() for period in self.PERIODS})
+        for period in self.PERIODS:
+            bucket = period_bucket(timestamp, period)
+            for counter in (self.overall[period], by_category[period]):
+                counter[bucket] += count
+                if counter[bucket] <= 0:
+                    del counter[bucket]
+
+    def add_record(self, record, count=1):
+        """
+        Count all completions of a habit record.
+
+        :param record: Habit record.
+        :param count: 1 to add the completions, -1 to remove them.
+        """
+        for entry in record["progress_entries"]:
+            self.add(record["category"], entry["timestamp"], count)
+
+    def counts(self, period, category=None):
+        """
+        Return the completion counts per bucket.
+
+        :param period: "daily", "weekly" or "monthly".
+        :param category: Category to count, or None for all habits.
+        :return: Dict of bucket to number of completions, in chronological order.
+        """
+        if category is None:
+            counter = self.overall[period]
+        else:
+            counter = self.categories.get(category, {}).get(period, Counter())
+        return dict(sorted(counter.items()))
+
+    def total(self, period, bucket, category=None):
+        """
+        Return the number of completions in one bucket.
+
+        :param period: "daily", "weekly" or "monthly".
+        :param bucket: Bucket as returned by period_bucket.
+        :param category: Category to count, or None for all habits.
+        :return: Number of completions.
+        """
+        if category is None:
+            return self.overall[period][bucket]
+        return self.categories.get(category, {}).get(period, Counter())[bucket]
+
+
+def entry_day(entry):
+    """
+    Return the day a progress entry was recorded on.
+
+    :param entry: Progress entry dict.
+    :return: The day as "YYYY-MM-DD" string, or "" if the entry has no timestamp.
+    """
+    return str(entry.get("timestamp", ""))[:10]
+
+
+class HistoryIndex:
+    """
+    The days of a habit's progress entries, for paging them newest first.
+
+    Entries are stored in the order they were recorded, so the days are
+    sorted and a day is found by bisection. Entries appended to the list
+    after the index was built are added on the next lookup.
+    """
+    def __init__(self, entries):
+        """
+        Initialize a HistoryIndex over a habit's progress entries.
+
+        :param entries: List of progress entries, oldest first.
+        """
+        self.entries = entries
+        self.days = []
+
+    def _sync(self):
+        if len(self.days) < len(self.entries):
+            self.days.extend(entry_day(entry) for entry in self.entries[len(self.days):])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def page(self, start, stop):
+        """
+        Return a page of the entries, newest first.
+
+        :param start: Position of the first entry, 0 being the latest one.
+        :param stop: Position after the last entry.
+        :return: List of progress entries.
+        """
+        count = len(self.entries)
+        return [self.entries[count - 1 - position] for position in range(start, min(stop, count))]
+
+    def position(self, day):
+        """
+        Return the newest first position of the latest entry recorded on or before a day.
+
+        :param day: Date or "YYYY-MM-DD" string.
+        :return: Number of entries recorded after the day.
+        """
+        self._sync()
+        return len(self.days) - bisect_right(self.days, str(day))
+
+
+def synchronized(method):
+    """
+    Run a method while holding the lock of its object.
+
+    :param method: Method of an object with a lock attribute.
+    :return: The wrapped method.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class HabitStore:
+    """
+    Keeps the parsed habit records in memory and hands them out to the views.
+
+    The cached records are revalidated against the storage's file stamp, so
+    they are only parsed again when the files were changed by someone else.
+    Callers that mutate the returned records are expected to save them.
+    Records are indexed by their (stable) habit ID, so single habits are
+    looked up, added and deleted without scanning or renumbering the list,
+    by start date for period queries and by frequency and category for
+    filters and group performance. Leaderboards added with add_leaderboard
+    are kept up to date as habits are added, deleted, edited and marked done.
+    Completion counts per period are rolled up on first use and then kept up
+    to date as habits are added, deleted and marked done. Histories are paged
+    newest first, from the storage if it can page them and from an index of
+    the cached entries otherwise.
+    Storages that can load summaries only hand out records whose progress
+    entries are read on demand. With a write_delay, writes are handed to a
+    DeferredWriter and the cached records stay authoritative until written.
+    The version counter is bumped whenever the records change, so results
+    derived from them can be memoized against it.
+    All methods hold the store's lock, so the store can be shared with a
+    worker thread. Callers mutating records outside the store hold it too.
+    The completion rollup and stale leaderboards are built from a snapshot
+    of the records without the lock, which is only taken again to install
+    them if the records did not change meanwhile.
+    """
+    def __init__(self, storage, write_delay=None, on_write_error=None):
+        """
+        Initialize a HabitStore on top of a storage backend.
+
+        :param storage: Storage backend providing load, save, record_progress and stamp.
+        :param write_delay: Seconds to coalesce changes for before writing them
+                            in the background, or None to write synchronously.
+        :param on_write_error: Callable invoked on the writer thread with the
+                               exception of a failed background write, which is
+                               retried later.
+        """
+        self.storage = storage
+        self._data = None
+        self._index = {}
+        self._start_dates = StartDateIndex()
+        self._frequencies = GroupIndex("frequency")
+        self._categories = GroupIndex("category")
+        self._leaderboards = {}
+        self._rollup = None
+        self._histories = {}
+        self._stamp = None
+        self.version = 0
+        self.lock = threading.RLock()
+        self.writer = None
+        if write_delay is not None:
+            self.writer = DeferredWriter(storage, write_delay, on_write=self._written,
+                                         on_error=on_write_error, lock=self.lock)
+
+    def _written(self):
+        self._stamp = self.storage.stamp()
+
+    def _writes_pending(self):
+        return self.writer is not None and self.writer.busy
+
+    def _set_data(self, data):
+        self.version += 1
+        self._data = data
+        self._index = {}
+        for record in data:
+            self._index.setdefault(int(record["habit_id"]), record)
+        self._start_dates = StartDateIndex(self._index.values())
+        self._frequencies = GroupIndex("frequency", self._index.values())
+        self._categories = GroupIndex("category", self._index.values())
+        for leaderboard in self._leaderboards.values():
+            leaderboard.rebuild(self._index.values())
+        self._rollup = None
+        self._histories = {}
+
+    def _write(self, data):
+        if self.writer is not None:
+            self.writer.save(data)
+            return
+        self.storage.save(data)
+        self._stamp = self.storage.stamp()
+
+    @synchronized
+    def load(self):
+        """
+        Return the habit records, parsing the storage only if it changed.
+
+        :return: List of habit records.
+        """
+        if self._data is not None and self._writes_pending():
+            return self._data
+        stamp = self.storage.stamp()
+        if self._data is None or stamp != self._stamp:
+            self._set_data(getattr(self.storage, "load_summaries", self.storage.load)())
+            self._stamp = self.storage.stamp()
+        return self._data
+
+    @synchronized
+    def get(self, habit_id):
+        """
+        Return the record of the habit with the given ID.
+
+        :param habit_id: ID of the habit, as int or string.
+        :return: Habit record, or None if there is no such habit.
+        """
+        self.load()
+        return self._index.get(int(habit_id))
+
+    @synchronized
+    def add(self, record):
+        """
+        Add a habit record and save it.
+
+        :param record: Habit record with a habit_id not used by any other habit.
+        """
+        data = self.load()
+        normalize_record(record)
+        data.append(record)
+        self._index[int(record["habit_id"])] = record
+        self._start_dates.add(record)
+        self._frequencies.add(record)
+        self._categories.add(record)
+        for leaderboard in self._leaderboards.values():
+            leaderboard.update(record)
+        if self._rollup is not None:
+            self._rollup.add_record(record)
+        self.version += 1
+        self._write(data)
+
+    @synchronized
+    def delete(self, habit_id):
+        """
+        Delete the habit with the given ID and save the remaining records.
+
+        The IDs of the other habits are left unchanged.
+
+        :param habit_id: ID of the habit, as int or string.
+        :return: The deleted record, or None if there is no such habit.
+        """
+        data = self.load()
+        record = self._index.pop(int(habit_id), None)
+        if record is None:
+            return None
+        self._start_dates.remove(record)
+        self._frequencies.remove(habit_id)
+        self._categories.remove(habit_id)
+        for leaderboard in self._leaderboards.values():
+            leaderboard.remove(habit_id)
+        if self._rollup is not None:
+            self._rollup.add_record(record, -1)
+        self._histories.pop(int(habit_id), None)
+        for position, candidate in enumerate(data):
+            if candidate is record:
+                del data[position]
+                break
+        self.version += 1
+        self._write(data)
+        return record
+
+    @synchronized
+    def save(self, data):
+        """
+        Save the habit records and keep them as the cached copy.
+
+        :param data: List of habit records to be saved.
+        """
+        for record in data:
+            normalize_record(record)
+        self._set_data(data)
+        self._write(data)
+
+    @synchronized
+    def record_progress(self, data, habit_id, entry, fields):
+        """
+        Persist a single completion of a habit and keep the records cached.
+
+        :param data: List of habit records with the completion already applied.
+        :param habit_id: ID of the completed habit.
+        :param entry: The new progress entry.
+        :param fields: Habit fields updated by the completion.
+        """
+        if data is not self._data:
+            self._set_data(data)
+        self.version += 1
+        if int(habit_id) in self._index:
+            record = self._index[int(habit_id)]
+            normalize_record(record)
+            self._frequencies.update(record)
+            self._categories.update(record)
+            for leaderboard in self._leaderboards.values():
+                leaderboard.update(record)
+            if self._rollup is not None:
+                self._rollup.add(record["category"], entry["timestamp"])
+        self._write_progress(data, habit_id, entry, fields)
+
+    @synchronized
+    def update(self, record):
+        """
+        Change the fields of a habit, re-indexing and persisting only that habit.
+
+        :param record: Habit record with the ID of a stored habit and the fields
+                       to be changed. Its progress entries are ignored.
+        :return: The updated record, or None if there is no such habit.
+        """
+        data = self.load()
+        cached = self._index.get(int(record["habit_id"]))
+        if cached is None:
+            return None
+        fields = {key: value for key, value in record.items()
+                  if key not in ("habit_id", "progress_entries")}
+        moved = (self._rollup is not None
+                 and cached.get("category") != fields.get("category", cached.get("category")))
+        if moved:
+            self._rollup.add_record(cached, -1)
+        self._start_dates.remove(cached)
+        cached.update(fields)
+        normalize_record(cached)
+        self._start_dates.add(cached)
+        self._frequencies.update(cached)
+        self._categories.update(cached)
+        for leaderboard in self._leaderboards.values():
+            leaderboard.update(cached)
+        if moved:
+            self._rollup.add_record(cached)
+        self.version += 1
+        self._write_progress(data, cached["habit_id"], None, {key: cached[key] for key in fields})
+        return cached
+
+    def _write_progress(self, data, habit_id, entry, fields):
+        if self.writer is not None:
+            self.writer.record_progress(data, habit_id, entry, fields)
+            return
+        self.storage.record_progress(data, habit_id, entry, fields)
+        self._stamp = self.storage.stamp()
+
+    def flush(self):
+        """
+        Write all changes still pending in the background writer.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """
+        Write all pending changes and stop the background writer.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    @synchronized
+    def invalidate(self):
+        """
+        Drop the cached records so the next load parses the storage again.
+        """
+        self._data = None
+        self._index = {}
+        self._start_dates = StartDateIndex()
+        self._frequencies = GroupIndex("frequency")
+        self._categories = GroupIndex("category")
+        self._rollup = None
+        self._histories = {}
+        self._stamp = None
+        self.version += 1
+
+    @synchronized
+    def add_leaderboard(self, name, score, epoch=None, context=None):
+        """
+        Keep the habits ranked by a score from now on.
+
+        :param name: Name of the leaderboard.
+        :param score: Callable computing the score of a habit record.
+        :param epoch: Callable returning the value the scores depend on, if any.
+        :param context: Callable capturing the context passed to score, if any.
+        """
+        leaderboard = Leaderboard(score, epoch, context)
+        if self._data is not None:
+            leaderboard.rebuild(self._index.values())
+        self._leaderboards[name] = leaderboard
+
+    def leaderboard(self, name, count, worst=False):
+        """
+        Return the best (or worst) ranked habits of a leaderboard.
+
+        :param name: Name of the leaderboard.
+        :param count: Maximum number of habits.
+        :param worst: True to return the lowest scores instead of the highest.
+        :return: List of (habit record, score) pairs, in rank order.
+        """
+        while True:
+            with self.lock:
+                self.load()
+                leaderboard = self._leaderboards[name]
+                if not leaderboard.stale():
+                    ranked = leaderboard.worst(count) if worst else leaderboard.best(count)
+                    return [(self._index[habit_id], score) for habit_id, score in ranked]
+                records, version = list(self._index.values()), self.version
+            rebuilt = Leaderboard(leaderboard.score, leaderboard.epoch, leaderboard.context)
+            rebuilt.rebuild(records)
+            with self.lock:
+                if self.version == version and self._leaderboards.get(name) is leaderboard:
+                    self._leaderboards[name] = rebuilt
+
+    def completions(self, period, category=None):
+        """
+        Return the number of completions per day, ISO week or month.
+
+        :param period: "daily", "weekly" or "monthly".
+        :param category: Category to count, or None for all habits.
+        :return: Dict of bucket to number of completions, in chronological order.
+        """
+        while True:
+            with self.lock:
+                self.load()
+                if self._rollup is not None:
+                    return self._rollup.counts(period, category)
+                records, version = list(self._index.values()), self.version
+            rollup = CompletionRollup(records)
+            with self.lock:
+                if self.version == version and self._rollup is None:
+                    self._rollup = rollup
+
+    def _history(self, habit_id):
+        entries = self.get(habit_id)["progress_entries"]
+        if (not getattr(entries, "loaded", True) and hasattr(self.storage, "history_page")
+                and not self._writes_pending()):
+            return None
+        history = self._histories.get(int(habit_id))
+        if history is None or history.entries is not entries:
+            history = self._histories[int(habit_id)] = HistoryIndex(entries)
+        return history
+
+    @synchronized
+    def history_page(self, habit_id, start, stop):
+        """
+        Return a page of the progress entries of a habit, newest first.
+
+        Read from the storage, if it can page histories and the habit's
+        entries are not cached, and from the cached entries otherwise.
+
+        :param habit_id: ID of the habit.
+        :param start: Position of the first entry, 0 being the latest one.
+        :param stop: Position after the last entry.
+        :return: List of progress entries.
+        """
+        history = self._history(habit_id)
+        if history is None:
+            return self.storage.history_page(habit_id, start, stop)
+        return history.page(start, stop)
+
+    @synchronized
+    def history_position(self, habit_id, day):
+        """
+        Return the newest first position of the latest entry recorded on or before a day.
+
+        :param habit_id: ID of the habit.
+        :param day: Date or "YYYY-MM-DD" string.
+        :return: Number of entries recorded after the day, i.e. the position
+                 to jump to in history_page.
+        """
+        history = self._history(habit_id)
+        if history is None:
+            return self.storage.history_position(habit_id, day)
+        return history.position(day)
+
+    @synchronized
+    def habits_with_frequency(self, frequency):
+        """
+        Return the habit records with the given frequency.
+
+        Answered from the frequency index once the records are cached, and
+        by the storage's indexed query, if it has one, before that.
+
+        :param frequency: Frequency of the habits to be returned.
+        :return: List of habit records.
+        """
+        if (self._data is None and hasattr(self.storage, "habits_with_frequency")
+                and not self._writes_pending()):
+            return self.storage.habits_with_frequency(frequency)
+        self.load()
+        return [self._index[habit_id] for habit_id in self._frequencies.ids(frequency)]
+
+    @synchronized
+    def habits_in_category(self, category):
+        """
+        Return the habit records of the given category.
+
+        :param category: Category of the habits to be returned.
+        :return: List of habit records.
+        """
+        self.load()
+        return [self._index[habit_id] for habit_id in self._categories.ids(category)]
+
+    @synchronized
+    def top_category_performance(self):
+        """
+        Return the category with the highest average completion ratio.
+
+        :return: Category, or None if there are no habits.
+        """
+        self.load()
+        return self._categories.top()
+
+    @synchronized
+    def top_frequency_performance(self):
+        """
+        Return the frequency with the highest average completion ratio.
+
+        :return: Frequency, or None if there are no habits.
+        """
+        self.load()
+        return self._frequencies.top()
+
+    @synchronized
+    def habits_in_period(self, from_date, to_date):
+        """
+        Return the habit records that started within the specified period.
+
+        Answered from the start date index once the records are cached, and
+        by the storage's indexed query, if it has one, before that.
+
+        :param from_date: Start date of the period.
+        :param to_date: End date of the period.
+        :return: List of habit records, ordered by start date.
+        """
+        if (self._data is None and hasattr(self.storage, "habits_in_period")
+                and not self._writes_pending()):
+            return self.storage.habits_in_period(from_date, to_date)
+        self.load()
+        return [self._index[habit_id] for habit_id in self._start_dates.between(from_date, to_date)]
+
+    @synchronized
+    def habits_started_before(self, day):
+        """
+        Return the habit records that started before the given date.
+
+        :param day: Date (exclusive).
+        :return: List of habit records, ordered by start date.
+        """
+        self.load()
+        return [self._index[habit_id] for habit_id in self._start_dates.before(day)]
+
+    @synchronized
+    def habits_started_after(self, day):
+        """
+        Return the habit records that started after the given date.
+
+        :param day: Date (exclusive).
+        :return: List of habit records, ordered by start date.
+        """
+        self.load()
+        return [self._index[habit_id] for habit_id in self._start_dates.after(day)]
@@ -0,0 +1,203 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+
+
+class Task:
+    """
+    A function submitted to a TaskRunner, together with its callbacks.
+    """
+    def __init__(self, key, on_done=None, on_error=None):
+        """
+        Initialize a Task.
+
+        Args:
+            key: Key of the task, or None if it is never superseded.
+            on_done (callable): Called with the result on the main loop.
+            on_error (callable): Called with the raised exception on the main loop.
+        """
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+
+class TaskRunner:
+    """
+    Runs slow functions on a worker thread and hands their results back to Tk.
+
+    Tk widgets may only be used from the thread running the main loop, so
+    finished tasks are put on a queue which is polled with after(), and their
+    callbacks run on the main loop. A task submitted under a key supersedes
+    the earlier task with the same key: it is cancelled if it has not started
+    yet, and its result is dropped otherwise. Tasks that must not be skipped,
+    such as writes, are submitted without a key. Other threads hand callbacks
+    to the main loop with post().
+    """
+    def __init__(self, widget, on_busy=None, on_error=None, interval=50, workers=1,
+                 idle_interval=None):
+        """
+        Initialize a TaskRunner and its worker threads.
+
+        Args:
+            widget: Tk widget whose after() is used to poll for results.
+            on_busy (callable): Called with True when tasks start to be pending
+                and with False when none are pending any more.
+            on_error (callable): Called with the exception of a failed task that
+                has no on_error of its own. Without one, the exception is raised
+                from the polling callback.
+            interval (int): Milliseconds between two polls.
+            workers (int): Number of worker threads. With a single worker, tasks
+                run one after another in the order they were submitted.
+            idle_interval (int): Milliseconds between two polls while no tasks
+                are pending, or None to stop polling then. Callbacks posted from
+                other threads are only run while polling.
+        """
+        self.widget = widget
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.busy = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="habit-task")
+        self._results = queue.SimpleQueue()
+        self._posted = queue.SimpleQueue()
+        self._pending = set()
+        self._current = {}
+        self._polling = None
+        self._schedule_poll()
+
+    def _run(self, task, function, args):
+        if task.cancelled:
+            self._results.put((task, None, None))
+            return
+        try:
+            self._results.put((task, function(*args), None))
+        except Exception as error:
+            self._results.put((task, None, error))
+
+    def _cancel(self, task):
+        task.cancelled = True
+        if task.future.cancel():
+            self._pending.discard(task)
+        if self._current.get(task.key) is task:
+            del self._current[task.key]
+
+    def _update_busy(self):
+        busy = any(not task.cancelled for task in self._pending)
+        if busy != self.busy:
+            self.busy = busy
+            if self.on_busy is not None:
+                self.on_busy(busy)
+
+    def _schedule_poll(self):
+        if self._polling is None:
+            if self._pending:
+                self._polling = self.widget.after(self.interval, self.poll)
+            elif self.idle_interval is not None:
+                self._polling = self.widget.after(self.idle_interval, self.poll)
+
+    def submit(self, function, *args, key=None, on_done=None, on_error=None):
+        """
+        Run a function on the worker thread.
+
+        Args:
+            function (callable): Function to be run. It must not use any widgets.
+            *args: Arguments passed to the function.
+            key: Key under which the task supersedes earlier tasks, or None.
+            on_done (callable): Called with the result on the main loop.
+            on_error (callable): Called with the raised exception on the main loop.
+
+        Returns:
+            Task: The submitted task.
+        """
+        task = Task(key, on_done, on_error)
+        if key is not None and key in self._current:
+            self._cancel(self._current[key])
+        if key is not None:
+            self._current[key] = task
+        self._pending.add(task)
+        task.future = self._executor.submit(self._run, task, function, args)
+        self._update_busy()
+        self._schedule_poll()
+        return task
+
+    def post(self, callback, *args):
+        """
+        Run a callback on the main loop. May be called from any thread.
+
+        Args:
+            callback (callable): Function to be run. It may use widgets.
+            *args: Arguments passed to the callback.
+        """
+        self._posted.put((callback, args))
+
+    def cancel(self, key):
+        """
+        Cancel the pending task with the given key, if there is one.
+
+        Args:
+            key: Key the task was submitted under.
+        """
+        if key in self._current:
+            self._cancel(self._current[key])
+            self._update_busy()
+
+    def poll(self):
+        """
+        Run the callbacks of the finished tasks.
+
+        Called by after() while tasks are pending, and while idle if an
+        idle_interval is set.
+        """
+        self._polling = None
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        posted = []
+        while True:
+            try:
+                posted.append(self._posted.get_nowait())
+            except queue.Empty:
+                break
+        for task, _, _ in finished:
+            self._pending.discard(task)
+            if self._current.get(task.key) is task:
+                del self._current[task.key]
+        self._schedule_poll()
+        unhandled = None
+        try:
+            for callback, args in posted:
+                callback(*args)
+            for task, result, error in finished:
+                if task.cancelled:
+                    continue
+                if error is None:
+                    if task.on_done is not None:
+                        task.on_done(result)
+                elif task.on_error is not None:
+                    task.on_error(error)
+                elif self.on_error is not None:
+                    self.on_error(error)
+                else:
+                    unhandled = error
+        finally:
+            self._update_busy()
+        if unhandled is not None:
+            raise unhandled
+
+    def close(self):
+        """
+        Cancel all tasks that have not started and wait for the running ones.
+
+        Tasks submitted without a key are still run, so no writes are lost.
+        """
+        for task in list(self._current.values()):
+            self._cancel(task)
+        if self._polling is not None:
+            self.widget.after_cancel(self._polling)
+            self._polling = None
+        self._executor.shutdown(wait=True)
@@ -1,11 +1,21 @@
 import datetime
+import os
+import tempfile
 import unittest
+from unittest import mock
 
-from analytics import Analytics
+from analytics import (Analytics, AnalyticsAccumulator, AnalyticsCache, EvaluationContext,
+                       record_success_rate, success_rate)
 from habit import Habit
+from storage import HabitStore, IdSequence, open_storage
 
 class AnalyticsTestCase(unittest.TestCase):
     def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("habit.habit_ids", IdSequence(os.path.join(directory.name, "habits.seq")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.analytics = Analytics()
         self.habits = [
             Habit("test_habit_1", "", "daily", "test", 1, [], 
@@ -102,5 +112,125 @@ class AnalyticsTestCase(unittest.TestCase):
         output = self.analytics.average_remaining_time(self.habits)
         self.assertEqual(output, 0)
 
+
+class AnalyticsSummaryTestCase(unittest.TestCase):
+    def setUp(self):
+        AnalyticsTestCase.setUp(self)
+        self.habits[0].start_date = datetime.date(2024, 1, 15)
+        self.habits[2].category = "other"
+        self.habits[3].frequency = "monthly"
+        for habit in self.habits[:3]:
+            habit.complete_habit()
+            habit.update_success_status()
+        self.habits[1].longest_streak = 4
+
+    def assertMatchesMethods(self, summary):
+        analytics = self.analytics
+        self.assertEqual(summary.habit_count, len(self.habits))
+        self.assertEqual(summary.active_habits, analytics.active_habits(self.habits))
+        self.assertEqual(summary.top_streak_habit.habit_id, analytics.top_streak_habit(self.habits))
+        self.assertEqual(summary.top_streak, 4)
+        self.assertEqual(summary.highest_success_rate_habit.habit_id,
+                         analytics.highest_success_rate(self.habits))
+        self.assertEqual(summary.highest_failure_rate_habit.habit_id,
+                         analytics.highest_failure_rate(self.habits))
+        self.assertEqual(summary.overall_successes, analytics.overall_successes(self.habits))
+        self.assertEqual(summary.overall_failures, analytics.overall_failures(self.habits))
+        self.assertEqual(summary.top_category_performance,
+                         analytics.top_category_performance(self.habits))
+        self.assertEqual(summary.top_frequency_performance,
+                         analytics.top_frequency_performance(self.habits))
+        self.assertEqual(summary.average_streak_length, analytics.average_streak_length(self.habits))
+        self.assertEqual(summary.average_streak_break, analytics.average_streak_break(self.habits))
+
+    def test_summary_matches_methods(self):
+        self.assertMatchesMethods(self.analytics.summarize(self.habits))
+
+    def test_merged_summary_matches_methods(self):
+        accumulator = AnalyticsAccumulator().extend(self.habits[:2])
+        accumulator.merge(AnalyticsAccumulator().extend(self.habits[2:]))
+        self.assertMatchesMethods(accumulator.result())
+
+    def test_parallel_summary_matches_serial(self):
+        habits = self.habits * 7
+        context = EvaluationContext.capture()
+        summary = self.analytics.summarize_parallel(habits, workers=3, context=context)
+        self.assertEqual(summary, self.analytics.summarize(habits, context))
+        self.assertIs(summary.top_streak_habit, self.habits[1])
+        self.assertEqual(self.analytics.summarize_parallel([], workers=2, context=context),
+                         self.analytics.summarize([], context))
+
+    def test_parallel_summary_over_stored_habits(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = open_storage(os.path.join(directory.name, "habits") + os.sep)
+        storage.save([habit.to_record() for habit in self.habits])
+        records = HabitStore(storage).load()
+        habits = [Habit.from_record(record) for record in records]
+        context = EvaluationContext.capture()
+        summary = self.analytics.summarize_parallel(habits, workers=2, context=context)
+        self.assertEqual(summary, self.analytics.summarize(habits, context))
+        self.assertFalse(any(record["progress_entries"].loaded for record in records))
+
+    def test_remaining_time_does_not_modify_habits(self):
+        deadline = (datetime.datetime.now() + datetime.timedelta(days=3, hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+        self.habits[0].next_deadline = deadline
+        summary = self.analytics.summarize(self.habits)
+        self.assertEqual(summary.average_remaining_time, 3)
+        self.assertEqual(self.habits[0].next_deadline, deadline)
+
+    def test_record_success_rate(self):
+        context = EvaluationContext.capture()
+        for habit in self.habits:
+            self.assertEqual(record_success_rate(habit.to_record(), context),
+                             success_rate(habit, context))
+
+    def test_context_makes_results_reproducible(self):
+        context = EvaluationContext.capture(datetime.datetime(2030, 8, 31, 12))
+        self.assertEqual(context.week, 35)
+        self.assertEqual(context.month, 2030 * 12 + 8)
+        for habit in self.habits:
+            habit.start_date = datetime.date(2030, 8, 1)
+        self.assertEqual(self.analytics.overall_failures(self.habits, context), 29 * 3 - 1 + 4)
+        summary = self.analytics.summarize(self.habits, context)
+        self.assertEqual(summary, self.analytics.summarize(self.habits, context))
+        self.assertEqual(summary.overall_failures, self.analytics.overall_failures(self.habits, context))
+
+    def test_empty_summary(self):
+        summary = self.analytics.summarize([])
+        self.assertEqual(summary.habit_count, 0)
+        self.assertIsNone(summary.top_streak_habit)
+        self.assertIsNone(summary.top_category_performance)
+        self.assertEqual(summary.average_streak_length, 0)
+
+class AnalyticsCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        AnalyticsTestCase.setUp(self)
+        self.version = 1
+        self.loads = 0
+        self.cache = AnalyticsCache(self.load_habits, lambda: self.version)
+
+    def load_habits(self):
+        self.loads += 1
+        return list(self.habits)
+
+    def test_results_are_memoized(self):
+        summary = self.cache.summary()
+        self.assertIs(self.cache.summary(), summary)
+        self.assertEqual(self.cache.get("overall_successes"), 0)
+        self.assertEqual(self.loads, 1)
+
+    def test_nothing_is_computed_before_requested(self):
+        AnalyticsCache(self.load_habits, lambda: self.version)
+        self.assertEqual(self.loads, 0)
+
+    def test_version_change_invalidates(self):
+        self.assertEqual(self.cache.get("overall_successes"), 0)
+        self.habits[0].successes = 3
+        self.assertEqual(self.cache.get("overall_successes"), 0)
+        self.version += 1
+        self.assertEqual(self.cache.get("overall_successes"), 3)
+        self.assertEqual(self.loads, 2)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
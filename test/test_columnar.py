@@ -0,0 +1,73 @@
+import datetime
+import unittest
+
+from analytics import Analytics
+from habit import Habit
+
+try:
+    import numpy
+    from columnar import ColumnarAnalytics, HabitColumns, iso_weeks, to_microseconds
+except ImportError:
+    numpy = None
+
+def make_habit(frequency, category, start_date, successes=0, longest_streak=0, entries=0):
+    habit = Habit(f"{frequency} {category}", "", frequency, category, 1, [],
+                  start_date, "edit", id=1)
+    habit.start_date = start_date
+    habit.successes = successes
+    habit.longest_streak = longest_streak
+    for day in range(entries):
+        habit.progress_entries.append(datetime.datetime(2023, 1, 1) + datetime.timedelta(days=day))
+    return habit
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ColumnarAnalyticsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.analytics = Analytics()
+        self.columnar = ColumnarAnalytics()
+        self.habits = [
+            make_habit("daily", "health", datetime.date(2022, 12, 30), 3, 2, 3),
+            make_habit("weekly", "work", datetime.date(2021, 1, 3), 1, 1, 2),
+            make_habit("monthly", "health", datetime.date(2020, 2, 29), 5, 4, 5),
+            make_habit("daily", "study", datetime.date(2023, 6, 1), 0, 0, 0),
+            make_habit("monthly", "work", datetime.date(2023, 1, 31), 2, 2, 4),
+            make_habit("weekly", "study", datetime.date(2019, 12, 30), 7, 4, 7),
+        ]
+        for habit_id, habit in enumerate(self.habits, 1):
+            habit.habit_id = habit_id
+
+    def test_iso_weeks(self):
+        days = [datetime.date(2019, 12, 30) + datetime.timedelta(days=day) for day in range(800)]
+        weeks = iso_weeks(numpy.array([day.toordinal() for day in days]))
+        self.assertEqual(list(weeks), [day.isocalendar()[1] for day in days])
+
+    def test_rates_match_analytics(self):
+        for name in ("top_streak_habit", "highest_success_rate", "highest_failure_rate",
+                     "overall_successes", "overall_failures", "top_category_performance",
+                     "top_frequency_performance", "average_streak_length", "average_streak_break"):
+            with self.subTest(name):
+                self.assertEqual(getattr(self.columnar, name)(self.habits),
+                                 getattr(self.analytics, name)(self.habits))
+
+    def test_summary_matches_analytics(self):
+        deadline = datetime.datetime.now() + datetime.timedelta(days=5, hours=2)
+        self.habits[0].next_deadline = deadline.strftime("%Y-%m-%d %H:%M:%S")
+        columns = HabitColumns(self.habits)
+        self.assertEqual(self.columnar.summarize(columns), self.analytics.summarize(self.habits))
+        self.assertEqual(self.columnar.average_remaining_time(columns), 5)
+
+    def test_deadline_column(self):
+        self.habits[0].next_deadline = "2023-08-02 10:00:00"
+        self.habits[1].next_deadline = datetime.datetime(2023, 8, 2, 10, 0, 0, 5)
+        self.habits[2].next_deadline = ""
+        columns = HabitColumns(self.habits)
+        self.assertEqual(list(columns.has_deadline[:3]), [True, True, False])
+        self.assertEqual(list(columns.deadline[:3]),
+                         [to_microseconds(self.habits[0].next_deadline),
+                          to_microseconds(self.habits[1].next_deadline), 0])
+
+    def test_empty_summary(self):
+        self.assertEqual(self.columnar.summarize([]), self.analytics.summarize([]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,19 @@
 import datetime
+import os
+import tempfile
 import unittest
+from unittest import mock
 
-from habit import Habit
+from habit import Habit, ProgressLog, StreakCounter
+from storage import IdSequence, LazyProgress
 
 class HabitTestCase(unittest.TestCase):
     def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("habit.habit_ids", IdSequence(os.path.join(directory.name, "habits.seq")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.habit = Habit("test_habit", "", "daily", "test", 1, [], 
                            datetime.date(2030, 7, 20).strftime("%Y-%m-%d %H:%M:%S"), "add")
 
@@ -67,5 +76,143 @@ class HabitTestCase(unittest.TestCase):
                         and tod_successes == successes + 1
                         and tod_streak == streak + 1)
         
+class HabitRecordTestCase(unittest.TestCase):
+    def setUp(self):
+        self.record = {"habit_id": 3, "title": "read", "description": "lorem ipsum",
+                       "active": True, "start_date": "2023-08-01", "last_done": "2023-08-02",
+                       "frequency": "weekly", "successes": 2, "current_streak": 1,
+                       "longest_streak": 2, "category": "personal", "significance": "7",
+                       "next_deadline": "2023-08-09 10:00:00",
+                       "progress_entries": [{"timestamp": "2023-08-01 10:00:00"},
+                                            {"timestamp": "2023-08-02 10:00:00"}],
+                       "goal": 7}
+
+    def test_from_record(self):
+        habit = Habit.from_record(self.record)
+        self.assertEqual(habit.habit_id, 3)
+        self.assertEqual(habit.start_date, datetime.date(2023, 8, 1))
+        self.assertEqual(habit.end_date, "2023-08-02")
+        self.assertEqual(habit.longest_streak, 2)
+        self.assertEqual(len(habit.progress_entries), 2)
+
+    def test_record_round_trip(self):
+        self.assertEqual(Habit.from_record(self.record).to_record(), self.record)
+
+    def test_slots(self):
+        habit = Habit.from_record(self.record)
+        with self.assertRaises(AttributeError):
+            habit.unknown = 1
+
+class ProgressLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.log = ProgressLog([{"timestamp": "2023-08-01 10:00:00"},
+                                {"timestamp": datetime.datetime(2023, 8, 2, 8, 30)}])
+
+    def test_entries_are_stored_as_epoch_seconds(self):
+        self.assertEqual(self.log.epochs.typecode, "q")
+        self.assertEqual(self.log.epochs[1] - self.log.epochs[0], 22 * 3600 + 30 * 60)
+
+    def test_entries_yield_datetimes(self):
+        self.assertEqual(self.log[-1], {"timestamp": datetime.datetime(2023, 8, 2, 8, 30)})
+        self.assertEqual(list(self.log.timestamps())[0], datetime.datetime(2023, 8, 1, 10))
+
+    def test_append_and_to_entries(self):
+        self.log.append(datetime.datetime(2023, 8, 3, 9))
+        self.assertEqual(len(self.log), 3)
+        self.assertEqual(self.log.to_entries()[-1], {"timestamp": "2023-08-03 09:00:00"})
+        self.assertEqual(ProgressLog(self.log.to_entries()), self.log)
+
+    def test_habit_keeps_progress_log(self):
+        habit = Habit("test_habit", "", "daily", "test", 1, self.log.to_entries(),
+                      datetime.date(2030, 7, 20), "edit", 1)
+        self.assertIsInstance(habit.progress_entries, ProgressLog)
+        self.assertEqual(habit.progress_entries, self.log)
+
+    def test_lazy_entries_are_not_read(self):
+        loads = []
+        def loader():
+            loads.append(1)
+            return [{"timestamp": "2023-08-01 10:00:00"}, {"timestamp": "2023-08-02 08:30:00"}]
+        lazy = LazyProgress(2, {"timestamp": "2023-08-02 08:30:00"}, loader)
+        log = ProgressLog(lazy)
+        self.assertEqual((len(log), log[-1]), (2, self.log[-1]))
+        log.append(datetime.datetime(2023, 8, 3, 9))
+        self.assertEqual(log[-1], {"timestamp": datetime.datetime(2023, 8, 3, 9)})
+        self.assertEqual(list(log[2:].timestamps()), [datetime.datetime(2023, 8, 3, 9)])
+        self.assertEqual(loads, [])
+        self.assertFalse(log.loaded)
+        self.assertEqual(log.to_entries()[1:], [{"timestamp": "2023-08-02 08:30:00"},
+                                                {"timestamp": "2023-08-03 09:00:00"}])
+        self.assertEqual(loads, [1])
+
+    def test_checkpointed_completion_does_not_read_history(self):
+        lazy = LazyProgress(1, {"timestamp": "2023-12-01 09:00:00"}, lambda: self.fail("history read"))
+        counter = StreakCounter("daily")
+        counter.update(Habit("test", "", "daily", "test", 1, [datetime.datetime(2023, 12, 1, 9)],
+                             None, "edit", id=1))
+        habit = Habit.from_record({"habit_id": 1, "title": "test", "description": "", "active": True,
+                                   "start_date": "2023-12-01", "last_done": "2023-12-01",
+                                   "frequency": "daily", "successes": 1, "current_streak": 1,
+                                   "longest_streak": 1, "category": "test", "significance": 1,
+                                   "next_deadline": None, "progress_entries": lazy, "goal": 1})
+        habit.progress_entries.append(datetime.datetime(2023, 12, 2, 9))
+        habit.update_streaks(counter, now=datetime.date(2023, 12, 2))
+        self.assertEqual((habit.successes, habit.current_streak), (2, 2))
+        self.assertFalse(lazy.loaded)
+
+class StreakCounterTestCase(unittest.TestCase):
+    def make_habit(self, frequency, days):
+        habit = Habit("test", "", frequency, "test", 1, [], None, "edit", id=1)
+        for day in days:
+            habit.progress_entries.append(datetime.datetime(2023, 12, 1, 9) + datetime.timedelta(days=day))
+        return habit
+
+    def test_daily_streaks(self):
+        habit = self.make_habit("daily", [0, 1, 2, 5, 6])
+        habit.update_streaks(now=datetime.date(2023, 12, 8))
+        self.assertEqual((habit.successes, habit.current_streak, habit.longest_streak), (5, 2, 3))
+        habit.update_streaks(now=datetime.date(2023, 12, 9))
+        self.assertEqual(habit.current_streak, 0)
+
+    def test_weekly_streaks_span_years(self):
+        habit = self.make_habit("weekly", [25, 27, 32, 37, 45])
+        habit.update_streaks(now=datetime.date(2024, 1, 16))
+        self.assertEqual((habit.successes, habit.current_streak, habit.longest_streak), (3, 1, 2))
+
+    def test_monthly_streaks(self):
+        habit = self.make_habit("monthly", [0, 20, 31, 62, 125])
+        habit.update_streaks(now=datetime.date(2024, 4, 30))
+        self.assertEqual((habit.successes, habit.current_streak, habit.longest_streak), (4, 1, 3))
+        habit.update_streaks(now=datetime.date(2024, 6, 1))
+        self.assertEqual(habit.current_streak, 0)
+
+    def test_update_only_processes_new_entries(self):
+        habit = self.make_habit("daily", [0, 1])
+        counter = habit.update_streaks()
+        habit.progress_entries.append(datetime.datetime(2023, 12, 3, 9))
+        counter.update(habit)
+        self.assertEqual((counter.processed, counter.run, counter.successes), (3, 3, 3))
+        habit.frequency = "weekly"
+        counter.update(habit)
+        self.assertEqual((counter.processed, counter.run, counter.successes), (3, 1, 1))
+
+    def test_checkpoint_state_round_trip(self):
+        habit = self.make_habit("daily", [0, 1, 3])
+        counter = StreakCounter.from_state(habit.update_streaks().to_state())
+        habit.progress_entries.append(datetime.datetime(2023, 12, 5, 9))
+        counter.update(habit)
+        self.assertEqual((counter.processed, counter.run, counter.successes), (4, 2, 4))
+        self.assertEqual(StreakCounter.from_state(None).to_state(), StreakCounter().to_state())
+
+    def test_counter_matches_full_rebuild(self):
+        habit = self.make_habit("daily", [])
+        counter = StreakCounter()
+        for day in [0, 1, 3, 4, 5, 9, 10]:
+            habit.progress_entries.append(datetime.datetime(2023, 12, 1, 9) + datetime.timedelta(days=day))
+            counter.update(habit)
+        rebuilt = StreakCounter().update(habit)
+        self.assertEqual((counter.run, counter.longest, counter.successes),
+                         (rebuilt.run, rebuilt.longest, rebuilt.successes))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,985 @@
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from analytics import Analytics
+from habit import Habit
+from storage import (CompletionRollup, DeferredWriter, GroupIndex, HabitStore, IdSequence, IndexedStorage, JsonStorage,
+                     LazyProgress, Leaderboard, ProgressJournal, ShardedStorage, SQLiteStorage, StartDateIndex, file_stamp,
+                     last_habit_id, open_storage)
+
+def make_record(habit_id, title):
+    return {"habit_id": habit_id, "title": title, "description": "", "active": True,
+            "start_date": "2023-08-01", "last_done": "2023-08-01", "frequency": "daily",
+            "successes": 0, "current_streak": 0, "longest_streak": 0,
+            "category": "test", "significance": "1",
+            "next_deadline": "2023-08-02 10:00:00", "progress_entries": [], "goal": 1}
+
+class JsonStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.json")
+        self.storage = JsonStorage(self.filename)
+        self.storage.save([make_record(1, "first"), make_record(2, "second")])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record_completion(self, data, index, timestamp):
+        entry = {"timestamp": timestamp}
+        data[index]["progress_entries"].append(entry)
+        data[index]["successes"] += 1
+        self.storage.record_progress(data, data[index]["habit_id"], entry,
+                                     {"successes": data[index]["successes"]})
+
+    def test_record_progress_does_not_rewrite_data_file(self):
+        with open(self.filename) as file:
+            before = file.read()
+        data = self.storage.load()
+        self.record_completion(data, 1, "2023-08-01 10:00:00")
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), before)
+        self.assertTrue(os.path.exists(self.filename + ".journal"))
+
+    def test_load_folds_journal(self):
+        data = self.storage.load()
+        self.record_completion(data, 1, "2023-08-01 10:00:00")
+        self.record_completion(data, 1, "2023-08-02 10:00:00")
+        loaded = JsonStorage(self.filename).load()
+        self.assertEqual(loaded[1]["successes"], 2)
+        self.assertEqual(loaded[1]["progress_entries"],
+                         [{"timestamp": "2023-08-01 10:00:00"},
+                          {"timestamp": "2023-08-02 10:00:00"}])
+        self.assertEqual(loaded[0]["progress_entries"], [])
+
+    def test_save_compacts_journal(self):
+        data = self.storage.load()
+        self.record_completion(data, 0, "2023-08-01 10:00:00")
+        self.storage.save(data)
+        self.assertFalse(os.path.exists(self.filename + ".journal"))
+        with open(self.filename) as file:
+            self.assertEqual(json.load(file)["habits"][0]["successes"], 1)
+
+    def test_crash_before_journal_clear_does_not_duplicate(self):
+        data = self.storage.load()
+        self.record_completion(data, 0, "2023-08-01 10:00:00")
+        with mock.patch.object(ProgressJournal, "clear", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self.storage.save(data)
+        self.assertTrue(os.path.exists(self.filename + ".journal"))
+        storage = JsonStorage(self.filename)
+        loaded = storage.load()
+        self.assertEqual(loaded[0]["progress_entries"], [{"timestamp": "2023-08-01 10:00:00"}])
+        self.assertEqual(loaded[0]["successes"], 1)
+        self.storage = storage
+        self.record_completion(loaded, 0, "2023-08-02 10:00:00")
+        self.assertEqual(len(JsonStorage(self.filename).load()[0]["progress_entries"]), 2)
+
+    def test_legacy_list_file_is_loaded(self):
+        with open(self.filename, "w") as file:
+            json.dump([make_record(1, "first")], file)
+        ProgressJournal(self.filename + ".journal").append(1, {"timestamp": "2023-08-01 10:00:00"},
+                                                           {"successes": 1})
+        loaded = JsonStorage(self.filename).load()
+        self.assertEqual(loaded[0]["successes"], 1)
+        self.assertEqual(len(loaded[0]["progress_entries"]), 1)
+        self.assertEqual(last_habit_id(self.filename), 1)
+
+    def test_torn_journal_line_is_ignored(self):
+        data = self.storage.load()
+        self.record_completion(data, 0, "2023-08-01 10:00:00")
+        with open(self.filename + ".journal", "a") as file:
+            file.write('{"habit_id": 1, "entr')
+        loaded = JsonStorage(self.filename).load()
+        self.assertEqual(len(loaded[0]["progress_entries"]), 1)
+
+    def test_append_after_torn_line_is_kept(self):
+        journal = ProgressJournal(self.filename + ".journal")
+        journal.append(1, {"timestamp": "2023-08-01 10:00:00"}, {})
+        with open(journal.filename, "a") as file:
+            file.write('{"habit_id": 1, "entr')
+        journal.append(1, {"timestamp": "2023-08-02 10:00:00"}, {})
+        journal.append(2, {"timestamp": "2023-08-03 10:00:00"}, {})
+        self.assertEqual([record["entry"]["timestamp"] for record in journal.records()],
+                         ["2023-08-01 10:00:00", "2023-08-02 10:00:00", "2023-08-03 10:00:00"])
+
+    def test_save_leaves_no_temporary_files(self):
+        self.storage.save([make_record(1, "first")])
+        self.assertEqual(os.listdir(self.directory.name), ["habits.json"])
+
+    def test_corrupt_file_is_kept(self):
+        with open(self.filename, "w") as file:
+            file.write('[{"habit_id": 1, "ti')
+        self.assertEqual(self.storage.load(), [])
+        with open(self.filename + ".corrupt") as file:
+            self.assertEqual(file.read(), '[{"habit_id": 1, "ti')
+
+    def test_compaction_threshold(self):
+        self.storage = JsonStorage(self.filename, compact_after=1)
+        data = self.storage.load()
+        self.record_completion(data, 0, "2023-08-01 10:00:00")
+        self.record_completion(data, 0, "2023-08-02 10:00:00")
+        self.assertFalse(os.path.exists(self.filename + ".journal"))
+        self.assertEqual(len(JsonStorage(self.filename).load()[0]["progress_entries"]), 2)
+
+class CountingStorage(JsonStorage):
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return super().load()
+
+class ShardedStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "habits") + os.sep
+        self.storage = open_storage(self.path)
+        first = make_record(1, "first")
+        first["progress_entries"] = [{"timestamp": "2023-07-31 10:00:00"},
+                                     {"timestamp": "2023-08-01 10:00:00"},
+                                     {"timestamp": "2023-08-02 10:00:00"}]
+        self.records = [first, make_record(2, "second")]
+        self.storage.save(json.loads(json.dumps(self.records)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def habit_files(self, habit_id):
+        directory = os.path.join(self.path, str(habit_id))
+        return {name: file_stamp(os.path.join(directory, name))
+                for name in os.listdir(directory)}
+
+    def test_open_storage_selects_sharded_layout(self):
+        self.assertIsInstance(self.storage, ShardedStorage)
+
+    def test_round_trip(self):
+        self.assertEqual(ShardedStorage(self.path).load(), self.records)
+
+    def test_progress_is_split_into_monthly_segments(self):
+        self.assertEqual(self.storage.segments(1), ["2023-07", "2023-08"])
+        self.assertEqual(len(self.storage.read_segment(1, "2023-08")), 2)
+        self.assertEqual(next(self.storage.history(1, newest_first=True)),
+                         {"timestamp": "2023-08-02 10:00:00"})
+
+    def test_history_pages_newest_first(self):
+        self.assertEqual(self.storage.history_page(1, 1, 5),
+                         [{"timestamp": "2023-08-01 10:00:00"}, {"timestamp": "2023-07-31 10:00:00"}])
+        self.assertEqual(self.storage.history_position(1, datetime.date(2023, 8, 1)), 1)
+        self.assertEqual(self.storage.history_position(1, "2023-07-01"), 3)
+        self.assertEqual(self.storage.history_position(2, "2023-07-01"), 0)
+
+    def test_history_reads_only_the_segments_needed(self):
+        read = []
+        read_segment = self.storage.read_segment
+        def counting_read(habit_id, month):
+            read.append(month)
+            return read_segment(habit_id, month)
+        self.storage.read_segment = counting_read
+        self.assertEqual(self.storage.history_page(1, 2, 3), [{"timestamp": "2023-07-31 10:00:00"}])
+        self.assertEqual(self.storage.history_page(1, 0, 1), [{"timestamp": "2023-08-02 10:00:00"}])
+        self.assertEqual(self.storage.history_position(1, "2023-07-15"), 3)
+        self.assertEqual(read, ["2023-07", "2023-08", "2023-07"])
+
+    def test_history_without_monthly_counts(self):
+        filename = os.path.join(self.path, "1", "habit.json")
+        with open(filename) as file:
+            summary = json.load(file)
+        summary["progress"] = summary["progress"][:2]
+        with open(filename, "w") as file:
+            json.dump(summary, file)
+        storage = ShardedStorage(self.path)
+        self.assertEqual(storage.history_page(1, 1, 3), [{"timestamp": "2023-08-01 10:00:00"},
+                                                         {"timestamp": "2023-07-31 10:00:00"}])
+        storage.record_progress(None, 1, {"timestamp": "2023-09-01 10:00:00"}, {})
+        with open(filename) as file:
+            self.assertEqual(json.load(file)["progress"][2],
+                             {"2023-07": 1, "2023-08": 2, "2023-09": 1})
+        self.assertEqual(storage.history_position(1, "2023-08-01"), 2)
+
+    def test_store_pages_history_from_segments(self):
+        store = HabitStore(self.storage)
+        entries = store.get(1)["progress_entries"]
+        self.assertEqual(store.history_page(1, 0, 1), [{"timestamp": "2023-08-02 10:00:00"}])
+        self.assertEqual(store.history_position(1, "2023-07-31"), 2)
+        self.assertFalse(entries.loaded)
+
+    def test_record_progress_touches_one_segment(self):
+        data = self.storage.load_summaries()
+        before = self.habit_files(1)
+        other = self.habit_files(2)
+        time.sleep(0.01)
+        entry = {"timestamp": datetime.datetime(2023, 8, 3, 10)}
+        data[0]["progress_entries"].append(entry)
+        self.storage.record_progress(data, 1, entry, {"successes": 4})
+        after = self.habit_files(1)
+        self.assertEqual(after["progress-2023-07.jsonl"], before["progress-2023-07.jsonl"])
+        self.assertNotEqual(after["progress-2023-08.jsonl"], before["progress-2023-08.jsonl"])
+        self.assertEqual(self.habit_files(2), other)
+        record = ShardedStorage(self.path).load_summaries()[0]
+        self.assertEqual(record["successes"], 4)
+        self.assertEqual(len(record["progress_entries"]), 4)
+        self.assertFalse(data[0]["progress_entries"].loaded)
+
+    def test_fields_only_update_keeps_segments(self):
+        before = self.habit_files(1)
+        self.storage.record_progress(None, 1, None, {"title": "renamed"})
+        after = self.habit_files(1)
+        self.assertNotEqual(after.pop("habit.json"), before.pop("habit.json"))
+        self.assertEqual(after, before)
+        record = ShardedStorage(self.path).load_summaries()[0]
+        self.assertEqual(record["title"], "renamed")
+        self.assertEqual(len(record["progress_entries"]), 3)
+
+    def test_save_rewrites_only_changed_files(self):
+        data = self.storage.load_summaries()
+        before = self.habit_files(1)
+        time.sleep(0.01)
+        data[1]["title"] = "renamed"
+        self.storage.save(data)
+        self.assertEqual(self.habit_files(1), before)
+        self.assertFalse(data[0]["progress_entries"].loaded)
+        self.assertEqual(ShardedStorage(self.path).load()[1]["title"], "renamed")
+
+    def test_deleted_habits_are_removed(self):
+        data = self.storage.load_summaries()
+        self.storage.save(data[:1])
+        self.assertEqual(os.path.exists(os.path.join(self.path, "2")), False)
+        self.assertEqual(last_habit_id(self.path), 1)
+
+class CountingSaves(JsonStorage):
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.saves = 0
+        self.completions = 0
+        self.written = []
+
+    def save(self, data):
+        self.saves += 1
+        super().save(data)
+
+    def record_progress(self, data, habit_id, entry, fields):
+        self.completions += 1
+        self.written.append(data)
+        super().record_progress(data, habit_id, entry, fields)
+
+class DeferredWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.json")
+        self.storage = CountingSaves(self.filename)
+        self.writer = DeferredWriter(self.storage, delay=60)
+
+    def tearDown(self):
+        self.writer.close()
+        self.directory.cleanup()
+
+    def test_saves_are_coalesced(self):
+        data = []
+        for habit_id in range(1, 11):
+            data.append(make_record(habit_id, "habit"))
+            self.writer.save(data)
+        self.assertTrue(self.writer.busy)
+        self.assertFalse(os.path.exists(self.filename))
+        self.writer.flush()
+        self.assertEqual(self.storage.saves, 1)
+        self.assertEqual(len(JsonStorage(self.filename).load()), 10)
+        self.assertFalse(self.writer.busy)
+
+    def test_pending_save_absorbs_completions(self):
+        data = [make_record(1, "first")]
+        self.writer.save(data)
+        entry = {"timestamp": "2023-08-01 10:00:00"}
+        data[0]["progress_entries"].append(entry)
+        self.writer.record_progress(data, 1, entry, {})
+        self.writer.flush()
+        self.assertEqual((self.storage.saves, self.storage.completions), (1, 0))
+        self.assertEqual(JsonStorage(self.filename).load()[0]["progress_entries"], [entry])
+
+    def test_journaled_completion_does_not_copy_records(self):
+        data = [make_record(habit_id, "habit") for habit_id in range(1, 4)]
+        self.storage.save(data)
+        entry = {"timestamp": "2023-08-01 10:00:00"}
+        data[0]["progress_entries"].append(entry)
+        self.writer.record_progress(data, 1, entry, {})
+        self.writer.flush()
+        self.assertFalse(self.storage.written[0].taken)
+        self.assertEqual(JsonStorage(self.filename).load()[0]["progress_entries"], [entry])
+
+    def test_compaction_copies_records(self):
+        self.storage.compact_after = 0
+        data = [make_record(1, "first")]
+        entry = {"timestamp": "2023-08-01 10:00:00"}
+        data[0]["progress_entries"].append(entry)
+        self.writer.record_progress(data, 1, entry, {})
+        self.writer.flush()
+        self.assertTrue(self.storage.written[0].taken)
+        self.assertEqual(JsonStorage(self.filename).load()[0]["progress_entries"], [entry])
+
+    def test_background_write(self):
+        writer = DeferredWriter(self.storage, delay=0)
+        writer.save([make_record(1, "first")])
+        for _ in range(100):
+            if not writer.busy:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(JsonStorage(self.filename).load()), 1)
+        writer.close()
+
+    def test_failed_write_is_retried(self):
+        errors = []
+        attempts = []
+        def save(data):
+            attempts.append(len(data))
+            if len(attempts) == 1:
+                raise OSError("disk full")
+            CountingSaves.save(self.storage, data)
+        self.storage.save = save
+        writer = DeferredWriter(self.storage, delay=0, on_error=errors.append)
+        writer.save([make_record(1, "first")])
+        for _ in range(200):
+            if not writer.busy:
+                break
+            time.sleep(0.01)
+        writer.close()
+        self.assertEqual(len(attempts), 2)
+        self.assertIsInstance(errors[0], OSError)
+        self.assertIsNone(writer.error)
+        self.assertEqual(len(JsonStorage(self.filename).load()), 1)
+
+    def test_failed_flush_keeps_changes(self):
+        def save(data):
+            raise OSError("disk full")
+        self.storage.save = save
+        self.writer.save([make_record(1, "first")])
+        with self.assertRaises(OSError):
+            self.writer.flush()
+        self.assertTrue(self.writer.busy)
+        self.assertEqual(self.writer.failures, 1)
+        del self.storage.save
+        self.writer.flush()
+        self.assertFalse(self.writer.busy)
+        self.assertEqual(self.writer.failures, 0)
+
+    def test_swapped_entries_are_adopted_unless_completed(self):
+        storage = IndexedStorage(os.path.join(self.directory.name, "habits.idx"))
+        writer = DeferredWriter(storage, delay=60)
+        data = [make_record(1, "first"), make_record(2, "second")]
+        entries = [list(record["progress_entries"]) for record in data]
+        writer.save(data)
+        original = data[1]["progress_entries"]
+        def save(snapshot):
+            IndexedStorage.save(storage, snapshot)
+            original.append({"timestamp": "2023-08-01 10:00:00"})
+        storage.save = save
+        writer.flush()
+        writer.close()
+        self.assertIsInstance(data[0]["progress_entries"], LazyProgress)
+        self.assertEqual(list(data[0]["progress_entries"]), entries[0])
+        self.assertIs(data[1]["progress_entries"], original)
+
+class HabitStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.json")
+        JsonStorage(self.filename).save([make_record(1, "first")])
+        self.storage = CountingStorage(self.filename)
+        self.store = HabitStore(self.storage)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_repeated_loads_are_cached(self):
+        first = self.store.load()
+        second = self.store.load()
+        self.assertIs(first, second)
+        self.assertEqual(self.storage.loads, 1)
+
+    def test_own_writes_keep_cache(self):
+        data = self.store.load()
+        data.append(make_record(2, "second"))
+        self.store.save(data)
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        data[0]["progress_entries"].append(entry)
+        data[0]["last_done"] = datetime.date(2023, 8, 1)
+        self.store.record_progress(data, 1, entry, {"last_done": data[0]["last_done"]})
+        self.assertEqual(len(self.store.load()), 2)
+        self.assertEqual(self.storage.loads, 1)
+
+    def test_version_bumps_on_changes(self):
+        data = self.store.load()
+        versions = [self.store.version]
+        self.store.load()
+        self.assertEqual(self.store.version, versions[-1])
+        self.store.add(make_record(2, "second"))
+        versions.append(self.store.version)
+        self.store.save(data)
+        versions.append(self.store.version)
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        data[0]["progress_entries"].append(entry)
+        self.store.record_progress(data, 1, entry, {})
+        versions.append(self.store.version)
+        self.store.delete(2)
+        versions.append(self.store.version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_start_date_queries(self):
+        for habit_id, start_date in ((2, "2023-07-15"), (3, "2023-08-20"), (4, "2023-07-15")):
+            record = make_record(habit_id, str(habit_id))
+            record["start_date"] = start_date
+            self.store.add(record)
+        ids = lambda records: [record["habit_id"] for record in records]
+        self.assertEqual(ids(self.store.habits_in_period(datetime.date(2023, 7, 15),
+                                                         datetime.date(2023, 8, 1))), [2, 4, 1])
+        self.assertEqual(ids(self.store.habits_started_before(datetime.date(2023, 8, 1))), [2, 4])
+        self.assertEqual(ids(self.store.habits_started_after(datetime.date(2023, 8, 1))), [3])
+        self.store.delete(4)
+        self.assertEqual(ids(self.store.habits_started_before(datetime.date(2023, 8, 1))), [2])
+
+    def test_group_queries_follow_changes(self):
+        record = make_record(2, "second")
+        record["frequency"] = "weekly"
+        record["category"] = "work"
+        self.store.add(record)
+        ids = lambda records: [record["habit_id"] for record in records]
+        self.assertEqual(ids(self.store.habits_with_frequency("weekly")), [2])
+        self.assertEqual(ids(self.store.habits_in_category("test")), [1])
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        record["progress_entries"].append(entry)
+        record["successes"] = 1
+        self.store.record_progress(self.store.load(), 2, entry, {"successes": 1})
+        self.assertEqual(self.store.top_category_performance(), "work")
+        self.assertEqual(self.store.top_frequency_performance(), "weekly")
+        self.store.delete(2)
+        self.assertEqual(self.store.habits_with_frequency("weekly"), [])
+        self.assertEqual(self.store.top_category_performance(), "test")
+
+    def test_rollup_is_built_without_the_lock(self):
+        data = self.store.load()
+        started, release = threading.Event(), threading.Event()
+        entry = {"timestamp": "2023-08-01 10:00:00"}
+        def loader():
+            started.set()
+            release.wait(5)
+            return [entry]
+        data[0]["progress_entries"] = LazyProgress(1, entry, loader)
+        counts = []
+        thread = threading.Thread(target=lambda: counts.append(self.store.completions("monthly")))
+        thread.start()
+        self.assertTrue(started.wait(5))
+        self.assertTrue(self.store.lock.acquire(timeout=1))
+        self.store.lock.release()
+        release.set()
+        thread.join(5)
+        self.assertEqual(counts, [CompletionRollup(data).counts("monthly")])
+        self.assertEqual(self.store.completions("monthly"), counts[0])
+
+    def test_stale_leaderboard_is_rebuilt_without_the_lock(self):
+        epoch = [1]
+        started, release = threading.Event(), threading.Event()
+        def score(record):
+            if epoch[0] == 2:
+                started.set()
+                release.wait(5)
+            return record["longest_streak"]
+        self.store.add_leaderboard("streak", score, epoch=lambda: epoch[0])
+        self.store.load()
+        epoch[0] = 2
+        ranked = []
+        thread = threading.Thread(target=lambda: ranked.append(self.store.leaderboard("streak", 1)))
+        thread.start()
+        self.assertTrue(started.wait(5))
+        self.assertTrue(self.store.lock.acquire(timeout=1))
+        self.store.lock.release()
+        release.set()
+        thread.join(5)
+        self.assertEqual(ranked, [[(self.store.get(1), 0)]])
+
+    def test_leaderboards_follow_changes(self):
+        self.store.add_leaderboard("streak", lambda record: record["longest_streak"])
+        record = make_record(2, "second")
+        record["longest_streak"] = 2
+        self.store.add(record)
+        ids = lambda ranked: [record["habit_id"] for record, _ in ranked]
+        self.assertEqual(ids(self.store.leaderboard("streak", 5)), [2, 1])
+        data = self.store.load()
+        data[0]["longest_streak"] = 4
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        data[0]["progress_entries"].append(entry)
+        self.store.record_progress(data, 1, entry, {"longest_streak": 4})
+        self.assertEqual(self.store.leaderboard("streak", 1), [(data[0], 4)])
+        self.store.delete(1)
+        self.assertEqual(ids(self.store.leaderboard("streak", 5, worst=True)), [2])
+
+    def test_completions_follow_changes(self):
+        self.assertEqual(self.store.completions("monthly"), {})
+        self.store.add(make_record(2, "second"))
+        data = self.store.load()
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        data[1]["progress_entries"].append(entry)
+        self.store.record_progress(data, 2, entry, {})
+        self.assertEqual(self.store.completions("monthly"), {"2023-08": 1})
+        self.assertEqual(self.store.completions("daily", "test"), {"2023-08-01": 1})
+        self.store.delete(2)
+        self.assertEqual(self.store.completions("weekly"), {})
+
+    def test_cached_records_match_file(self):
+        data = self.store.load()
+        data[0]["start_date"] = datetime.date(2023, 8, 1)
+        entry = {"timestamp": datetime.datetime(2023, 8, 1, 10)}
+        data[0]["progress_entries"].append(entry)
+        self.store.record_progress(data, 1, entry, {})
+        self.assertEqual(self.store.load(), JsonStorage(self.filename).load())
+
+    def test_get_add_delete_by_stable_id(self):
+        self.store.add(make_record(5, "fifth"))
+        self.store.add(make_record(9, "ninth"))
+        self.assertEqual(self.store.get("5")["title"], "fifth")
+        self.assertEqual(self.store.delete(5)["title"], "fifth")
+        self.assertIsNone(self.store.get(5))
+        self.assertEqual(self.store.get(9)["title"], "ninth")
+        stored = JsonStorage(self.filename).load()
+        self.assertEqual([record["habit_id"] for record in stored], [1, 9])
+        self.assertEqual(self.storage.loads, 1)
+
+    def test_update_journals_only_the_edited_habit(self):
+        self.store.add(make_record(2, "second"))
+        stat = os.stat(self.filename)
+        updated = self.store.update({"habit_id": 1, "title": "renamed", "category": "other",
+                                     "progress_entries": []})
+        self.assertIs(updated, self.store.get(1))
+        self.assertEqual(os.stat(self.filename).st_mtime_ns, stat.st_mtime_ns)
+        self.assertEqual(self.store.habits_in_category("other"), [updated])
+        self.assertEqual([record["title"] for record in self.store.habits_in_category("test")],
+                         ["second"])
+        self.assertEqual(JsonStorage(self.filename).load(), self.store.load())
+        self.assertIsNone(self.store.update({"habit_id": 7, "title": "missing"}))
+
+    def test_history_pages_cached_entries(self):
+        data = self.store.load()
+        for day in (1, 2, 2, 5):
+            entry = {"timestamp": datetime.datetime(2023, 8, day, 10)}
+            data[0]["progress_entries"].append(entry)
+            self.store.record_progress(data, 1, entry, {})
+        page = self.store.history_page(1, 0, 2)
+        self.assertEqual([entry["timestamp"] for entry in page],
+                         ["2023-08-05 10:00:00", "2023-08-02 10:00:00"])
+        self.assertEqual(self.store.history_position(1, datetime.date(2023, 8, 4)), 1)
+        self.assertEqual(self.store.history_position(1, datetime.date(2023, 8, 2)), 1)
+        self.assertEqual(self.store.history_position(1, datetime.date(2023, 7, 31)), 4)
+        entry = {"timestamp": datetime.datetime(2023, 8, 6, 10)}
+        data[0]["progress_entries"].append(entry)
+        self.store.record_progress(data, 1, entry, {})
+        self.assertEqual(self.store.history_position(1, datetime.date(2023, 8, 5)), 1)
+
+    def test_lock_serializes_threads(self):
+        added = threading.Event()
+        worker = threading.Thread(target=lambda: (self.store.add(make_record(2, "second")), added.set()))
+        with self.store.lock:
+            worker.start()
+            self.assertFalse(added.wait(0.1))
+            self.assertIsNone(self.store.get(2))
+        worker.join(5)
+        self.assertEqual(self.store.get(2)["title"], "second")
+
+    def test_deferred_writes_flush_on_close(self):
+        store = HabitStore(self.storage, write_delay=60)
+        data = store.load()
+        data.append(make_record(2, "second"))
+        store.save(data)
+        JsonStorage(self.filename).save([make_record(1, "first")])
+        self.assertEqual(len(store.load()), 2)
+        store.close()
+        self.assertEqual(len(JsonStorage(self.filename).load()), 2)
+
+    def test_external_change_invalidates_cache(self):
+        self.store.load()
+        JsonStorage(self.filename).save([make_record(1, "first"), make_record(2, "second")])
+        self.assertEqual(len(self.store.load()), 2)
+        self.assertEqual(self.storage.loads, 2)
+
+class GroupIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+        for habit_id, category, successes, entries in ((1, "work", 1, 2), (2, "health", 2, 2),
+                                                       (3, "work", 0, 0), (4, "health", 1, 4)):
+            record = make_record(habit_id, str(habit_id))
+            record["category"] = category
+            record["successes"] = successes
+            record["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}] * entries
+            self.records.append(record)
+        self.index = GroupIndex("category", self.records)
+
+    def test_lookup_and_aggregates(self):
+        self.assertEqual(self.index.ids("work"), [1, 3])
+        self.assertEqual(self.index.ids("study"), [])
+        self.assertEqual(self.index.averages(), {"work": 0.25, "health": 0.625})
+        self.assertEqual(self.index.top(), "health")
+
+    def test_update_and_remove(self):
+        self.records[2]["successes"] = 3
+        self.records[2]["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}] * 3
+        self.index.update(self.records[2])
+        self.assertEqual(self.index.top(), "work")
+        for habit_id in (1, 3):
+            self.index.remove(habit_id)
+        self.assertEqual(self.index.averages(), {"health": 0.625})
+        self.assertIsNone(GroupIndex("category").top())
+
+    def test_matches_analytics(self):
+        habits = [Habit.from_record(record) for record in self.records]
+        self.assertEqual(self.index.top(), Analytics().top_category_performance(habits))
+
+    def test_ties_and_sums_match_analytics_after_updates(self):
+        records = self.records[:2]
+        records[0]["successes"], records[1]["successes"] = 1, 1
+        index = GroupIndex("category", records)
+        for successes, entries in ((1, 3), (1, 10), (1, 7), (1, 2)):
+            records[0]["successes"] = successes
+            records[0]["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}] * entries
+            index.update(records[0])
+        habits = [Habit.from_record(record) for record in records]
+        self.assertEqual(index.top(), "work")
+        self.assertEqual(index.top(), Analytics().top_category_performance(habits))
+        grouped = self.records + [dict(self.records[0], habit_id=5)]
+        index = GroupIndex("category", grouped)
+        for entries in (3, 7, 2):
+            grouped[0]["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}] * entries
+            index.update(grouped[0])
+        rates = [GroupIndex.ratio(record) for record in grouped if record["category"] == "work"]
+        self.assertEqual(index.averages()["work"], sum(rates) / len(rates))
+
+    def test_category_change_keeps_list_order(self):
+        self.records[0]["category"] = "fun"
+        self.index.update(self.records[0])
+        self.assertEqual(self.index.ids("work"), [3])
+        self.assertEqual(list(self.index.averages()), ["fun", "health", "work"])
+        self.records[0]["category"] = "health"
+        self.index.update(self.records[0])
+        self.assertEqual(self.index.ids("health"), [1, 2, 4])
+        fresh = GroupIndex("category", self.records)
+        self.assertEqual(self.index.averages(), fresh.averages())
+
+    def test_store_ties_match_analytics_after_category_change(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        filename = os.path.join(directory.name, "habits.json")
+        records = []
+        for habit_id, category in ((1, "Health"), (2, "Work"), (3, "Health")):
+            record = make_record(habit_id, str(habit_id))
+            record["category"] = category
+            record["successes"] = 1
+            record["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}]
+            records.append(record)
+        JsonStorage(filename).save(records)
+        store = HabitStore(JsonStorage(filename))
+        self.assertEqual(store.top_category_performance(), "Health")
+        store.update({"habit_id": 1, "category": "Fun"})
+        habits = [Habit.from_record(record) for record in store.load()]
+        self.assertEqual(store.top_category_performance(), "Fun")
+        self.assertEqual(Analytics().top_category_performance(habits), "Fun")
+        self.assertEqual(HabitStore(JsonStorage(filename)).top_category_performance(), "Fun")
+
+class CompletionRollupTestCase(unittest.TestCase):
+    def setUp(self):
+        first, second = make_record(1, "first"), make_record(2, "second")
+        second["category"] = "work"
+        first["progress_entries"] = [{"timestamp": "2023-12-31 10:00:00"},
+                                     {"timestamp": "2024-01-01 10:00:00"}]
+        second["progress_entries"] = [{"timestamp": "2024-01-01 18:00:00"}]
+        self.records = [first, second]
+        self.rollup = CompletionRollup(self.records)
+
+    def test_counts_per_period(self):
+        self.assertEqual(self.rollup.counts("daily"), {"2023-12-31": 1, "2024-01-01": 2})
+        self.assertEqual(self.rollup.counts("weekly"), {"2023-W52": 1, "2024-W01": 2})
+        self.assertEqual(self.rollup.counts("monthly"), {"2023-12": 1, "2024-01": 2})
+        self.assertEqual(self.rollup.counts("monthly", "work"), {"2024-01": 1})
+        self.assertEqual(self.rollup.total("weekly", "2024-W01", "test"), 1)
+        self.assertEqual(self.rollup.counts("daily", "study"), {})
+
+    def test_removing_a_record(self):
+        self.rollup.add_record(self.records[0], -1)
+        self.assertEqual(self.rollup.counts("daily"), {"2024-01-01": 1})
+        self.assertEqual(self.rollup.counts("daily", "test"), {})
+
+class LeaderboardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.records = [make_record(habit_id, str(habit_id)) for habit_id in range(1, 6)]
+        for record, streak in zip(self.records, (3, 7, 1, 7, 0)):
+            record["longest_streak"] = streak
+        self.leaderboard = Leaderboard(lambda record: record["longest_streak"])
+        self.leaderboard.rebuild(self.records)
+
+    def test_best_and_worst(self):
+        self.assertEqual(self.leaderboard.best(3), [(2, 7), (4, 7), (1, 3)])
+        self.assertEqual(self.leaderboard.worst(2), [(5, 0), (3, 1)])
+        self.assertEqual(self.leaderboard.worst(0), [])
+
+    def test_incremental_updates_match_rebuild(self):
+        self.records[2]["longest_streak"] = 9
+        self.leaderboard.update(self.records[2])
+        self.leaderboard.remove(2)
+        self.leaderboard.update(make_record(6, "6"))
+        rebuilt = Leaderboard(lambda record: record["longest_streak"])
+        rebuilt.rebuild([record for record in self.records if record["habit_id"] != 2]
+                        + [make_record(6, "6")])
+        self.assertEqual(self.leaderboard.best(10), rebuilt.best(10))
+
+    def test_epoch_change_makes_stale(self):
+        epoch = [1]
+        leaderboard = Leaderboard(lambda record: record["longest_streak"], lambda: epoch[0])
+        leaderboard.rebuild(self.records)
+        self.assertFalse(leaderboard.stale())
+        epoch[0] = 2
+        self.assertTrue(leaderboard.stale())
+
+    def test_context_captured_once_per_rebuild(self):
+        contexts = []
+        def capture():
+            contexts.append(object())
+            return contexts[-1]
+        seen = []
+        def score(record, context):
+            seen.append(context)
+            return record["longest_streak"]
+        leaderboard = Leaderboard(score, context=capture)
+        leaderboard.rebuild(self.records)
+        leaderboard.update(self.records[0])
+        self.assertEqual(len(contexts), 1)
+        self.assertEqual(seen, [contexts[0]] * (len(self.records) + 1))
+        leaderboard.rebuild(self.records)
+        self.assertEqual(len(contexts), 2)
+
+class StartDateIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.records = [make_record(habit_id, str(habit_id)) for habit_id in range(1, 6)]
+        for record, start_date in zip(self.records, ("2023-08-03", "2023-08-01", "2023-08-05",
+                                                     "2023-08-01", "2023-08-02")):
+            record["start_date"] = start_date
+        self.index = StartDateIndex(self.records)
+
+    def test_between_is_inclusive(self):
+        self.assertEqual(self.index.between(datetime.date(2023, 8, 1), datetime.date(2023, 8, 3)),
+                         [2, 4, 5, 1])
+        self.assertEqual(self.index.between("2023-08-06", "2023-08-09"), [])
+
+    def test_before_and_after_are_exclusive(self):
+        self.assertEqual(self.index.before(datetime.date(2023, 8, 2)), [2, 4])
+        self.assertEqual(self.index.after(datetime.date(2023, 8, 2)), [1, 3])
+
+    def test_add_and_remove(self):
+        self.index.remove(self.records[3])
+        self.index.add(make_record(6, "6"))
+        self.assertEqual(self.index.before(datetime.date(2023, 8, 2)), [2, 6])
+        self.assertEqual(len(self.index), 5)
+
+class IdSequenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.seq")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ids_are_monotonic_across_instances(self):
+        sequence = IdSequence(self.filename)
+        self.assertEqual([sequence.next_id(), sequence.next_id()], [1, 2])
+        self.assertEqual(IdSequence(self.filename).next_id(), 3)
+
+    def test_reserve_block(self):
+        sequence = IdSequence(self.filename)
+        self.assertEqual(list(sequence.reserve(3)), [1, 2, 3])
+        self.assertEqual(sequence.next_id(), 4)
+
+    def test_block_size_writes_once_per_block(self):
+        sequence = IdSequence(self.filename, block_size=10)
+        ids = [sequence.next_id() for _ in range(5)]
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), "10")
+        self.assertEqual(IdSequence(self.filename).next_id(), 11)
+
+    def test_seed_from_data_file(self):
+        data_filename = os.path.join(self.directory.name, "habits.json")
+        JsonStorage(data_filename).save([make_record(4, "first"), make_record("7", "second")])
+        sequence = IdSequence(self.filename, seed=lambda: last_habit_id(data_filename))
+        self.assertEqual(sequence.next_id(), 8)
+
+    def test_stale_file_is_seeded_once(self):
+        with open(self.filename, "w") as file:
+            file.write("2")
+        seeds = []
+        def seed():
+            seeds.append(None)
+            return 7
+        sequence = IdSequence(self.filename, seed=seed)
+        self.assertEqual([sequence.next_id(), sequence.next_id()], [8, 9])
+        self.assertEqual(len(seeds), 1)
+
+class SQLiteStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.db")
+        self.storage = open_storage(self.filename)
+        first = make_record(1, "first")
+        first["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"}]
+        second = make_record(2, "second")
+        second["frequency"] = "weekly"
+        second["start_date"] = "2023-09-15"
+        second["last_done"] = ["Have not been marked down"]
+        self.records = [first, second]
+        self.storage.save(self.records)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def test_open_storage_selects_sqlite(self):
+        self.assertIsInstance(self.storage, SQLiteStorage)
+
+    def test_round_trip(self):
+        self.assertEqual(self.storage.load(), self.records)
+
+    def test_streak_checkpoint_is_persisted(self):
+        entry = {"timestamp": "2023-08-02 10:00:00"}
+        self.storage.record_progress(self.records, 1, entry, {"streak_checkpoint": ["daily", 2, 19571, 2, 2, 2]})
+        self.assertEqual(self.storage.load()[0]["streak_checkpoint"], ["daily", 2, 19571, 2, 2, 2])
+        self.storage.close()
+        connection = sqlite3.connect(self.filename)
+        with connection:
+            connection.execute(f"CREATE TABLE old AS SELECT {', '.join(SQLiteStorage.HABIT_COLUMNS[:-1])} "
+                               "FROM habits")
+            connection.execute("DROP TABLE habits")
+            connection.execute("ALTER TABLE old RENAME TO habits")
+        connection.close()
+        self.storage = SQLiteStorage(self.filename)
+        self.storage.save(self.records)
+        self.assertEqual(self.storage.load(), self.records)
+
+    def test_record_progress(self):
+        entry = {"timestamp": datetime.datetime(2023, 8, 2, 10)}
+        self.storage.record_progress(None, 1, entry, {"successes": 2,
+                                                      "last_done": datetime.date(2023, 8, 2)})
+        first = self.storage.load()[0]
+        self.assertEqual(first["successes"], 2)
+        self.assertEqual(first["last_done"], "2023-08-02")
+        self.assertEqual(first["progress_entries"][-1], {"timestamp": "2023-08-02 10:00:00"})
+
+    def test_fields_only_update(self):
+        store = HabitStore(self.storage)
+        store.update({"habit_id": 2, "frequency": "daily", "streak_checkpoint": None})
+        second = self.storage.load()[1]
+        self.assertEqual(second["frequency"], "daily")
+        self.assertNotIn("streak_checkpoint", second)
+        self.assertEqual(store.habits_with_frequency("weekly"), [])
+        self.assertEqual(self.storage.load()[0], self.records[0])
+
+    def test_filters(self):
+        weekly = self.storage.habits_with_frequency("weekly")
+        self.assertEqual([record["habit_id"] for record in weekly], [2])
+        in_period = self.storage.habits_in_period(datetime.date(2023, 7, 1),
+                                                  datetime.date(2023, 8, 31))
+        self.assertEqual([record["habit_id"] for record in in_period], [1])
+        self.assertEqual(in_period[0]["progress_entries"], self.records[0]["progress_entries"])
+        self.assertEqual(len(self.storage.habits_in_category("test")), 2)
+
+    def test_progress_between(self):
+        entries = self.storage.progress_between(1, datetime.datetime(2023, 8, 1),
+                                                datetime.datetime(2023, 8, 2))
+        self.assertEqual(entries, [{"timestamp": "2023-08-01 10:00:00"}])
+
+    def test_last_id(self):
+        self.assertEqual(last_habit_id(self.filename), 2)
+
+    def test_store_queries_match_json_fallback(self):
+        json_filename = os.path.join(self.directory.name, "habits.json")
+        JsonStorage(json_filename).save(self.records)
+        json_store = HabitStore(JsonStorage(json_filename))
+        sqlite_store = HabitStore(self.storage)
+        self.assertEqual(json_store.habits_with_frequency("daily"),
+                         sqlite_store.habits_with_frequency("daily"))
+        period = (datetime.date(2023, 9, 1), datetime.date(2023, 9, 30))
+        self.assertEqual(json_store.habits_in_period(*period),
+                         sqlite_store.habits_in_period(*period))
+
+class IndexedStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "habits.jsonl")
+        self.storage = open_storage(self.filename)
+        first = make_record(1, "first")
+        first["progress_entries"] = [{"timestamp": "2023-08-01 10:00:00"},
+                                     {"timestamp": "2023-08-02 10:00:00"}]
+        self.records = [first, make_record(2, "second")]
+        self.storage.save(json.loads(json.dumps(self.records)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_open_storage_selects_indexed_layout(self):
+        self.assertIsInstance(self.storage, IndexedStorage)
+
+    def test_round_trip(self):
+        self.assertEqual(self.storage.load(), self.records)
+
+    def test_summaries_do_not_read_history(self):
+        first, second = self.storage.load_summaries()
+        self.assertIsInstance(first["progress_entries"], LazyProgress)
+        self.assertEqual(len(first["progress_entries"]), 2)
+        self.assertEqual(first["progress_entries"][-1], {"timestamp": "2023-08-02 10:00:00"})
+        self.assertFalse(second["progress_entries"])
+        self.assertFalse(first["progress_entries"].loaded)
+        self.assertEqual(list(first["progress_entries"]), self.records[0]["progress_entries"])
+        self.assertTrue(first["progress_entries"].loaded)
+
+    def test_record_progress_appends_without_reading_history(self):
+        data = self.storage.load_summaries()
+        entry = {"timestamp": "2023-08-03 10:00:00"}
+        data[0]["progress_entries"].append(entry)
+        self.storage.record_progress(data, 1, entry, {"successes": 3})
+        self.assertFalse(data[0]["progress_entries"].loaded)
+        reloaded = self.storage.load_summaries()[0]
+        self.assertEqual(reloaded["successes"], 3)
+        self.assertEqual(reloaded["progress_entries"][-1], entry)
+        self.assertEqual(len(list(reloaded["progress_entries"])), 3)
+
+    def test_save_rebinds_progress_to_new_file(self):
+        data = self.storage.load_summaries()
+        data[1]["title"] = "renamed " * 20
+        self.storage.save(data)
+        self.assertEqual(list(data[0]["progress_entries"]), self.records[0]["progress_entries"])
+        self.assertEqual(self.storage.load()[1]["title"], "renamed " * 20)
+
+    def test_crash_before_journal_clear_does_not_duplicate(self):
+        data = self.storage.load_summaries()
+        entry = {"timestamp": "2023-08-03 10:00:00"}
+        data[0]["progress_entries"].append(entry)
+        data[0]["successes"] = 3
+        self.storage.record_progress(data, 1, entry, {"successes": 3})
+        with mock.patch.object(ProgressJournal, "clear", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self.storage.save(data)
+        loaded = open_storage(self.filename).load()
+        self.assertEqual(len(loaded[0]["progress_entries"]), 3)
+        self.assertEqual(loaded[0]["successes"], 3)
+
+    def test_store_serves_summaries(self):
+        store = HabitStore(self.storage)
+        data = store.load()
+        self.assertFalse(data[0]["progress_entries"].loaded)
+        entry = {"timestamp": datetime.datetime(2023, 8, 3, 10)}
+        data[0]["progress_entries"].append(entry)
+        store.record_progress(data, 1, entry, {})
+        self.assertEqual(data[0]["progress_entries"][-1], {"timestamp": "2023-08-03 10:00:00"})
+        self.assertFalse(data[0]["progress_entries"].loaded)
+
+if __name__ == "__main__":
+    unittest.main()
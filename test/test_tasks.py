@@ -0,0 +1,136 @@
+import threading
+import unittest
+
+from tasks import TaskRunner
+
+class FakeWidget:
+    """
+    Stands in for a Tk widget, keeping the callbacks scheduled with after().
+    """
+    def __init__(self):
+        self.scheduled = {}
+        self.count = 0
+
+    def after(self, interval, callback):
+        self.count += 1
+        self.scheduled[self.count] = callback
+        return self.count
+
+    def after_cancel(self, identifier):
+        del self.scheduled[identifier]
+
+    def run_pending(self):
+        scheduled, self.scheduled = self.scheduled, {}
+        for callback in scheduled.values():
+            callback()
+
+class TaskRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.widget = FakeWidget()
+        self.busy = []
+        self.runner = TaskRunner(self.widget, on_busy=self.busy.append)
+        self.results = []
+
+    def tearDown(self):
+        self.runner.close()
+
+    def wait(self, task):
+        task.future.exception(timeout=5)
+        self.widget.run_pending()
+
+    def test_result_delivered_on_poll(self):
+        main_thread = threading.current_thread()
+        threads = []
+        def work(value):
+            threads.append(threading.current_thread())
+            return value * 2
+        task = self.runner.submit(work, 21, on_done=self.results.append)
+        task.future.result(timeout=5)
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.busy, [True])
+        self.widget.run_pending()
+        self.assertEqual(self.results, [42])
+        self.assertEqual(self.busy, [True, False])
+        self.assertIsNot(threads[0], main_thread)
+        self.assertEqual(self.widget.scheduled, {})
+
+    def test_polls_until_done(self):
+        release = threading.Event()
+        task = self.runner.submit(release.wait, 5, on_done=self.results.append)
+        self.widget.run_pending()
+        self.assertEqual(len(self.widget.scheduled), 1)
+        self.assertTrue(self.runner.busy)
+        release.set()
+        self.wait(task)
+        self.assertEqual(self.results, [True])
+        self.assertFalse(self.runner.busy)
+
+    def test_superseded_task_is_dropped(self):
+        release = threading.Event()
+        first = self.runner.submit(release.wait, 5, key="view", on_done=self.results.append)
+        queued = self.runner.submit(self.results.append, "queued", key="other")
+        second = self.runner.submit(lambda: "second", key="view", on_done=self.results.append)
+        release.set()
+        self.wait(second)
+        self.assertTrue(first.cancelled)
+        self.assertFalse(queued.cancelled)
+        self.assertEqual(self.results, ["queued", "second"])
+
+    def test_cancel_skips_queued_task(self):
+        release = threading.Event()
+        blocker = self.runner.submit(release.wait, 5)
+        task = self.runner.submit(self.results.append, "ran", key="view",
+                                  on_done=self.results.append)
+        self.runner.cancel("view")
+        self.assertTrue(task.future.cancelled())
+        release.set()
+        self.wait(blocker)
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.busy, [True, False])
+
+    def test_cancel_while_running_clears_busy(self):
+        release = threading.Event()
+        task = self.runner.submit(release.wait, 5, key="view", on_done=self.results.append)
+        self.runner.cancel("view")
+        self.assertEqual(self.busy, [True, False])
+        release.set()
+        self.wait(task)
+        self.assertEqual(self.results, [])
+
+    def test_errors(self):
+        errors = []
+        def fail():
+            raise ValueError("broken")
+        task = self.runner.submit(fail, on_error=errors.append)
+        self.wait(task)
+        self.assertIsInstance(errors[0], ValueError)
+        task = self.runner.submit(fail)
+        task.future.exception(timeout=5)
+        with self.assertRaises(ValueError):
+            self.widget.run_pending()
+        self.assertFalse(self.runner.busy)
+
+    def test_posted_callbacks_run_on_poll(self):
+        runner = TaskRunner(self.widget, idle_interval=500)
+        self.assertEqual(len(self.widget.scheduled), 1)
+        thread = threading.Thread(target=runner.post, args=(self.results.append, "posted"))
+        thread.start()
+        thread.join()
+        self.assertEqual(self.results, [])
+        self.widget.run_pending()
+        self.assertEqual(self.results, ["posted"])
+        self.assertEqual(len(self.widget.scheduled), 1)
+        runner.close()
+        self.assertEqual(self.widget.scheduled, {})
+
+    def test_close_runs_writes(self):
+        release = threading.Event()
+        self.runner.submit(release.wait, 5)
+        self.runner.submit(self.results.append, "write")
+        release.set()
+        self.runner.close()
+        self.assertEqual(self.results, ["write"])
+        self.assertEqual(self.widget.scheduled, {})
+
+if __name__ == "__main__":
+    unittest.main()
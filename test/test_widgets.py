@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+import unittest
+
+from widgets import (PanelPool, TablePanel, VirtualTreeview, clamp_first_row, row_height, scroll_fractions,
+                     scroll_target)
+
+class FakeTreeview:
+    """
+    Stands in for ttk.Treeview, recording the calls that change rows.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.calls = []
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def delete(self, *iids):
+        self.calls.append(("delete",) + iids)
+        for iid in iids:
+            self.order.remove(iid)
+            del self.rows[iid]
+
+    def insert(self, parent, index, iid, text, values):
+        self.calls.append(("insert", iid))
+        self.order.insert(index, iid)
+        self.rows[iid] = values
+
+    def item(self, iid, values):
+        self.calls.append(("item", iid))
+        self.rows[iid] = values
+
+    def move(self, iid, parent, index):
+        self.calls.append(("move", iid))
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def cget(self, option):
+        return "Habits.Treeview"
+
+    def winfo_fpixels(self, distance):
+        return float(distance) * 1.5
+
+class FakeStyle:
+    def __init__(self, options):
+        self.options = options
+
+    def lookup(self, style, option):
+        return self.options.get((style, option), "")
+
+class FakeScrollbar:
+    def set(self, first, last):
+        self.fractions = (first, last)
+
+class FakeFrame:
+    def __init__(self):
+        self.packed = False
+
+    def pack(self, **options):
+        self.packed = True
+
+    def pack_forget(self):
+        self.packed = False
+
+def make_view(fetch, row_count):
+    view = VirtualTreeview.__new__(VirtualTreeview)
+    view.fetch = fetch
+    view.row_count = row_count
+    view.visible, view.buffer, view.first = 10, 2, 0
+    view._rows = {}
+    view.treeview = FakeTreeview()
+    view.scrollbar = FakeScrollbar()
+    view.row_height = 20
+    view.refresh()
+    view.treeview.calls.clear()
+    return view
+
+class ScrollingTestCase(unittest.TestCase):
+    def test_clamp_first_row(self):
+        self.assertEqual(clamp_first_row(-3, 10, 100), 0)
+        self.assertEqual(clamp_first_row(95, 10, 100), 90)
+        self.assertEqual(clamp_first_row(5, 10, 4), 0)
+
+    def test_scroll_target(self):
+        self.assertEqual(scroll_target(("moveto", "0.5"), 0, 10, 100), 50)
+        self.assertEqual(scroll_target(("moveto", "1.0"), 0, 10, 100), 90)
+        self.assertEqual(scroll_target(("scroll", "1", "pages"), 20, 10, 100), 30)
+        self.assertEqual(scroll_target(("scroll", "-3", "units"), 2, 10, 100), 0)
+
+    def test_scroll_fractions(self):
+        self.assertEqual(scroll_fractions(25, 10, 100), (0.25, 0.35))
+        self.assertEqual(scroll_fractions(0, 10, 4), (0.0, 1.0))
+        self.assertEqual(scroll_fractions(0, 10, 0), (0.0, 1.0))
+
+class VirtualTreeviewTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = [[f"habit {index}", index] for index in range(100)]
+        self.view = make_view(lambda start, stop: [(self.data[index][1], self.data[index])
+                                                   for index in range(start, min(stop, len(self.data)))],
+                              len(self.data))
+
+    def test_only_materializes_rows_in_view(self):
+        self.assertEqual(self.view.treeview.order, [str(index) for index in range(12)])
+        self.view.yview("moveto", "0.5")
+        self.assertEqual(self.view.treeview.order, [str(index) for index in range(50, 62)])
+        self.assertEqual(self.view.scrollbar.fractions, (0.5, 0.6))
+
+    def test_changed_row_is_updated_alone(self):
+        self.data[3] = ["habit three", 3]
+        self.view.refresh()
+        self.assertEqual(self.view.treeview.calls, [("item", "3")])
+
+    def test_removed_and_inserted_rows(self):
+        del self.data[1]
+        self.view.set_row_count(len(self.data))
+        self.assertEqual(self.view.treeview.order,
+                         ["0"] + [str(index) for index in range(2, 13)])
+        self.assertEqual(self.view.treeview.calls, [("delete", "1"), ("insert", "12")])
+
+    def test_scroll_to(self):
+        self.view.scroll_to(40)
+        self.assertEqual(self.view.treeview.order[0], "40")
+        self.view.scroll_to(97)
+        self.assertEqual(self.view.first, 90)
+
+    def test_row_height_follows_style(self):
+        style = FakeStyle({("Habits.Treeview", "rowheight"): "24"})
+        self.assertEqual(row_height(self.view.treeview, style), 36)
+        self.view.row_height = 36
+        self.view._on_resize(SimpleNamespace(height=370))
+        self.assertEqual(self.view.visible, 9)
+        self.assertEqual(len(self.view.treeview.order), 11)
+
+class TablePanelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.panel = TablePanel.__new__(TablePanel)
+        self.panel.rows = []
+        self.panel.view = make_view(self.panel._fetch, 0)
+
+    def test_set_rows_reuses_items(self):
+        self.panel.set_rows([["a", 1], ["b", 2]])
+        self.panel.view.scroll_to(1)
+        self.panel.view.treeview.calls.clear()
+        self.panel.set_rows([["a", 1], ["c", 3], ["d", 4]])
+        self.assertEqual(self.panel.view.first, 0)
+        self.assertEqual(self.panel.view.treeview.calls, [("item", "1"), ("insert", "2")])
+        self.assertEqual(self.panel.view.treeview.rows["1"], ("c", 3))
+
+class PanelPoolTestCase(unittest.TestCase):
+    def test_panels_are_built_once(self):
+        frames = []
+        def create_frame():
+            frames.append(FakeFrame())
+            return frames[-1]
+        pool = PanelPool(create_frame, fill="both")
+        build = lambda frame: ("content", frame)
+        first = pool.show("text", build)
+        pool.show("table", build)
+        self.assertEqual(pool.show("text", build), first)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual([frame.packed for frame in frames], [True, False])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+from tkinter import font, ttk
+
+
+def clamp_first_row(first, visible, row_count):
+    """
+    Clamp the index of the first shown row to the rows that exist.
+
+    Args:
+        first (int): Requested index of the first shown row.
+        visible (int): Number of rows that fit into the view.
+        row_count (int): Total number of rows.
+
+    Returns:
+        int: Index of the first row, so that the view is filled if possible.
+    """
+    return max(0, min(first, row_count - visible))
+
+
+def scroll_target(args, first, visible, row_count):
+    """
+    Translate a scrollbar command into the index of the first shown row.
+
+    Args:
+        args (tuple): Arguments of the scrollbar command, e.g. ("moveto", "0.5")
+            or ("scroll", "1", "pages").
+        first (int): Index of the currently first shown row.
+        visible (int): Number of rows that fit into the view.
+        row_count (int): Total number of rows.
+
+    Returns:
+        int: Index of the new first shown row.
+    """
+    if args[0] == "moveto":
+        first = round(float(args[1]) * row_count)
+    elif args[0] == "scroll":
+        step = visible if args[2] == "pages" else 1
+        first += int(args[1]) * step
+    return clamp_first_row(first, visible, row_count)
+
+
+def scroll_fractions(first, visible, row_count):
+    """
+    Return the part of all rows that is shown, as expected by Scrollbar.set.
+
+    Args:
+        first (int): Index of the first shown row.
+        visible (int): Number of rows that fit into the view.
+        row_count (int): Total number of rows.
+
+    Returns:
+        tuple: Start and end of the shown part, as fractions between 0 and 1.
+    """
+    if not row_count:
+        return 0.0, 1.0
+    return first / row_count, min(first + visible, row_count) / row_count
+
+
+def row_height(treeview, style):
+    """
+    Return the height of a Treeview row in pixels under the current theme.
+
+    Args:
+        treeview: The Treeview.
+        style: ttk.Style to look the Treeview's style up in.
+
+    Returns:
+        int: The style's rowheight, or the line height of the Treeview's font
+            if the theme does not set one.
+    """
+    name = str(treeview.cget("style")) or "Treeview"
+    height = style.lookup(name, "rowheight")
+    if height:
+        return max(1, round(treeview.winfo_fpixels(height)))
+    row_font = font.Font(root=treeview, font=style.lookup(name, "font") or "TkDefaultFont")
+    return row_font.metrics("linespace")
+
+
+class VirtualTreeview:
+    """
+    A Treeview that only holds the rows in view plus a small buffer.
+
+    Rows are fetched from a callback as the user scrolls, so the number of
+    Treeview items (and the time to show the view) does not grow with the
+    number of rows. Refreshing compares the fetched rows with the shown ones
+    and only updates the rows that differ. The number of rows in view follows
+    the widget's height and the row height of the current theme.
+    """
+    def __init__(self, master, columns, fetch, row_count, height=13, buffer=5):
+        """
+        Create the Treeview and its scrollbar.
+
+        Args:
+            master: Parent widget.
+            columns (list): Pairs of column name and width.
+            fetch (callable): Called with (start, stop) and returning a list of
+                (iid, values) pairs for the rows in that range.
+            row_count (int): Total number of rows.
+            height (int): Initial number of rows in view.
+            buffer (int): Number of extra rows materialized below the view.
+        """
+        self.fetch = fetch
+        self.row_count = row_count
+        self.visible = height
+        self.buffer = buffer
+        self.first = 0
+        self._rows = {}
+        self.scrollbar = ttk.Scrollbar(master, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.treeview = ttk.Treeview(master, show="headings", height=height,
+                                     columns=[name for name, _ in columns])
+        self.treeview.pack(side="top", fill="both", expand=True, padx=5, pady=5)
+        for name, width in columns:
+            self.treeview.column(name, width=width)
+            self.treeview.heading(name, text=name)
+        self.style = ttk.Style(master)
+        self.row_height = row_height(self.treeview, self.style)
+        self.treeview.bind("<<ThemeChanged>>", self._on_theme_changed)
+        self.treeview.bind("<Configure>", self._on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.treeview.bind(sequence, self._on_wheel)
+        self.refresh()
+
+    def _on_theme_changed(self, event):
+        self.row_height = row_height(self.treeview, self.style)
+
+    def _on_resize(self, event):
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", "-3", "units")
+        else:
+            self.yview("scroll", "3", "units")
+        return "break"
+
+    def yview(self, *args):
+        """
+        Scroll the view, as commanded by the scrollbar.
+
+        Args:
+            *args: Arguments of the scrollbar command.
+        """
+        first = scroll_target(args, self.first, self.visible, self.row_count)
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def scroll_to(self, row):
+        """
+        Scroll the view so that a row is the first one shown, if possible.
+
+        Args:
+            row (int): Index of the row.
+        """
+        first = clamp_first_row(row, self.visible, self.row_count)
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def set_row_count(self, row_count):
+        """
+        Change the total number of rows and show the current range again.
+
+        Args:
+            row_count (int): Total number of rows.
+        """
+        self.row_count = row_count
+        self.first = clamp_first_row(self.first, self.visible, row_count)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Fetch the rows of the current range and update the Treeview to match.
+
+        Only rows that were added, removed, changed or moved are touched, so
+        the selection and the rest of the widget stay as they are.
+        """
+        rows = [(str(iid), tuple(values))
+                for iid, values in self.fetch(self.first, self.first + self.visible + self.buffer)]
+        shown = dict(rows)
+        removed = [iid for iid in self.treeview.get_children() if iid not in shown]
+        if removed:
+            self.treeview.delete(*removed)
+        for index, (iid, values) in enumerate(rows):
+            if iid not in self._rows:
+                self.treeview.insert(parent="", index=index, iid=iid, text="", values=values)
+            elif self._rows[iid] != values:
+                self.treeview.item(iid, values=values)
+        order = [iid for iid, _ in rows]
+        if list(self.treeview.get_children()) != order:
+            for index, iid in enumerate(order):
+                self.treeview.move(iid, "", index)
+        self._rows = shown
+        self.scrollbar.set(*scroll_fractions(self.first, self.visible, self.row_count))
+
+
+class TablePanel:
+    """
+    A VirtualTreeview showing a list of rows that is replaced as a whole.
+
+    Setting new rows reuses the Treeview and only updates the items whose
+    values differ, so the same panel can show one result after another.
+    """
+    def __init__(self, master, columns):
+        """
+        Create the Treeview of the panel.
+
+        Args:
+            master: Parent widget.
+            columns (list): Pairs of column name and width.
+        """
+        self.rows = []
+        self.view = VirtualTreeview(master, columns, self._fetch, 0)
+
+    def _fetch(self, start, stop):
+        return list(enumerate(self.rows[start:stop], start))
+
+    def set_rows(self, rows):
+        """
+        Show other rows, scrolled to the top.
+
+        Args:
+            rows (list): Values of every row.
+        """
+        self.rows = list(rows)
+        self.view.first = 0
+        self.view.set_row_count(len(self.rows))
+
+
+class PanelPool:
+    """
+    Panels that are built once and shown again instead of being rebuilt.
+
+    One panel is shown at a time. Showing another panel hides the shown one
+    and packs the requested one, whose content the caller then swaps in
+    place, so the number of widgets does not grow as the user switches.
+    """
+    def __init__(self, create_frame, **pack_options):
+        """
+        Initialize an empty pool.
+
+        Args:
+            create_frame (callable): Returns a new, unpacked frame for a panel.
+            **pack_options: Options the frames are packed with.
+        """
+        self.create_frame = create_frame
+        self.pack_options = pack_options
+        self.panels = {}
+        self.shown = None
+
+    def show(self, key, build):
+        """
+        Show the panel with the given key, building it on first use.
+
+        Args:
+            key: Key of the panel.
+            build (callable): Called with the frame of a new panel and
+                returning its content, e.g. the widgets to be updated.
+
+        Returns:
+            The content of the panel, as returned by build.
+        """
+        if key not in self.panels:
+            frame = self.create_frame()
+            self.panels[key] = (frame, build(frame))
+        if self.shown != key:
+            if self.shown is not None:
+                self.panels[self.shown][0].pack_forget()
+            self.panels[key][0].pack(**self.pack_options)
+            self.shown = key
+        return self.panels[key][1]